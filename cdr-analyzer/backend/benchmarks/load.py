@@ -0,0 +1,172 @@
+"""
+Dashboard load test during a large ingest
+
+Starts the API on a local port with a fresh database, uploads a synthetic
+CDR file and, until its ingest job finishes, keeps several clients
+requesting the dashboard endpoints while a probe times the health-check
+endpoint. Reports per-endpoint latency; with queries off the event loop
+the health check stays fast while the ingest and the queries run.
+
+Usage (from the backend directory):
+    python -m benchmarks.load --rows 1000000 --clients 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.synthetic import generate_cdr_csv
+
+DASHBOARD_ENDPOINTS = [
+    "/api/v1/calls?limit=50",
+    "/api/v1/stats/daily?from_date=2025-12-01&to_date=2026-02-01",
+    "/api/v1/stats/extensions?from_date=2025-12-01&to_date=2026-02-01",
+    "/api/v1/stats/unique-callers?from_date=2025-12-01&to_date=2026-02-01",
+    "/api/v1/stats/unique-callers/range?to_date=2026-02-01&days=90",
+    # Heavier queries: exact distinct count, deep OFFSET page, search total
+    "/api/v1/stats/unique-callers/range?to_date=2026-02-01&days=90&exact=true",
+    "/api/v1/calls?page=1000&limit=100",
+    "/api/v1/calls/search?phone=0912&include_total=true",
+]
+
+# The endpoint the docker-compose healthcheck probes
+HEALTH_ENDPOINT = "/api/v1/calls"
+HEALTH_INTERVAL = 0.25
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(database_path: str, port: int) -> tuple:
+    """
+    Run the app with uvicorn on a background thread
+    Returns (server, thread)
+    """
+    import database
+    database.DATABASE_PATH = database_path
+    from main import app
+    
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+def summarize(latencies: list) -> dict:
+    """Count and latency percentiles in ms"""
+    if not latencies:
+        return {"requests": 0}
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+async def timed_get(client: httpx.AsyncClient, url: str, latencies: dict):
+    start = time.perf_counter()
+    response = await client.get(url)
+    response.raise_for_status()
+    latencies.setdefault(url, []).append(time.perf_counter() - start)
+
+async def dashboard_client(client, index: int, done: asyncio.Event, latencies: dict):
+    """Cycle through the dashboard endpoints until the ingest finishes"""
+    while not done.is_set():
+        url = DASHBOARD_ENDPOINTS[index % len(DASHBOARD_ENDPOINTS)]
+        await timed_get(client, url, latencies)
+        index += 1
+
+async def health_probe(client, done: asyncio.Event, latencies: dict):
+    """Time the health check at a fixed interval"""
+    while not done.is_set():
+        await timed_get(client, HEALTH_ENDPOINT, latencies)
+        await asyncio.sleep(HEALTH_INTERVAL)
+
+async def run_load(base_url: str, csv_path: str, clients: int) -> dict:
+    """Upload csv_path and load the dashboard until the ingest job is done"""
+    latencies = {}
+    done = asyncio.Event()
+    
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        with open(csv_path, "rb") as f:
+            response = await client.post("/api/v1/upload", params={"stream": True},
+                                         files={"file": ("load.csv", f, "text/csv")})
+        response.raise_for_status()
+        job_url = response.json()["status_url"]
+        
+        start = time.perf_counter()
+        workers = [asyncio.create_task(dashboard_client(client, i, done, latencies)) for i in range(clients)]
+        workers.append(asyncio.create_task(health_probe(client, done, latencies)))
+        
+        while True:
+            status = (await client.get(job_url)).json()
+            if status["stage"] in ("done", "failed"):
+                break
+            await asyncio.sleep(0.1)
+        ingest_seconds = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*workers)
+        cache = (await client.get("/api/v1/admin/cache")).json()
+    
+    return {
+        "ingest": {"stage": status["stage"], "calls_inserted": status["calls_inserted"],
+                   "seconds": round(ingest_seconds, 2)},
+        "cache": cache,
+        "health": summarize(latencies.pop(HEALTH_ENDPOINT, [])),
+        "endpoints": {url: summarize(values) for url, values in latencies.items()},
+    }
+
+def main(argv=None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Dashboard load test during ingest")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the uploaded CDR file")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent dashboard clients")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=tempfile.gettempdir(),
+                        help="Where synthetic CSV files are generated and cached")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args(argv)
+    
+    os.makedirs(args.workdir, exist_ok=True)
+    csv_path = os.path.join(args.workdir, f"cdr-synthetic-{args.rows}-{args.seed}.csv")
+    if not os.path.exists(csv_path):
+        print(f"Generating {args.rows:,} rows -> {csv_path}")
+        generate_cdr_csv(csv_path, args.rows, args.seed)
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        server, thread = start_server(os.path.join(workdir, "load.db"), port)
+        try:
+            results = asyncio.run(run_load(f"http://127.0.0.1:{port}", csv_path, args.clients))
+        finally:
+            server.should_exit = True
+            thread.join()
+    
+    ingest = results["ingest"]
+    cache = results["cache"]
+    print(f"ingest: {ingest['stage']}, {ingest['calls_inserted']:,} calls in {ingest['seconds']}s")
+    print(f"response cache: {cache['hits']:,} hits, {cache['misses']:,} misses ({cache['hit_rate']:.1%})")
+    print(f"\n{'endpoint':<72} {'requests':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for url, summary in [(HEALTH_ENDPOINT + " (health)", results["health"])] + list(results["endpoints"].items()):
+        print(f"{url:<72} {summary['requests']:>8} {summary.get('p50_ms', 0):>9} "
+              f"{summary.get('p95_ms', 0):>9} {summary.get('max_ms', 0):>9}")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0 if ingest["stage"] == "done" else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,317 @@
+"""
+CDR ingest benchmark suite
+
+Measures the processor, the database insert path and the call export
+separately on synthetic exports and writes rows/sec and peak RSS to a JSON
+file that can be compared between runs.
+
+Usage (from the backend directory):
+    python -m benchmarks.run --sizes 100000 1000000
+    python -m benchmarks.run --sizes 10000000 --stages parse_stream db_insert
+    python -m benchmarks.run --output new.json --compare baseline.json
+    python -m benchmarks.run --stages parse parse_stream --reader arrow
+    python -m benchmarks.run --sizes 10000 100000 --stages parse parse_gz
+    python -m benchmarks.run --sizes 1000000 --stages export_csv export_ndjson export_parquet
+"""
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import pickle
+import platform
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from benchmarks.synthetic import generate_cdr_csv
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+STAGES = ["parse", "parse_stream", "parse_gz", "db_insert", "export_csv", "export_ndjson", "export_parquet"]
+DEFAULT_THRESHOLD = 0.10
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+def bench_parse(csv_path: str, engine: str, reader: str) -> dict:
+    """process_cdr_file on the whole file in memory"""
+    from processor import process_cdr_file
+    
+    with open(csv_path, "rb") as f:
+        content = f.read()
+    
+    start = time.perf_counter()
+    _, total_records, unique_calls = process_cdr_file(content, engine=engine, reader=reader)
+    elapsed = time.perf_counter() - start
+    
+    return {"rows": total_records, "calls": unique_calls, "seconds": elapsed, "peak_rss_mb": peak_rss_mb()}
+
+def bench_parse_stream(csv_path: str, engine: str, reader: str) -> dict:
+    """iter_cdr_file over the file in bounded-memory chunks"""
+    from processor import iter_cdr_file
+    
+    total_records = 0
+    unique_calls = 0
+    start = time.perf_counter()
+    with open(csv_path, "rb") as f:
+        for records, rows_read in iter_cdr_file(f, engine=engine, reader=reader):
+            total_records += rows_read
+            unique_calls += len(records)
+    elapsed = time.perf_counter() - start
+    
+    return {"rows": total_records, "calls": unique_calls, "seconds": elapsed, "peak_rss_mb": peak_rss_mb()}
+
+def bench_parse_gz(gz_path: str, engine: str, reader: str) -> dict:
+    """
+    Parse a gzip export the way an upload job does: whole in memory when it
+    inflates to at most MAX_IN_MEMORY_SIZE, in chunks otherwise
+    """
+    from processor import iter_cdr_file, open_cdr_file, process_cdr_file, read_if_small
+    
+    total_records = 0
+    unique_calls = 0
+    start = time.perf_counter()
+    with open_cdr_file(gz_path) as source:
+        content, source = read_if_small(source)
+        if content is not None:
+            _, total_records, unique_calls = process_cdr_file(content, engine=engine, reader=reader)
+        else:
+            for records, rows_read in iter_cdr_file(source, engine=engine, reader=reader):
+                total_records += rows_read
+                unique_calls += len(records)
+    elapsed = time.perf_counter() - start
+    
+    return {"rows": total_records, "calls": unique_calls, "seconds": elapsed, "peak_rss_mb": peak_rss_mb()}
+
+def prepare_gz(csv_path: str, gz_path: str):
+    """Compress the synthetic CSV once for the parse_gz stage"""
+    with open(csv_path, "rb") as src, gzip.open(gz_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+def prepare_calls(csv_path: str) -> tuple:
+    """
+    Parse the file once and pickle its batches of calls to a temporary file,
+    so the insert benchmark times writes alone
+    Returns (total_records, calls_path)
+    """
+    from processor import iter_cdr_file
+    
+    fd, calls_path = tempfile.mkstemp(prefix="cdr-bench-calls-", suffix=".pickle")
+    total_records = 0
+    with os.fdopen(fd, "wb") as out, open(csv_path, "rb") as f:
+        for records, rows_read in iter_cdr_file(f):
+            total_records += rows_read
+            if records:
+                pickle.dump(records, out, protocol=pickle.HIGHEST_PROTOCOL)
+    return total_records, calls_path
+
+def load_calls(job, calls_path: str):
+    """Write every batch of a prepare_calls file as ingest jobs do"""
+    import jobs
+    
+    with open(calls_path, "rb") as f:
+        while True:
+            try:
+                records = pickle.load(f)
+            except EOFError:
+                return
+            jobs.write_calls(job, records)
+
+def bench_db_insert(calls_path: str, total_records: int) -> dict:
+    """Load parsed calls from a prepare_calls file into a fresh database"""
+    import database
+    import jobs
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        database.DATABASE_PATH = os.path.join(workdir, "bench.db")
+        database.init_db()
+        job = jobs.IngestJob("benchmark")
+        
+        start = time.perf_counter()
+        load_calls(job, calls_path)
+        elapsed = time.perf_counter() - start
+    
+    return {
+        "rows": total_records,
+        "calls": job.calls_inserted,
+        "seconds": elapsed,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def prepare_export_db(csv_path: str, database_path: str) -> int:
+    """Load the file into a database for the export benchmarks; returns calls stored"""
+    import database
+    import jobs
+    
+    _, calls_path = prepare_calls(csv_path)
+    try:
+        database.DATABASE_PATH = database_path
+        database.init_db()
+        job = jobs.IngestJob("benchmark")
+        load_calls(job, calls_path)
+    finally:
+        os.remove(calls_path)
+    return job.calls_inserted
+
+def bench_export(database_path: str, export_format: str) -> dict:
+    """Stream every stored call through export_calls, discarding the output"""
+    import database
+    from export import export_calls
+    
+    database.DATABASE_PATH = database_path
+    exported = 0
+    start = time.perf_counter()
+    with database.get_db() as conn:
+        for chunk in export_calls(conn, export_format):
+            exported += len(chunk)
+    elapsed = time.perf_counter() - start
+    with database.get_db() as conn:
+        calls = conn.execute("SELECT COUNT(*) FROM call_records").fetchone()[0]
+    
+    return {"rows": calls, "calls": calls, "seconds": elapsed, "bytes": exported,
+            "peak_rss_mb": peak_rss_mb()}
+
+def run_isolated(fn, *args):
+    """Run fn in a fresh process so peak RSS covers only that stage"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(fn, *args).result()
+
+def run_suite(sizes, stages, engine, reader, workdir, seed) -> list:
+    """Run every selected stage for every size"""
+    results = []
+    os.makedirs(workdir, exist_ok=True)
+    
+    for rows in sizes:
+        csv_path = os.path.join(workdir, f"cdr-synthetic-{rows}-{seed}.csv")
+        if not os.path.exists(csv_path):
+            print(f"Generating {rows:,} rows -> {csv_path}")
+            generate_cdr_csv(csv_path, rows, seed)
+        export_db = os.path.join(workdir, f"cdr-export-{rows}-{seed}.db")
+        
+        for stage in stages:
+            if stage == "parse":
+                measured = run_isolated(bench_parse, csv_path, engine, reader)
+            elif stage == "parse_stream":
+                measured = run_isolated(bench_parse_stream, csv_path, engine, reader)
+            elif stage == "parse_gz":
+                gz_path = csv_path + ".gz"
+                if not os.path.exists(gz_path):
+                    prepare_gz(csv_path, gz_path)
+                measured = run_isolated(bench_parse_gz, gz_path, engine, reader)
+            elif stage.startswith("export_"):
+                if not os.path.exists(export_db):
+                    run_isolated(prepare_export_db, csv_path, export_db)
+                measured = run_isolated(bench_export, export_db, stage[len("export_"):])
+            else:
+                total_records, calls_path = run_isolated(prepare_calls, csv_path)
+                try:
+                    measured = run_isolated(bench_db_insert, calls_path, total_records)
+                finally:
+                    os.remove(calls_path)
+            
+            measured["stage"] = stage
+            measured["size"] = rows
+            measured["rows_per_sec"] = round(measured["rows"] / measured["seconds"]) if measured["seconds"] else None
+            measured["calls_per_sec"] = round(measured["calls"] / measured["seconds"]) if measured["seconds"] else None
+            measured["seconds"] = round(measured["seconds"], 3)
+            results.append(measured)
+            
+            print(f"{stage:<13} {rows:>12,} rows  {measured['seconds']:>9.3f}s  "
+                  f"{measured['rows_per_sec']:>12,} rows/s  {measured['peak_rss_mb']:>9.1f} MB peak")
+        
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(export_db + suffix):
+                os.remove(export_db + suffix)
+    
+    return results
+
+def environment_info(engine: str, reader: str, seed: int) -> dict:
+    """Describe the machine and library versions for comparing runs"""
+    import numpy
+    import pandas
+    
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "engine": engine,
+        "reader": reader,
+        "seed": seed,
+    }
+
+def compare(previous: dict, current: dict, threshold: float) -> list:
+    """
+    Compare rows/sec per (stage, size) against a previous run
+    Returns the list of regressions slower than threshold
+    """
+    baseline = {(r["stage"], r["size"]): r for r in previous.get("results", [])}
+    regressions = []
+    
+    print(f"\n{'stage':<13} {'size':>12}  {'before':>12}  {'after':>12}  {'change':>8}")
+    for result in current["results"]:
+        before = baseline.get((result["stage"], result["size"]))
+        if not before or not before.get("rows_per_sec"):
+            continue
+        change = result["rows_per_sec"] / before["rows_per_sec"] - 1
+        flag = "  REGRESSION" if change < -threshold else ""
+        print(f"{result['stage']:<13} {result['size']:>12,}  {before['rows_per_sec']:>12,}  "
+              f"{result['rows_per_sec']:>12,}  {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append({"stage": result["stage"], "size": result["size"], "change": round(change, 4)})
+    
+    return regressions
+
+def main(argv=None) -> int:
+    """Command line entry point; returns 1 when regressions are found"""
+    parser = argparse.ArgumentParser(description="CDR ingest benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Row counts to benchmark (e.g. 100000 1000000 10000000)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--engine", choices=["columnar", "legacy"], default="columnar")
+    parser.add_argument("--reader", choices=["inferred", "pruned", "arrow"], default="inferred",
+                        help="CSV reader used by the parse stages")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=tempfile.gettempdir(),
+                        help="Where synthetic CSV files are generated and cached")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed rows/sec slowdown before a regression is reported")
+    args = parser.parse_args(argv)
+    
+    current = {
+        "environment": environment_info(args.engine, args.reader, args.seed),
+        "results": run_suite(args.sizes, args.stages, args.engine, args.reader, args.workdir, args.seed),
+    }
+    
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(previous, current, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
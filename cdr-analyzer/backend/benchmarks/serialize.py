@@ -0,0 +1,139 @@
+"""
+/calls response serialization microbenchmark
+
+Times encoding one CallListResponse page two ways on synthetic rows shaped
+like get_calls output:
+
+- models: the previous path, a CallRecord per row (timestamp parsed with
+  fromisoformat), CallListResponse, then FastAPI's response validation and
+  serialization and JSONResponse rendering
+- fast: routes.calls.call_list_response, which encodes the rows directly
+
+Both must produce the same bytes; the benchmark checks that first.
+
+Usage (from the backend directory):
+    python -m benchmarks.serialize --rows 50 100 1000 10000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import fastjson
+from models import CallRecord, CallListResponse
+from routes.calls import call_list_response
+
+DEFAULT_ROWS = [50, 100, 1000, 10000]
+
+# How the route's response_model is checked and serialized
+RESPONSE_FIELD = create_response_field(name="Response_List_Calls", type_=CallListResponse, mode="serialization")
+
+def synthetic_calls(count: int, seed: int = 42) -> list:
+    """Rows shaped like get_calls output, newest first"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 31, 23, 59, 59)
+    calls = []
+    for i in range(count):
+        answered = rng.random() < 0.7
+        calls.append({
+            'unique_id': f"{1738367999 - i * 7}.{rng.randint(1, 99999)}",
+            'timestamp': (start - timedelta(seconds=i * 7)).isoformat(),
+            'caller_number': rng.choice([f"0912{rng.randint(0, 9999999):07d}", "", None]),
+            'extension': str(rng.randint(200, 260)) if answered else None,
+            'status': "ANSWERED" if answered else "MISSED",
+            'duration': rng.randint(1, 900) if answered else 0,
+        })
+    return calls
+
+async def model_response(calls: list, total, page: int, limit: int, next_cursor) -> bytes:
+    """Response body through CallRecord models, as the routes used to build it"""
+    response = CallListResponse(
+        calls=[
+            CallRecord(
+                unique_id=call['unique_id'],
+                timestamp=datetime.fromisoformat(call['timestamp']),
+                caller_number=call['caller_number'],
+                extension=call['extension'],
+                status=call['status'],
+                duration=call['duration']
+            )
+            for call in calls
+        ],
+        total=total,
+        page=page,
+        limit=limit,
+        next_cursor=next_cursor
+    )
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=response)
+    return JSONResponse(content).body
+
+def fast_response(calls: list, total, page: int, limit: int, next_cursor) -> bytes:
+    """Response body of call_list_response"""
+    return call_list_response(calls, total, page, limit, next_cursor).body
+
+async def time_path(encode, args: tuple, min_seconds: float) -> tuple:
+    """(responses per second, seconds per response) over at least min_seconds"""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        result = encode(*args)
+        if asyncio.iscoroutine(result):
+            await result
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return runs / elapsed, elapsed / runs
+
+async def run_benchmark(sizes: list, min_seconds: float) -> list:
+    """Check equal output, then time both paths for each page size"""
+    results = []
+    for rows in sizes:
+        args = (synthetic_calls(rows), rows * 10, 1, rows, "MTczODM2Nzk5OTozMzMzMw")
+        expected = await model_response(*args)
+        if fast_response(*args) != expected:
+            raise AssertionError(f"Fast path output differs from the model path at {rows} rows")
+        
+        _, model_seconds = await time_path(model_response, args, min_seconds)
+        _, fast_seconds = await time_path(fast_response, args, min_seconds)
+        results.append({
+            "rows": rows,
+            "bytes": len(expected),
+            "model_us": round(model_seconds * 1e6, 1),
+            "fast_us": round(fast_seconds * 1e6, 1),
+            "model_rows_per_sec": round(rows / model_seconds),
+            "fast_rows_per_sec": round(rows / fast_seconds),
+            "speedup": round(model_seconds / fast_seconds, 1),
+        })
+    return results
+
+def main(argv=None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="/calls response serialization microbenchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Calls per response")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Minimum time per measurement")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args(argv)
+    
+    encoder = "orjson " + fastjson.orjson.__version__ if fastjson.orjson else "json (stdlib)"
+    print(f"fast path encoder: {encoder}")
+    results = asyncio.run(run_benchmark(args.rows, args.seconds))
+    
+    print(f"\n{'rows':>7} {'bytes':>10} {'models us':>11} {'fast us':>9} {'speedup':>8}")
+    for result in results:
+        print(f"{result['rows']:>7,} {result['bytes']:>10,} {result['model_us']:>11,} "
+              f"{result['fast_us']:>9,} {result['speedup']:>7}x")
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"encoder": encoder, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
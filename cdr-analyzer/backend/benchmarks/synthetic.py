@@ -0,0 +1,167 @@
+"""
+Deterministic synthetic CDR generator
+Mimics the Asterisk export layout of Example-reports/CDRReport1.csv
+"""
+import random
+from datetime import datetime, timedelta
+
+COLUMNS = [
+    "Date", "Source", "Ring Group", "Destination", "Src. Channel", "Account Code",
+    "Dst. Channel", "Status", "Duration", "UniqueID", "Recording", "Cnum", "Cnam",
+    "Outbound Cnum", "DID", "User Field",
+]
+
+DID = "2191006369"
+RING_GROUP = "counter-rg"
+RING_GROUP_NUMBER = "600"
+RING_GROUP_EXTENSIONS = [str(ext) for ext in range(101, 112)] + ["301", "303", "305"]
+AGENT_EXTENSIONS = [str(ext) for ext in range(201, 210)]
+
+START_TIME = datetime(2025, 12, 9, 0, 0, 0)
+
+class SyntheticCDR:
+    """Generates CDR rows for ring-group, direct and outgoing calls"""
+    
+    def __init__(self, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.now = START_TIME
+        self.epoch = 1765238400
+        self.sequence = 29000
+        self.channel = 0x1000
+    
+    def _next_channel(self, name: str) -> str:
+        """Unique Asterisk channel name like SIP/102-000013e1"""
+        self.channel += 1
+        return f"SIP/{name}-{self.channel:08x}"
+    
+    def _caller(self) -> str:
+        """Phone number in one of the formats the validator accepts"""
+        rng = self.rng
+        mobile = f"9{rng.randint(10, 39)}{rng.randint(0, 9999999):07d}"
+        kind = rng.random()
+        if kind < 0.50:
+            return f"0{mobile}"              # 09XXXXXXXXX
+        if kind < 0.65:
+            return mobile                    # 9XXXXXXXXX
+        if kind < 0.75:
+            return f"+98{mobile}"            # +989XXXXXXXXX
+        if kind < 0.80:
+            return f"98{mobile}"             # 989XXXXXXXXX
+        area = rng.choice(["21", "31", "44", "11", "51"])
+        return f"0{area}{rng.randint(0, 99999999):08d}"  # landline 0XXXXXXXXXX
+    
+    def _duration(self) -> str:
+        """Answered duration in the mixed formats seen in exports"""
+        rng = self.rng
+        seconds = rng.randint(3, 900)
+        kind = rng.random()
+        if kind < 0.05:
+            return str(seconds)
+        if kind < 0.10:
+            return f"{seconds // 60}min {seconds % 60}s"
+        if seconds < 60:
+            return f"{seconds}s"
+        return f"{seconds}s ({seconds // 60}m {seconds % 60}s)"
+    
+    def _row(self, date, source, ring_group, destination, src_channel, dst_channel,
+             status, duration, unique_id, recording, cnum, outbound_cnum, did):
+        """One export row in COLUMNS order"""
+        return [
+            date, source, ring_group, destination, src_channel, "",
+            dst_channel, status, duration, unique_id, recording, cnum, cnum,
+            outbound_cnum, did, "",
+        ]
+    
+    def call(self) -> list:
+        """Generate all legs of one call"""
+        rng = self.rng
+        self.now += timedelta(seconds=rng.randint(1, 40))
+        self.sequence += rng.randint(1, 12)
+        unique_id = f"{self.epoch + int((self.now - START_TIME).total_seconds())}.{self.sequence}"
+        date = self.now.strftime("%Y-%m-%d %H:%M:%S")
+        stamp = self.now.strftime("%Y%m%d-%H%M%S")
+        kind = rng.random()
+        
+        if kind < 0.20:
+            # Outgoing: Source is an extension, filtered out by the processor
+            extension = rng.choice(RING_GROUP_EXTENSIONS)
+            destination = f"909{rng.randint(100000000, 999999999)}"
+            src_channel = self._next_channel(extension)
+            recording = f"out-{destination}-{extension}-{stamp}-{unique_id}.wav"
+            status = rng.choice(["ANSWERED", "BUSY", "NO ANSWER"])
+            duration = self._duration() if status == "ANSWERED" else "0s"
+            return [
+                self._row(date, extension, "", destination, src_channel, "", "BUSY", "0s",
+                          unique_id, recording, extension, DID, ""),
+                self._row(date, extension, "", destination, src_channel, self._next_channel(DID),
+                          status, duration, unique_id, recording, extension, DID, ""),
+            ]
+        
+        caller = self._caller()
+        src_channel = self._next_channel(DID)
+        recording = f"rg-{RING_GROUP_NUMBER}-{caller}-{stamp}-{unique_id}.wav"
+        legs = []
+        
+        if kind < 0.75:
+            # Ring group: every extension rings, most legs NO ANSWER / BUSY
+            for extension in RING_GROUP_EXTENSIONS[:rng.randint(13, 14)]:
+                legs.append(self._row(
+                    date, caller, RING_GROUP, RING_GROUP_NUMBER, src_channel,
+                    self._next_channel(extension), rng.choice(["NO ANSWER", "NO ANSWER", "BUSY"]),
+                    "0s", unique_id, recording, caller, "", DID
+                ))
+        
+        if rng.random() < 0.65:
+            agent = rng.choice(AGENT_EXTENSIONS)
+            legs.append(self._row(
+                date, caller, RING_GROUP, agent, src_channel, self._next_channel(agent),
+                "ANSWERED", self._duration(), unique_id, recording, caller, "", DID
+            ))
+        elif not legs:
+            agent = rng.choice(AGENT_EXTENSIONS)
+            legs.append(self._row(
+                date, caller, RING_GROUP, agent, src_channel, self._next_channel(agent),
+                "NO ANSWER", "0s", unique_id, recording, caller, "", DID
+            ))
+        
+        return legs
+    
+    def rows(self, count: int):
+        """
+        Yield exactly count rows
+        A few calls have trailing legs exported after the next call, as in
+        real exports where legs of one UniqueID are not always adjacent
+        """
+        produced = 0
+        held_back = []
+        
+        while produced < count:
+            legs = self.call()
+            if held_back:
+                legs = legs + held_back
+                held_back = []
+            elif len(legs) > 4 and self.rng.random() < 0.05:
+                held_back = legs[-3:]
+                legs = legs[:-3]
+            
+            for leg in legs:
+                if produced >= count:
+                    return
+                yield leg
+                produced += 1
+
+def format_row(values) -> str:
+    """Quote every field and keep the export's trailing comma"""
+    return ",".join(f'"{value}"' for value in values) + ",\n"
+
+def generate_cdr_csv(path: str, rows: int, seed: int = 42) -> str:
+    """
+    Write a synthetic CDR export with exactly rows data rows
+    The same seed always produces the same file
+    """
+    generator = SyntheticCDR(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(format_row(COLUMNS))
+        for row in generator.rows(rows):
+            f.write(format_row(row))
+    return path
@@ -0,0 +1,101 @@
+"""
+Response cache for the read-only stats and calls endpoints
+Entries are keyed by endpoint and normalized parameters and remember the
+data generation they were computed at. Every committed write (ingest,
+clear, partition drops, purges) bumps the generation, so all older entries
+go stale at once; the least recently used entries are evicted beyond
+CACHE_SIZE.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from database import data_generation
+
+# Cached responses kept; 0 disables the cache
+CACHE_SIZE = int(os.environ.get("CDR_CACHE_SIZE", "512"))
+
+class ResponseCache:
+    """Bounded LRU cache of endpoint results, invalidated by data generation"""
+    
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0
+    
+    def get(self, key: tuple) -> tuple:
+        """(True, value) for a fresh entry, (False, None) otherwise"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                generation, value = entry
+                if generation == data_generation():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+                self.stale += 1
+            self.misses += 1
+            return False, None
+    
+    def put(self, key: tuple, generation: int, value: Any):
+        """
+        Store value computed at generation
+        Ignored if the data changed while it was being computed
+        """
+        if not self.max_entries or generation != data_generation():
+            return
+        with self._lock:
+            self._entries[key] = (generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.stale = 0
+    
+    def stats(self) -> dict:
+        """Size, hit/miss counters and hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'generation': data_generation(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'stale': self.stale,
+            }
+
+response_cache = ResponseCache()
+
+def cache_key(endpoint: str, **params) -> tuple:
+    """Key of an endpoint call; parameters are sorted and None values left out"""
+    return (endpoint,) + tuple(sorted((name, value) for name, value in params.items() if value is not None))
+
+async def cached(key: tuple, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Cached result for key, or the result of awaiting compute(), which is
+    cached unless the data changed in the meantime
+    Results are shared between requests and must not be modified
+    """
+    hit, value = response_cache.get(key)
+    if hit:
+        return value
+    generation = data_generation()
+    value = await compute()
+    response_cache.put(key, generation, value)
+    return value
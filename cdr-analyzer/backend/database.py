@@ -2,169 +2,990 @@
 Database configuration and schema for SQLite
 """
 import sqlite3
+import asyncio
+import base64
+import calendar
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Generator
+from functools import partial
+from datetime import date, datetime, timezone
+from typing import Callable, Generator, Iterator, Optional
 import os
 
-DATABASE_PATH = "cdr.db"
+from partitions import (
+    UNDATED_PARTITION, COLUMNS, PARTITION_SCHEMA, TS_EPOCH_SQL, CALL_DATE_SQL,
+    partition_key, partition_table, list_partitions, partition_keys, partition_tables,
+    month_bounds, month_days, month_label, shift_month, view_statements, parse_iso_datetime,
+)
+from rollups import init_rollups, init_rollup_triggers, rebuild_rollups, forget_rollup_days
+from rollups import count_calls, epoch_day, ROLLUP_TABLES, LEGACY_TRIGGER_NAMES
+from search import init_search_index, rebuild_search_index, forget_search_index, caller_search_clause
+from search import index_new_rows, search_table, has_search_index
+from sketches import init_sketches, sketch_new_rows, rebuild_sketches, forget_sketch_days
+
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "cdr.db")
+
+# Connection pool settings
+POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", "8"))
+# Seconds to wait for a free pooled connection, and for SQLite locks
+POOL_TIMEOUT = float(os.environ.get("DATABASE_TIMEOUT", "30"))
+# Per-connection page cache and memory-mapped I/O sizes
+CACHE_SIZE_MB = int(os.environ.get("DATABASE_CACHE_SIZE_MB", "64"))
+MMAP_SIZE_MB = int(os.environ.get("DATABASE_MMAP_SIZE_MB", "256"))
+# Months of calls to keep, counting the current one; 0 keeps everything
+RETENTION_MONTHS = int(os.environ.get("CDR_RETENTION_MONTHS", "0"))
+
+class ConnectionPool:
+    """
+    Fixed-size pool of long-lived SQLite connections
+    Connections are opened lazily and reused across requests and threads
+    """
+    
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        # Idle connections, most recently used last; guarded by _available
+        self._idle = []
+        self._lock = threading.Lock()
+        # Signalled whenever a connection goes idle or a slot frees up
+        self._available = threading.Condition(self._lock)
+        self._opened = 0
+        self._closed = False
+        
+        # Metrics
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_checkout_seconds = 0.0
+        self.max_checkout_seconds = 0.0
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with WAL journaling and the tuned pragmas"""
+        # check_same_thread=False: a connection may be returned by another thread
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        # Lets purges hand pages back with incremental_vacuum; only takes
+        # effect on a new database, so it must come before journal_mode
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        # NORMAL is durable against corruption in WAL mode and avoids an fsync per commit
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = {-CACHE_SIZE_MB * 1024}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_MB * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+    
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Check out a connection, opening a new one while below size
+        Raises TimeoutError if none is free within the pool timeout
+        """
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        waited = False
+        
+        with self._available:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._opened < self.size:
+                    self._opened += 1
+                    conn = None
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise TimeoutError(
+                        f"No database connection free after {self.timeout}s (pool size {self.size})"
+                    )
+                waited = True
+                self._available.wait(remaining)
+        
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._available:
+                    self._opened -= 1
+                    self._available.notify()
+                raise
+        
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            if waited:
+                self.waits += 1
+                self.total_wait_seconds += elapsed
+                self.max_wait_seconds = max(self.max_wait_seconds, elapsed)
+            self.checkouts += 1
+            self.total_checkout_seconds += elapsed
+            self.max_checkout_seconds = max(self.max_checkout_seconds, elapsed)
+        return conn
+    
+    def release(self, conn: sqlite3.Connection, discard: bool = False):
+        """
+        Return a connection to the pool, or close it if discard is set
+        Either way one waiting acquire is woken: by the idle connection, or
+        by the free slot to open a new one in
+        """
+        if not discard and not self._closed:
+            try:
+                # Never hand out a connection with a transaction left open
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                pass
+            else:
+                with self._available:
+                    self._idle.append(conn)
+                    self._available.notify()
+                return
+        
+        conn.close()
+        with self._available:
+            self._opened -= 1
+            self._available.notify()
+    
+    def close(self):
+        """Close all idle connections; checked-out ones close on release"""
+        self._closed = True
+        with self._available:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                # Refresh planner statistics for the tables this connection used
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            conn.close()
+            with self._available:
+                self._opened -= 1
+                self._available.notify()
+    
+    def stats(self) -> dict:
+        """Pool usage counters and checkout latency"""
+        with self._lock:
+            idle = len(self._idle)
+            return {
+                'database_path': self.path,
+                'size': self.size,
+                'open': self._opened,
+                'idle': idle,
+                'in_use': self._opened - idle,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.total_wait_seconds / self.waits * 1000, 3) if self.waits else 0.0,
+                'max_wait_ms': round(self.max_wait_seconds * 1000, 3),
+                'avg_checkout_ms': round(self.total_checkout_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_checkout_ms': round(self.max_checkout_seconds * 1000, 3),
+            }
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+# Threads the async routes run their queries on, one per pooled connection,
+# so a slow query never blocks the event loop
+_query_threads: Optional[ThreadPoolExecutor] = None
+
+# Data generation, bumped after every committed write; cached responses
+# computed at an older generation are stale
+_generation = 0
+_generation_lock = threading.Lock()
+
+def data_generation() -> int:
+    """Current data generation"""
+    return _generation
+
+def bump_data_generation() -> int:
+    """Mark all data read so far as stale; call after committing a write"""
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        return _generation
+
+def get_pool() -> ConnectionPool:
+    """Shared pool for DATABASE_PATH, rebuilt if the path changes"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DATABASE_PATH:
+            if _pool is not None:
+                _pool.close()
+                # Another database: nothing read from the old one applies
+                bump_data_generation()
+            _pool = ConnectionPool(DATABASE_PATH)
+        return _pool
+
+def close_pool():
+    """Stop the query threads and close the shared pool's connections (on shutdown)"""
+    global _pool, _query_threads
+    with _pool_lock:
+        threads, _query_threads = _query_threads, None
+    # Outside the lock: running queries still check out connections
+    if threads is not None:
+        threads.shutdown(wait=True)
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def get_query_threads() -> ThreadPoolExecutor:
+    """Thread pool for run_db, sized to the connection pool"""
+    global _query_threads
+    with _pool_lock:
+        if _query_threads is None:
+            _query_threads = ThreadPoolExecutor(max_workers=max(1, POOL_SIZE), thread_name_prefix="cdr-query")
+        return _query_threads
+
+def _call_with_db(fn: Callable, args: tuple, kwargs: dict):
+    """Call fn(conn, *args, **kwargs) with a pooled connection"""
+    with get_db() as conn:
+        return fn(conn, *args, **kwargs)
+
+async def run_db(fn: Callable, *args, **kwargs):
+    """
+    Await fn(conn, *args, **kwargs) run on a query thread with a pooled connection
+    The connection is committed (or rolled back on error) as with get_db()
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_query_threads(), partial(_call_with_db, fn, args, kwargs))
 
 def get_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    """Get a new, unpooled database connection"""
+    conn = sqlite3.connect(DATABASE_PATH, timeout=POOL_TIMEOUT)
     conn.row_factory = sqlite3.Row  # Enable column access by name
     return conn
 
 @contextmanager
 def get_db() -> Generator[sqlite3.Connection, None, None]:
-    """Context manager for database connections"""
-    conn = get_connection()
+    """
+    Context manager for pooled database connections
+    Bumps the data generation if the connection wrote anything
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    changes = conn.total_changes
+    discard = False
     try:
         yield conn
         conn.commit()
+        if conn.total_changes != changes:
+            bump_data_generation()
     except Exception as e:
-        conn.rollback()
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            discard = True
         raise e
     finally:
-        conn.close()
+        pool.release(conn, discard)
+
+# Indexes on each call_records partition, named idx_<partition>_<key>,
+# each designed around queries that run:
+CALL_RECORDS_INDEXES = {
+    # get_calls: date-range filter and keyset order (ts_epoch, unique_id)
+    "ts_epoch_unique_id": "ts_epoch, unique_id",
+    # Stats over the partial edge days of a range (rollups.query_daily_stats,
+    # query_extension_stats, query_interval_stats, query_heatmap): covers
+    # every column they read
+    "ts_epoch_stats": "ts_epoch, status, call_date, extension, duration",
+}
 
 def init_db():
     """Initialize database schema"""
     with get_db() as conn:
         cursor = conn.cursor()
         
-        # Create call_records table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS call_records (
-                unique_id TEXT PRIMARY KEY,
-                timestamp TEXT NOT NULL,
-                caller_number TEXT,
-                extension TEXT,
-                status TEXT CHECK(status IN ('ANSWERED', 'MISSED')) NOT NULL,
-                duration INTEGER DEFAULT 0,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # Statistics rollups; backfilled below when added to an existing database
+        rebuild = init_rollups(cursor)
+        
+        forget_search_index(DATABASE_PATH)
+        
+        # Databases from before partitioning keep every call in one table
+        if migrate_to_partitions(conn):
+            rebuild = True
         
-        # Create indexes for performance
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_timestamp 
-            ON call_records(timestamp)
-        """)
+        # (Re)create every partition's indexes and triggers, so changes to
+        # them reach existing databases
+        for table in [UNDATED_PARTITION] + [partition_table(key) for key in list_partitions(conn)]:
+            if create_partition(cursor, table):
+                # Trigram index for phone search, backfilled the same way
+                rebuild_search_index(conn, table)
+        refresh_view(conn)
         
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_status 
-            ON call_records(status)
-        """)
+        if rebuild:
+            rebuild_rollups(conn)
         
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_caller_number 
-            ON call_records(caller_number)
-        """)
+        # Unique-caller sketches are built from the daily_callers rollup
+        if init_sketches(cursor) or rebuild:
+            rebuild_sketches(conn)
         
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_extension 
-            ON call_records(extension)
-        """)
+        if RETENTION_MONTHS > 0:
+            apply_retention(conn, RETENTION_MONTHS)
         
         conn.commit()
+        # Schema changes don't count as row changes
+        bump_data_generation()
         print("✅ Database initialized successfully")
 
-def insert_call_record(conn: sqlite3.Connection, record: dict) -> bool:
+def create_partition(cursor: sqlite3.Cursor, table: str) -> bool:
     """
-    Insert a call record into database
-    Returns True if inserted, False if duplicate
+    Create a partition table with its indexes, rollup triggers and search index
+    Returns True if the search index was new and needs a rebuild
+    """
+    cursor.execute(PARTITION_SCHEMA.format(table=table))
+    # Partitions created before uploads recorded their source file
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if 'source' not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN source TEXT")
+    for name, columns in CALL_RECORDS_INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{name} ON {table}({columns})")
+    init_rollup_triggers(cursor, table)
+    created = init_search_index(cursor, table)
+    if created:
+        forget_search_index(DATABASE_PATH)
+    return created
+
+def refresh_view(conn: sqlite3.Connection):
+    """Recreate the call_records view over the current partitions"""
+    tables = [partition_table(key) for key in list_partitions(conn)] + [UNDATED_PARTITION]
+    for statement in view_statements(tables):
+        conn.execute(statement)
+
+def ensure_partition(conn: sqlite3.Connection, key: Optional[str]) -> str:
+    """Table for a partition key, created (and added to the view) if missing"""
+    table = partition_table(key)
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    if row is None:
+        create_partition(conn.cursor(), table)
+        refresh_view(conn)
+    return table
+
+def migrate_to_partitions(conn: sqlite3.Connection) -> int:
+    """
+    Move a pre-partitioning call_records table into monthly partitions, one
+    month per transaction, then replace it with the view
+    Rollups must be rebuilt afterwards
+    Returns the number of rows moved
+    """
+    cursor = conn.cursor()
+    row = cursor.execute("SELECT type FROM sqlite_master WHERE name = 'call_records'").fetchone()
+    if row is None or row['type'] != 'table':
+        return 0
+    
+    # Databases created before ts_epoch/call_date existed
+    migrate_timestamp_columns(conn)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ts_epoch_unique_id ON call_records(ts_epoch, unique_id)")
+    
+    keys = [row[0] for row in cursor.execute("""
+        SELECT DISTINCT strftime('%Y%m', ts_epoch, 'unixepoch') FROM call_records
+        WHERE ts_epoch IS NOT NULL
+    """)]
+    
+    legacy_columns = {row['name'] for row in cursor.execute("PRAGMA table_info(call_records)")}
+    columns = ", ".join(COLUMNS)
+    select_columns = ", ".join(c if c in legacy_columns else f"NULL AS {c}" for c in COLUMNS)
+    moved = 0
+    # The undated partition first: search index availability is read from it
+    for key in [None] + keys:
+        table = partition_table(key)
+        create_partition(cursor, table)
+        if key is None:
+            where_sql, params = "ts_epoch IS NULL", []
+        else:
+            where_sql, params = "ts_epoch >= ? AND ts_epoch < ?", list(month_bounds(key))
+        # OR IGNORE makes a rerun after an interrupted migration safe
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO {table} ({columns})
+            SELECT {select_columns} FROM call_records WHERE {where_sql}
+        """, params)
+        rows = cursor.rowcount
+        if rows and has_search_index(conn, DATABASE_PATH):
+            rebuild_search_index(conn, table)
+        moved += rows
+        conn.commit()
+    
+    for name in LEGACY_TRIGGER_NAMES + ("trg_search_delete", "trg_search_update"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("DROP TABLE IF EXISTS call_records_fts")
+    cursor.execute("DROP TABLE call_records")
+    refresh_view(conn)
+    conn.commit()
+    
+    print(f"✅ Migrated {moved} call records into {len(keys)} monthly partitions")
+    return moved
+
+# Rows per UPDATE while backfilling ts_epoch/call_date
+MIGRATION_BATCH_SIZE = 100000
+
+def migrate_timestamp_columns(conn: sqlite3.Connection) -> int:
+    """
+    Add and backfill ts_epoch and call_date on a pre-partitioning
+    call_records table, in rowid batches committed one at a time
+    Returns the number of rows backfilled
     """
     cursor = conn.cursor()
+    columns = {row['name'] for row in cursor.execute("PRAGMA table_info(call_records)")}
+    if {'ts_epoch', 'call_date'} <= columns:
+        return 0
+    
+    if 'ts_epoch' not in columns:
+        cursor.execute("ALTER TABLE call_records ADD COLUMN ts_epoch INTEGER")
+    if 'call_date' not in columns:
+        cursor.execute("ALTER TABLE call_records ADD COLUMN call_date TEXT")
+    conn.commit()
+    
+    last_rowid = cursor.execute("SELECT COALESCE(MAX(rowid), 0) FROM call_records").fetchone()[0]
+    migrated = 0
+    for start in range(0, last_rowid, MIGRATION_BATCH_SIZE):
+        cursor.execute(f"""
+            UPDATE call_records
+            SET ts_epoch = {TS_EPOCH_SQL.format('timestamp')},
+                call_date = {CALL_DATE_SQL.format('timestamp')}
+            WHERE rowid > ? AND rowid <= ?
+        """, (start, start + MIGRATION_BATCH_SIZE))
+        migrated += cursor.rowcount
+        conn.commit()
+    
+    print(f"✅ Migrated {migrated} call records to epoch timestamps")
+    return migrated
+
+def date_bound_epoch(value: Optional[str]) -> Optional[int]:
+    """
+    Epoch seconds of an ISO date or datetime filter bound
+    Offsets are converted to UTC; naive values are read as stored timestamps
+    Raises ValueError for unparseable bounds
+    """
+    if not value:
+        return None
     try:
-        cursor.execute("""
-            INSERT INTO call_records 
-            (unique_id, timestamp, caller_number, extension, status, duration)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            record['unique_id'],
-            record['timestamp'],
-            record['caller_number'],
-            record['extension'],
-            record['status'],
-            record['duration']
-        ))
-        return True
-    except sqlite3.IntegrityError:
-        # Duplicate unique_id
-        return False
+        parsed = parse_iso_datetime(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return calendar.timegm(parsed.timetuple())
+
+def check_date_bounds(*values: Optional[str]):
+    """Raise ValueError if any date filter bound is unparseable"""
+    for value in values:
+        date_bound_epoch(value)
+
+# Rows per executemany() call in insert_call_records
+INSERT_BATCH_SIZE = 10000
+
+# Bound parameters per lookup in existing_unique_ids (SQLite allowed 999
+# before 3.32)
+ID_LOOKUP_CHUNK = 500
+
+def existing_unique_ids(conn: sqlite3.Connection, tables: list, unique_ids: list) -> set:
+    """The unique_ids already stored in any of tables"""
+    found = set()
+    for table in tables:
+        for start in range(0, len(unique_ids), ID_LOOKUP_CHUNK):
+            chunk = unique_ids[start:start + ID_LOOKUP_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            found.update(row[0] for row in conn.execute(
+                f"SELECT unique_id FROM {table} WHERE unique_id IN ({placeholders})", chunk
+            ))
+    return found
+
+def insert_call_records(conn: sqlite3.Connection, records: list,
+                        batch_size: int = INSERT_BATCH_SIZE, source: Optional[str] = None) -> tuple:
+    """
+    Bulk insert call records with INSERT OR IGNORE inside one transaction,
+    each into the partition of its month
+    source names the uploaded file, unless a record has its own 'source'
+    Commits the load itself unless the caller already has a transaction open
+    Returns (inserted, skipped) where skipped counts duplicates
+    
+    Duplicates are detected within a partition and the months either side
+    of it: unique_ids are tied to the call's start time, but a re-sent call
+    whose time was read with another UTC offset can cross a month boundary.
+    Undated calls are only checked against each other.
+    """
+    if not records:
+        return 0, 0
+    
+    cursor = conn.cursor()
+    # Pooled connections already use the bulk-friendly synchronous, cache
+    # and temp_store settings (see ConnectionPool._connect)
+    owns_transaction = not conn.in_transaction
+    
+    by_partition = {}
+    for record in records:
+        by_partition.setdefault(partition_key(record['timestamp']), []).append(record)
+    
+    inserted = 0
+    try:
+        for key, partition_records in by_partition.items():
+            table = ensure_partition(conn, key)
+            neighbours = []
+            if key is not None:
+                keys = set(list_partitions(conn))
+                neighbours = [partition_table(other) for other in (shift_month(key, -1), shift_month(key, 1))
+                              if other in keys]
+            
+            # New rows get rowids above the partition's current maximum; they
+            # are added to its search index and the caller sketches once written
+            last_rowid = cursor.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+            partition_inserted = 0
+            for start in range(0, len(partition_records), batch_size):
+                batch = partition_records[start:start + batch_size]
+                if neighbours:
+                    stored = existing_unique_ids(conn, neighbours, [record['unique_id'] for record in batch])
+                    batch = [record for record in batch if record['unique_id'] not in stored]
+                    if not batch:
+                        continue
+                cursor.executemany(f"""
+                    INSERT OR IGNORE INTO {table} 
+                    (unique_id, timestamp, caller_number, extension, status, duration, source, ts_epoch, call_date)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, {TS_EPOCH_SQL.format('?2')}, {CALL_DATE_SQL.format('?2')})
+                """, [
+                    (
+                        record['unique_id'],
+                        record['timestamp'],
+                        record['caller_number'],
+                        record['extension'],
+                        record['status'],
+                        record['duration'],
+                        record.get('source', source)
+                    )
+                    for record in batch
+                ])
+                # Ignored rows (duplicate unique_id) don't count as changes;
+                # unlike total_changes, rowcount excludes rollup trigger writes
+                partition_inserted += cursor.rowcount
+            
+            if partition_inserted:
+                index_new_rows(conn, DATABASE_PATH, table, last_rowid)
+                sketch_new_rows(conn, table, last_rowid)
+            inserted += partition_inserted
+        
+        if owns_transaction:
+            conn.commit()
+            bump_data_generation()
+    except Exception:
+        if owns_transaction:
+            conn.rollback()
+        raise
+    
+    return inserted, len(records) - inserted
+
+def encode_cursor(ts_epoch: int, unique_id: str) -> str:
+    """Opaque pagination cursor for the row after (ts_epoch, unique_id)"""
+    raw = json.dumps([ts_epoch, unique_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decode a cursor made by encode_cursor
+    Raises ValueError if it is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts_epoch, unique_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if type(ts_epoch) is not int or not isinstance(unique_id, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return ts_epoch, unique_id
+
+def _date_clauses(from_epoch: Optional[int], to_epoch: Optional[int]) -> tuple:
+    """(clauses, params) bounding ts_epoch; either bound may be None"""
+    clauses = []
+    params = []
+    if from_epoch is not None:
+        clauses.append("ts_epoch >= ?")
+        params.append(from_epoch)
+    if to_epoch is not None:
+        clauses.append("ts_epoch <= ?")
+        params.append(to_epoch)
+    return clauses, params
+
+def _partition_where(conn: sqlite3.Connection, table: str, clauses: list, params: list,
+                     search: Optional[str]) -> tuple:
+    """WHERE clause and params for one partition, adding its phone search condition"""
+    clauses = list(clauses)
+    params = list(params)
+    if search:
+        search_sql, search_params = caller_search_clause(conn, DATABASE_PATH, search, table)
+        clauses.append(search_sql)
+        params += search_params
+    return " AND ".join(clauses) if clauses else "1=1", params
 
 def get_calls(conn: sqlite3.Connection, 
               page: int = 1, 
               limit: int = 50,
               from_date: str = None,
               to_date: str = None,
-              search: str = None) -> tuple:
+              search: str = None,
+              cursor: str = None,
+              include_total: bool = False) -> tuple:
     """
-    Get paginated list of calls with optional filters
-    Returns (calls, total_count)
+    Get a page of calls, newest first, with optional filters
+    
+    Pages are read by keyset on (ts_epoch, unique_id): pass the previous
+    page's next_cursor as cursor. Without a cursor, page > 1 falls back to
+    OFFSET. The total is only computed when include_total is set.
+    Partitions are read newest first, only those overlapping the date range
+    and the cursor, until the page is full.
+    
+    Returns (calls, total, next_cursor); total is None unless requested and
+    next_cursor is None on the last page
     """
-    cursor = conn.cursor()
+    db_cursor = conn.cursor()
     
-    # Build WHERE clause
-    where_clauses = []
-    params = []
+    from_epoch = date_bound_epoch(from_date)
+    to_epoch = date_bound_epoch(to_date)
+    where_clauses, params = _date_clauses(from_epoch, to_epoch)
     
-    if from_date:
-        where_clauses.append("timestamp >= ?")
-        params.append(from_date)
+    def partition_where(table: str, clauses: list, clause_params: list) -> tuple:
+        return _partition_where(conn, table, clauses, clause_params, search)
     
-    if to_date:
-        where_clauses.append("timestamp <= ?")
-        params.append(to_date)
+    total = None
+    if include_total:
+        if search:
+            total = 0
+            for table in partition_tables(conn, from_epoch, to_epoch):
+                where_sql, where_params = partition_where(table, where_clauses, params)
+                db_cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where_sql}", where_params)
+                total += db_cursor.fetchone()[0]
+        else:
+            # Date-only filters are counted from the daily rollups
+            total = count_calls(conn, from_epoch, to_epoch)
     
-    if search:
-        where_clauses.append("caller_number LIKE ?")
-        params.append(f"%{search}%")
+    page_clauses = list(where_clauses)
+    page_params = list(params)
+    upper_epoch = to_epoch
+    offset = 0
+    if cursor:
+        after_epoch, after_unique_id = decode_cursor(cursor)
+        page_clauses.append("(ts_epoch, unique_id) < (?, ?)")
+        page_params += [after_epoch, after_unique_id]
+        upper_epoch = after_epoch if to_epoch is None else min(to_epoch, after_epoch)
+    else:
+        offset = (page - 1) * limit
     
-    where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
+    # One extra row tells whether another page follows
+    calls = []
+    for table in partition_tables(conn, from_epoch, upper_epoch, newest_first=True):
+        where_sql, where_params = partition_where(table, page_clauses, page_params)
+        if offset:
+            # Skip whole partitions that lie before the requested page
+            db_cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where_sql}", where_params)
+            count = db_cursor.fetchone()[0]
+            if count <= offset:
+                offset -= count
+                continue
+        
+        db_cursor.execute(f"""
+            SELECT unique_id, timestamp, caller_number, extension, status, duration, ts_epoch
+            FROM {table}
+            WHERE {where_sql}
+            ORDER BY ts_epoch DESC, unique_id DESC
+            LIMIT ? OFFSET ?
+        """, where_params + [limit + 1 - len(calls), offset])
+        calls += [dict(row) for row in db_cursor.fetchall()]
+        offset = 0
+        if len(calls) > limit:
+            break
     
-    # Get total count
-    cursor.execute(f"SELECT COUNT(*) FROM call_records WHERE {where_sql}", params)
-    total = cursor.fetchone()[0]
+    next_cursor = None
+    if len(calls) > limit:
+        calls = calls[:limit]
+        next_cursor = encode_cursor(calls[-1]['ts_epoch'], calls[-1]['unique_id'])
     
-    # Get paginated results
-    offset = (page - 1) * limit
-    query_params = params + [limit, offset]
+    for call in calls:
+        del call['ts_epoch']
     
-    cursor.execute(f"""
-        SELECT unique_id, timestamp, caller_number, extension, status, duration
-        FROM call_records
-        WHERE {where_sql}
-        ORDER BY timestamp DESC
-        LIMIT ? OFFSET ?
-    """, query_params)
+    return calls, total, next_cursor
+
+# Rows per fetchmany() batch while exporting
+EXPORT_BATCH_SIZE = 10000
+
+# Columns exported by default, as in the /calls response
+EXPORT_COLUMNS = ("unique_id", "timestamp", "caller_number", "extension", "status", "duration")
+
+def iter_calls(conn: sqlite3.Connection,
+               from_date: str = None,
+               to_date: str = None,
+               search: str = None,
+               columns: tuple = EXPORT_COLUMNS,
+               batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[list]:
+    """
+    Yield every call matching get_calls' filters, newest first, in lists of
+    up to batch_size tuples of columns
     
-    calls = [dict(row) for row in cursor.fetchall()]
+    Rows are fetched a batch at a time from one cursor per partition, so
+    memory stays bounded whatever the number of matches. The whole export
+    reads one snapshot; ingest keeps writing meanwhile.
+    Raises ValueError for unknown columns or unparseable dates
+    """
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    from_epoch = date_bound_epoch(from_date)
+    to_epoch = date_bound_epoch(to_date)
+    clauses, params = _date_clauses(from_epoch, to_epoch)
     
-    return calls, total
+    db_cursor = conn.cursor()
+    # Plain tuples: Row objects would double the per-row cost
+    db_cursor.row_factory = None
+    owns_transaction = not conn.in_transaction
+    if owns_transaction:
+        db_cursor.execute("BEGIN")
+    try:
+        for table in partition_tables(conn, from_epoch, to_epoch, newest_first=True):
+            where_sql, where_params = _partition_where(conn, table, clauses, params, search)
+            db_cursor.execute(f"""
+                SELECT {", ".join(columns)}
+                FROM {table}
+                WHERE {where_sql}
+                ORDER BY ts_epoch DESC, unique_id DESC
+            """, where_params)
+            while True:
+                rows = db_cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+    finally:
+        if owns_transaction:
+            conn.rollback()
 
-def clear_all_data(conn: sqlite3.Connection) -> int:
+def _all_partition_tables(conn: sqlite3.Connection) -> list:
+    """Every partition table, the undated one last"""
+    return [partition_table(key) for key in list_partitions(conn)] + [UNDATED_PARTITION]
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection) -> Generator[None, None, None]:
     """
-    Clear all data from call_records table
-    Returns the number of records deleted
+    Run the block in one transaction, committed at its end and rolled back
+    on error, unless the caller already has one open
+    sqlite3 runs DROP TABLE in autocommit outside a transaction, so schema
+    changes must begin one explicitly to stay atomic with their data
     """
-    cursor = conn.cursor()
+    owns_transaction = not conn.in_transaction
+    if owns_transaction:
+        conn.execute("BEGIN")
+    try:
+        yield
+        if owns_transaction:
+            conn.commit()
+    except Exception:
+        if owns_transaction:
+            conn.rollback()
+        raise
+
+def _drop_partition_tables(conn: sqlite3.Connection, table: str):
+    """Drop a partition and its search index; its indexes and triggers go with it"""
+    conn.execute(f"DROP TABLE IF EXISTS {search_table(table)}")
+    conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+def drop_partition(conn: sqlite3.Connection, key: str) -> int:
+    """
+    Drop a month's partition, removing its calls and rollup days without
+    touching rows one by one
+    Returns the number of calls dropped, 0 if the partition doesn't exist
+    """
+    if key not in list_partitions(conn):
+        return 0
     
-    # Get count before deletion
-    cursor.execute("SELECT COUNT(*) FROM call_records")
-    count = cursor.fetchone()[0]
+    first_day, end_day = month_days(key)
+    row = conn.execute(
+        "SELECT COALESCE(SUM(total), 0) FROM daily_stats WHERE call_date >= ? AND call_date < ?",
+        (first_day, end_day)
+    ).fetchone()
     
-    # Delete all records
-    cursor.execute("DELETE FROM call_records")
+    # The drop, the rollup and sketch days and the view change together
+    with _transaction(conn):
+        _drop_partition_tables(conn, partition_table(key))
+        forget_rollup_days(conn, first_day, end_day)
+        forget_sketch_days(conn, first_day, end_day)
+        refresh_view(conn)
+    bump_data_generation()
     
-    # Reset autoincrement if sqlite_sequence table exists
-    try:
-        cursor.execute("DELETE FROM sqlite_sequence WHERE name='call_records'")
-    except sqlite3.OperationalError:
-        # Table doesn't exist, which is fine
-        pass
+    print(f"✅ Dropped partition {month_label(key)}: {row[0]} records")
+    return row[0]
+
+def partition_stats(conn: sqlite3.Connection) -> list:
+    """Every partition with its call count (from the rollups for dated ones), oldest first"""
+    partitions = []
+    for key in list_partitions(conn):
+        first_day, end_day = month_days(key)
+        row = conn.execute(
+            "SELECT COALESCE(SUM(total), 0) FROM daily_stats WHERE call_date >= ? AND call_date < ?",
+            (first_day, end_day)
+        ).fetchone()
+        partitions.append({'month': month_label(key), 'table': partition_table(key), 'calls': row[0]})
+    
+    row = conn.execute(f"SELECT COUNT(*) FROM {UNDATED_PARTITION}").fetchone()
+    partitions.append({'month': None, 'table': UNDATED_PARTITION, 'calls': row[0]})
+    return partitions
+
+def apply_retention(conn: sqlite3.Connection, keep_months: int, today: Optional[date] = None) -> list:
+    """
+    Drop partitions older than the last keep_months months (the current
+    month included)
+    Returns the dropped months as YYYY-MM
+    """
+    today = today or datetime.now(timezone.utc).date()
+    oldest_kept = shift_month(f"{today.year:04d}{today.month:02d}", 1 - keep_months)
+    
+    dropped = []
+    for key in list_partitions(conn):
+        if key < oldest_kept:
+            drop_partition(conn, key)
+            dropped.append(month_label(key))
+    return dropped
+
+# Rowids per DELETE while purging; each batch is its own short transaction
+PURGE_BATCH_SIZE = 5000
+
+def purge_calls(conn: sqlite3.Connection,
+                from_date: str = None,
+                to_date: str = None,
+                extension: str = None,
+                source: str = None,
+                batch_size: int = PURGE_BATCH_SIZE,
+                progress: Optional[Callable[[int, int, int], None]] = None) -> int:
+    """
+    Delete the calls matching every given filter, in small batches
+    
+    Each partition is walked in rowid windows of batch_size, committing
+    after every window so the write lock is only held briefly. A month
+    wholly inside the date range with no other filter is dropped instead.
+    Rollups and search indexes follow through their triggers; the purged
+    days' unique-caller sketches are rebuilt at the end.
+    
+    progress(partitions_done, partitions_total, rows_deleted) is called
+    after each batch. Raises ValueError if no filter is given or a date is
+    unparseable.
+    Returns the number of calls deleted
+    """
+    from_epoch = date_bound_epoch(from_date)
+    to_epoch = date_bound_epoch(to_date)
+    if from_epoch is None and to_epoch is None and not extension and not source:
+        raise ValueError("At least one purge filter is required")
+    
+    clauses = []
+    params = []
+    if from_epoch is not None:
+        clauses.append("ts_epoch >= ?")
+        params.append(from_epoch)
+    if to_epoch is not None:
+        clauses.append("ts_epoch <= ?")
+        params.append(to_epoch)
+    if extension:
+        clauses.append("extension = ?")
+        params.append(extension)
+    if source:
+        clauses.append("source = ?")
+        params.append(source)
+    where_sql = " AND ".join(clauses)
+    
+    keys = partition_keys(conn, from_epoch, to_epoch)
+    if from_epoch is None and to_epoch is None:
+        keys.append(None)
+    whole_months = not extension and not source
+    
+    deleted = 0
+    for done, key in enumerate(keys):
+        if whole_months and key is not None:
+            start, end = month_bounds(key)
+            if (from_epoch is None or from_epoch <= start) and (to_epoch is None or to_epoch >= end - 1):
+                deleted += drop_partition(conn, key)
+                if progress:
+                    progress(done + 1, len(keys), deleted)
+                continue
+        
+        table = partition_table(key)
+        low, high = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+        for window in range(low - 1, high, batch_size) if low is not None else ():
+            cursor = conn.execute(
+                f"DELETE FROM {table} WHERE rowid > ? AND rowid <= ? AND {where_sql}",
+                [window, window + batch_size] + params
+            )
+            deleted += cursor.rowcount
+            conn.commit()
+            bump_data_generation()
+            if progress:
+                progress(done, len(keys), deleted)
+        
+        if progress:
+            progress(done + 1, len(keys), deleted)
+    
+    # Sketches can't forget a caller; recount the purged days
+    if deleted:
+        rebuild_sketches(conn,
+                         epoch_day(from_epoch) if from_epoch is not None else None,
+                         epoch_day(to_epoch) if to_epoch is not None else None)
+        bump_data_generation()
     
+    return deleted
+
+# Free pages handed back per incremental_vacuum step
+VACUUM_STEP_PAGES = 2000
+
+def incremental_vacuum(conn: sqlite3.Connection, step_pages: int = VACUUM_STEP_PAGES,
+                       progress: Optional[Callable[[int], None]] = None) -> Optional[int]:
+    """
+    Return free pages to the filesystem a step at a time
+    progress(pages_freed) is called after each step
+    Returns the number of pages freed, or None if the database was created
+    without auto_vacuum = INCREMENTAL (a one-off offline VACUUM enables it)
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return None
     conn.commit()
     
+    freed = 0
+    while True:
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free_pages:
+            break
+        # executescript steps the pragma to completion; execute() would
+        # free only the first page
+        conn.executescript(f"PRAGMA incremental_vacuum({min(step_pages, free_pages)});")
+        step_freed = free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if step_freed <= 0:
+            break
+        freed += step_freed
+        if progress:
+            progress(freed)
+    
+    # Shrink the file now unless readers still need the WAL
+    conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    return freed
+
+def clear_all_data(conn: sqlite3.Connection) -> int:
+    """
+    Clear all call records by dropping every partition and emptying rollups
+    Returns the number of records deleted
+    """
+    cursor = conn.cursor()
+    
+    tables = _all_partition_tables(conn)
+    count = 0
+    for table in tables:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        count += cursor.fetchone()[0]
+    
+    with _transaction(conn):
+        for table in tables:
+            _drop_partition_tables(conn, table)
+        for table in ROLLUP_TABLES + ("daily_caller_sketches",):
+            cursor.execute(f"DELETE FROM {table}")
+        
+        create_partition(cursor, UNDATED_PARTITION)
+        refresh_view(conn)
+    bump_data_generation()
+    
     print(f"✅ Database cleared: {count} records deleted")
     return count
@@ -0,0 +1,129 @@
+"""
+Streaming export of call records as CSV, NDJSON or Parquet
+Each writer turns the row batches of database.iter_calls into byte chunks
+as they arrive, so a response never holds more than one batch in memory.
+"""
+import csv
+import importlib.util
+import io
+import sqlite3
+from typing import Iterable, Iterator
+
+from database import EXPORT_COLUMNS, get_db, iter_calls
+from fastjson import dumps
+
+# Rows per Parquet row group; also the fetch batch for Parquet exports
+PARQUET_ROW_GROUP_SIZE = 65536
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+def csv_chunks(batches: Iterable[list]) -> Iterator[bytes]:
+    """Header line, then one CSV chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def ndjson_chunks(batches: Iterable[list]) -> Iterator[bytes]:
+    """One JSON object per line, a chunk per batch"""
+    for rows in batches:
+        yield b"".join(dumps(dict(zip(EXPORT_COLUMNS, row))) + b"\n" for row in rows)
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file that hands over what was written since the last drain"""
+    
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        # The Parquet footer records offsets from the start of the stream
+        return self._position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def parquet_supported() -> bool:
+    """Whether pyarrow, which Parquet exports need, is installed"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+def parquet_chunks(batches: Iterable[list]) -> Iterator[bytes]:
+    """
+    A Parquet file written one row group per batch; each row group is sent
+    as soon as it is complete, and the footer last
+    Rows carry ts_epoch after the export columns, for the timestamp column
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = pa.schema([
+        ("unique_id", pa.string()),
+        # Wall-clock start time, like the timestamp text (no time zone)
+        ("timestamp", pa.timestamp("s")),
+        ("caller_number", pa.string()),
+        ("extension", pa.string()),
+        ("status", pa.string()),
+        ("duration", pa.int64()),
+    ])
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for rows in batches:
+            unique_id, _, caller, extension, status, duration, ts_epoch = zip(*rows)
+            writer.write_batch(pa.record_batch([
+                pa.array(unique_id, pa.string()),
+                pa.array(ts_epoch, pa.int64()).cast(pa.timestamp("s")),
+                pa.array(caller, pa.string()),
+                pa.array(extension, pa.string()),
+                pa.array(status, pa.string()),
+                pa.array(duration, pa.int64()),
+            ], schema=schema), row_group_size=len(rows))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_calls(conn: sqlite3.Connection, export_format: str, from_date: str = None,
+                 to_date: str = None, search: str = None) -> Iterator[bytes]:
+    """
+    Byte chunks of the calls matching get_calls' filters, newest first
+    Raises ValueError for an unknown format; Parquet also needs pyarrow
+    (see parquet_supported)
+    """
+    if export_format == "csv":
+        return csv_chunks(iter_calls(conn, from_date, to_date, search))
+    if export_format == "ndjson":
+        return ndjson_chunks(iter_calls(conn, from_date, to_date, search))
+    if export_format == "parquet":
+        return parquet_chunks(iter_calls(conn, from_date, to_date, search,
+                                         columns=EXPORT_COLUMNS + ("ts_epoch",),
+                                         batch_size=PARQUET_ROW_GROUP_SIZE))
+    raise ValueError(f"Unknown export format: {export_format}")
+
+def stream_export(export_format: str, from_date: str = None, to_date: str = None,
+                  search: str = None) -> Iterator[bytes]:
+    """export_calls() on a pooled connection held until the stream ends"""
+    with get_db() as conn:
+        yield from export_calls(conn, export_format, from_date, to_date, search)
@@ -0,0 +1,18 @@
+"""
+JSON encoding for hot response paths
+Uses orjson when it is installed and the standard library otherwise; both
+produce the compact UTF-8 JSON that FastAPI's JSONResponse renders, so the
+wire format does not depend on which one is used.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj) -> bytes:
+    """Compact UTF-8 JSON of dicts, lists, strings, numbers and None"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
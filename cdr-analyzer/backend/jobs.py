@@ -0,0 +1,460 @@
+"""
+Background ingest jobs
+Parsing runs in a process pool, database writes on a single writer thread
+"""
+import asyncio
+import os
+import queue
+import time
+import uuid
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional
+
+from models import JobStatus, PurgeRequest, PurgeStatus
+from processor import process_cdr_file, iter_cdr_file, merge_call_records
+from processor import open_cdr_file, is_compressed_cdr_file, read_if_small
+from database import get_db, insert_call_records, purge_calls, incremental_vacuum
+
+# Job stages, in order
+STAGE_QUEUED = "queued"
+STAGE_PARSING = "parsing"
+STAGE_WRITING = "writing"
+STAGE_DELETING = "deleting"
+STAGE_VACUUMING = "vacuuming"
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+
+# Finished jobs kept for GET /jobs/{id}; oldest are forgotten first
+MAX_FINISHED_JOBS = 100
+
+# Records per insert while writing, so progress advances during large loads
+WRITE_PROGRESS_BATCH = 50000
+
+# How long a wait for a parse worker's next message lasts before checking
+# whether the worker has finished
+MESSAGE_POLL_SECONDS = 0.1
+
+# Batches of calls a parse worker may send ahead of the writer
+MAX_QUEUED_BATCHES = 4
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_manager = None
+_writer: Optional[ThreadPoolExecutor] = None
+_jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+_purge_jobs: "OrderedDict[str, PurgeJob]" = OrderedDict()
+_tasks = set()
+
+def container_cpu_count() -> int:
+    """
+    Number of CPUs available to this container
+    Honours cgroup CPU quotas (v2 and v1) as well as the affinity mask
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    
+    quota_files = [
+        ("/sys/fs/cgroup/cpu.max", None),
+        ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),
+    ]
+    for quota_path, period_path in quota_files:
+        try:
+            with open(quota_path) as f:
+                values = f.read().split()
+            if period_path:
+                with open(period_path) as f:
+                    values.append(f.read().strip())
+            quota, period = values[0], values[1]
+            if quota not in ("max", "-1"):
+                cpus = min(cpus, max(1, int(int(quota) / int(period))))
+            break
+        except (OSError, ValueError, IndexError):
+            continue
+    
+    return max(1, cpus)
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Process pool for CSV parsing, sized to the container's CPUs"""
+    global _parse_pool
+    if _parse_pool is None:
+        # spawn: forking a threaded server process is unsafe
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=container_cpu_count(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _parse_pool
+
+def get_manager():
+    """Manager process whose queues carry messages back from parse workers"""
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.get_context("spawn").Manager()
+    return _manager
+
+def get_writer() -> ThreadPoolExecutor:
+    """Single thread that serializes all ingest writes to SQLite"""
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cdr-writer")
+    return _writer
+
+def _write_with_db(fn: Callable, args: tuple):
+    """Call fn(conn, *args) with a pooled connection"""
+    with get_db() as conn:
+        return fn(conn, *args)
+
+async def run_write(fn: Callable, *args):
+    """
+    Await fn(conn, *args) run on the writer thread with a pooled connection
+    Queues behind ingest and purge writes instead of competing for the lock
+    """
+    return await asyncio.wrap_future(get_writer().submit(_write_with_db, fn, args))
+
+def shutdown():
+    """Stop the parse pool, its message manager and the writer thread"""
+    global _parse_pool, _manager, _writer
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
+    if _writer is not None:
+        _writer.shutdown(wait=True)
+        _writer = None
+
+class IngestJob:
+    """Progress of one uploaded file through parse and write stages"""
+    
+    def __init__(self, filename: str):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.stage = STAGE_QUEUED
+        self.rows_parsed = 0
+        self.calls_found = 0
+        self.calls_inserted = 0
+        self.duplicates_skipped = 0
+        self.message = None
+        self.error = None
+        self.started_at = time.monotonic()
+        self.finished_at = None
+    
+    @property
+    def finished(self) -> bool:
+        """True once the job is done or failed"""
+        return self.stage in (STAGE_DONE, STAGE_FAILED)
+    
+    def finish(self, stage: str):
+        """Move to a final stage and stop the clock"""
+        self.stage = stage
+        self.finished_at = time.monotonic()
+    
+    def to_status(self) -> JobStatus:
+        """Snapshot of the job as an API model"""
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return JobStatus(
+            job_id=self.job_id,
+            filename=self.filename,
+            stage=self.stage,
+            rows_parsed=self.rows_parsed,
+            calls_found=self.calls_found,
+            calls_inserted=self.calls_inserted,
+            duplicates_skipped=self.duplicates_skipped,
+            elapsed_seconds=round(end - self.started_at, 3),
+            message=self.message,
+            error=self.error
+        )
+
+def parse_to_queue(csv_path: str, stream: bool, messages) -> tuple:
+    """
+    Parse a CDR CSV file in a worker process, putting (rows_read, calls) on
+    the messages queue as calls are found so they can be written meanwhile
+    In stream mode every chunk and every finished batch of calls sends one;
+    otherwise the whole file's calls go in a single message
+    Compressed files are streamed unless they inflate to MAX_IN_MEMORY_SIZE
+    or less, so they are never fully inflated in memory
+    Returns (total_records, unique_calls)
+    """
+    total_records = 0
+    unique_calls = 0
+    
+    with open_cdr_file(csv_path) as source:
+        content = None
+        if not stream:
+            content, source = read_if_small(source)
+        if content is None:
+            for records, rows_read in iter_cdr_file(source):
+                total_records += rows_read
+                unique_calls += len(records)
+                messages.put((rows_read, records))
+        else:
+            records, total_records, unique_calls = process_cdr_file(content)
+            messages.put((total_records, records))
+    
+    return total_records, unique_calls
+
+def write_calls(job: IngestJob, records: list):
+    """
+    Insert a batch of calls, updating job progress as it goes
+    Runs on the writer thread
+    """
+    with get_db() as conn:
+        for start in range(0, len(records), WRITE_PROGRESS_BATCH):
+            inserted, skipped = insert_call_records(
+                conn, records[start:start + WRITE_PROGRESS_BATCH], source=job.filename
+            )
+            job.calls_inserted += inserted
+            job.duplicates_skipped += skipped
+
+async def worker_messages(task: asyncio.Future, messages) -> AsyncIterator:
+    """
+    Messages a parse worker puts on a manager queue while task runs, ending
+    once task has finished and every message it sent has been read
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        # Once the worker has returned, an empty queue means all were read
+        finished = task.done()
+        try:
+            message = await loop.run_in_executor(None, messages.get, True, MESSAGE_POLL_SECONDS)
+        except queue.Empty:
+            if finished:
+                return
+            continue
+        yield message
+
+async def _run_job(job: IngestJob, csv_path: str, stream: bool):
+    """
+    Drive one job through the parse pool and the writer thread
+    Each batch of calls is written as soon as the worker sends it, so a job
+    that fails part-way keeps the calls written before the failure
+    """
+    loop = asyncio.get_running_loop()
+    
+    try:
+        job.stage = STAGE_PARSING
+        # Bounded, so a worker parsing faster than SQLite writes waits
+        messages = get_manager().Queue(MAX_QUEUED_BATCHES)
+        parse = loop.run_in_executor(get_parse_pool(), parse_to_queue, csv_path, stream, messages)
+        try:
+            async for rows_read, records in worker_messages(parse, messages):
+                job.rows_parsed += rows_read
+                job.calls_found += len(records)
+                if parse.done():
+                    job.stage = STAGE_WRITING
+                if records:
+                    await loop.run_in_executor(get_writer(), write_calls, job, records)
+        except Exception:
+            # Let the worker finish rather than leave it blocked on a full queue
+            async for _ in worker_messages(parse, messages):
+                pass
+            raise
+        job.rows_parsed, job.calls_found = await parse
+        
+        job.message = f"Processed {job.rows_parsed} records, {job.calls_inserted} unique calls added"
+        if job.duplicates_skipped > 0:
+            job.message += f", {job.duplicates_skipped} duplicates skipped"
+        job.finish(STAGE_DONE)
+    
+    except Exception as e:
+        job.error = str(e)
+        job.finish(STAGE_FAILED)
+    
+    finally:
+        if os.path.exists(csv_path):
+            os.remove(csv_path)
+
+def parse_file(csv_path: str) -> tuple:
+    """
+    Parse one CDR CSV file in a worker process
+    Compressed files that inflate beyond MAX_IN_MEMORY_SIZE are read in
+    chunks instead of being inflated in memory
+    Returns (records, total_records)
+    """
+    with open_cdr_file(csv_path) as source:
+        if is_compressed_cdr_file(csv_path):
+            content, source = read_if_small(source)
+        else:
+            content = source.read()
+        if content is not None:
+            records, total_records, _ = process_cdr_file(content)
+            return records, total_records
+        
+        records = []
+        total_records = 0
+        for chunk_records, rows_read in iter_cdr_file(source):
+            records.extend(chunk_records)
+            total_records += rows_read
+        return records, total_records
+
+def write_records(records: list) -> tuple:
+    """
+    Bulk insert records on the writer thread
+    Returns (inserted, skipped)
+    """
+    with get_db() as conn:
+        return insert_call_records(conn, records)
+
+async def ingest_batch(files: list) -> tuple:
+    """
+    Parse several CSV files in parallel, merge calls sharing a UniqueID
+    across files and write them in one bulk insert
+    
+    Args:
+        files: list of (filename, csv_path)
+    
+    Returns:
+        (per_file_results, merged_away, inserted, skipped) where each
+        per-file result is a dict with filename, processed, unique_calls
+        and error
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_parse_pool()
+    
+    outcomes = await asyncio.gather(
+        *[loop.run_in_executor(pool, parse_file, path) for _, path in files],
+        return_exceptions=True
+    )
+    
+    file_results = []
+    record_lists = []
+    for (filename, _), outcome in zip(files, outcomes):
+        if isinstance(outcome, Exception):
+            file_results.append({
+                'filename': filename,
+                'processed': 0,
+                'unique_calls': 0,
+                'error': str(outcome)
+            })
+            continue
+        records, total_records = outcome
+        # Merged calls keep the source of the record they are based on
+        for record in records:
+            record['source'] = filename
+        record_lists.append(records)
+        file_results.append({
+            'filename': filename,
+            'processed': total_records,
+            'unique_calls': len(records),
+            'error': None
+        })
+    
+    records, merged_away = merge_call_records(record_lists)
+    inserted, skipped = await loop.run_in_executor(get_writer(), write_records, records)
+    
+    return file_results, merged_away, inserted, skipped
+
+def _forget_finished_jobs(jobs: OrderedDict = _jobs):
+    """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS"""
+    finished = [job_id for job_id, job in jobs.items() if job.finished]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del jobs[job_id]
+
+def submit_ingest(csv_path: str, filename: str, stream: bool = False) -> IngestJob:
+    """
+    Queue a saved CSV file for background ingest
+    The job owns csv_path and deletes it when finished
+    """
+    _forget_finished_jobs()
+    
+    job = IngestJob(filename)
+    _jobs[job.job_id] = job
+    
+    task = asyncio.get_running_loop().create_task(_run_job(job, csv_path, stream))
+    # Keep a reference so the task isn't garbage collected mid-run
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    
+    return job
+
+def get_job(job_id: str) -> Optional[IngestJob]:
+    """Look up a job by id"""
+    return _jobs.get(job_id)
+
+class PurgeJob:
+    """Progress of one admin purge through its delete and vacuum stages"""
+    
+    def __init__(self, filters: PurgeRequest):
+        self.job_id = uuid.uuid4().hex
+        self.filters = filters
+        self.stage = STAGE_QUEUED
+        self.partitions_total = 0
+        self.partitions_done = 0
+        self.rows_deleted = 0
+        self.pages_freed = 0
+        self.message = None
+        self.error = None
+        self.started_at = time.monotonic()
+        self.finished_at = None
+    
+    @property
+    def finished(self) -> bool:
+        """True once the job is done or failed"""
+        return self.stage in (STAGE_DONE, STAGE_FAILED)
+    
+    def finish(self, stage: str):
+        """Move to a final stage and stop the clock"""
+        self.stage = stage
+        self.finished_at = time.monotonic()
+    
+    def to_status(self) -> PurgeStatus:
+        """Snapshot of the job as an API model"""
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return PurgeStatus(
+            job_id=self.job_id,
+            filters=self.filters,
+            stage=self.stage,
+            partitions_total=self.partitions_total,
+            partitions_done=self.partitions_done,
+            rows_deleted=self.rows_deleted,
+            pages_freed=self.pages_freed,
+            elapsed_seconds=round(end - self.started_at, 3),
+            message=self.message,
+            error=self.error
+        )
+
+def run_purge(job: PurgeJob):
+    """
+    Delete the matching calls in batches, then vacuum incrementally
+    Runs on the writer thread, so it never competes with ingest for the lock
+    """
+    def deleting(partitions_done: int, partitions_total: int, rows_deleted: int):
+        job.partitions_done = partitions_done
+        job.partitions_total = partitions_total
+        job.rows_deleted = rows_deleted
+    
+    def vacuuming(pages_freed: int):
+        job.pages_freed = pages_freed
+    
+    try:
+        with get_db() as conn:
+            job.stage = STAGE_DELETING
+            purge_calls(conn, progress=deleting, **job.filters.model_dump())
+            
+            job.stage = STAGE_VACUUMING
+            job.pages_freed = incremental_vacuum(conn, progress=vacuuming)
+        
+        job.message = f"Purged {job.rows_deleted} calls"
+        if job.pages_freed:
+            job.message += f", {job.pages_freed} database pages freed"
+        job.finish(STAGE_DONE)
+    
+    except Exception as e:
+        job.error = str(e)
+        job.finish(STAGE_FAILED)
+
+def submit_purge(filters: PurgeRequest) -> PurgeJob:
+    """Queue a purge on the writer thread"""
+    _forget_finished_jobs(_purge_jobs)
+    
+    job = PurgeJob(filters)
+    _purge_jobs[job.job_id] = job
+    get_writer().submit(run_purge, job)
+    return job
+
+def get_purge_job(job_id: str) -> Optional[PurgeJob]:
+    """Look up a purge job by id"""
+    return _purge_jobs.get(job_id)
@@ -9,9 +9,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
 import uvicorn
 
-from database import init_db, get_db
+from database import init_db, get_db, close_pool
 from models import CallRecord, UploadResponse, CallListResponse, StatsResponse
 from processor import process_cdr_file
+import jobs
 
 app = FastAPI(
     title="CDR Analyzer API",
@@ -39,18 +40,27 @@ templates = Jinja2Templates(directory="templates")
 async def startup_event():
     init_db()
 
+# Stop background ingest workers and close pooled connections on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    jobs.shutdown()
+    close_pool()
+
 # Serve frontend
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 # API Endpoints will be added here
-from routes import upload, calls, stats, admin
+from routes import upload, calls, stats, admin, dashboard
+from routes import jobs as jobs_routes
 
 app.include_router(upload.router, prefix="/api/v1", tags=["upload"])
 app.include_router(calls.router, prefix="/api/v1", tags=["calls"])
 app.include_router(stats.router, prefix="/api/v1", tags=["stats"])
+app.include_router(dashboard.router, prefix="/api/v1", tags=["dashboard"])
 app.include_router(admin.router, prefix="/api/v1", tags=["admin"])
+app.include_router(jobs_routes.router, prefix="/api/v1", tags=["jobs"])
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -33,12 +33,68 @@ class UploadResponse(BaseModel):
     skipped: int = Field(0, description="Duplicate records skipped")
     message: str = Field(..., description="Status message")
 
+class BatchFileResult(BaseModel):
+    """Per-file result of a batch upload"""
+    filename: str
+    processed: int = Field(0, description="Records read from the file")
+    unique_calls: int = Field(0, description="Unique calls extracted from the file")
+    error: Optional[str] = Field(None, description="Error message if the file failed")
+
+class BatchUploadResponse(BaseModel):
+    """Response model for multi-file / ZIP upload"""
+    files: List[BatchFileResult]
+    processed: int = Field(..., description="Total records processed across files")
+    unique_calls: int = Field(..., description="Unique calls added to database")
+    skipped: int = Field(0, description="Duplicate records skipped")
+    merged: int = Field(0, description="Calls merged because they appeared in several files")
+    message: str = Field(..., description="Status message")
+
+class UploadJobResponse(BaseModel):
+    """Response model for a queued upload"""
+    job_id: str = Field(..., description="Background ingest job identifier")
+    status_url: str = Field(..., description="Endpoint reporting job progress")
+    message: str = Field(..., description="Status message")
+
+class JobStatus(BaseModel):
+    """Progress of a background ingest job"""
+    job_id: str
+    filename: str
+    stage: str = Field(..., description="queued, parsing, writing, done or failed")
+    rows_parsed: int = Field(0, description="CSV rows read from the file")
+    calls_found: int = Field(0, description="Unique calls extracted from the file")
+    calls_inserted: int = Field(0, description="Unique calls added to database so far")
+    duplicates_skipped: int = Field(0, description="Duplicate calls skipped so far")
+    elapsed_seconds: float = Field(..., description="Time since the job was queued")
+    message: Optional[str] = Field(None, description="Summary once the job is done")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+
+class PurgeRequest(BaseModel):
+    """Filters selecting the calls to purge; calls must match all given filters"""
+    from_date: Optional[str] = Field(None, description="Purge calls at or after this ISO date/time")
+    to_date: Optional[str] = Field(None, description="Purge calls at or before this ISO date/time")
+    extension: Optional[str] = Field(None, description="Purge calls answered by this extension")
+    source: Optional[str] = Field(None, description="Purge calls loaded from this uploaded file")
+
+class PurgeStatus(BaseModel):
+    """Progress of a background purge job"""
+    job_id: str
+    filters: PurgeRequest
+    stage: str = Field(..., description="queued, deleting, vacuuming, done or failed")
+    partitions_total: int = Field(0, description="Monthly partitions the filters overlap")
+    partitions_done: int = Field(0, description="Partitions finished so far")
+    rows_deleted: int = Field(0, description="Calls deleted so far")
+    pages_freed: Optional[int] = Field(0, description="Database pages returned to the filesystem; null if incremental vacuum is off")
+    elapsed_seconds: float = Field(..., description="Time since the job was queued")
+    message: Optional[str] = Field(None, description="Summary once the job is done")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+
 class CallListResponse(BaseModel):
     """Response model for call list"""
     calls: List[CallRecord]
-    total: int
+    total: Optional[int] = Field(None, description="Matching calls; only set when include_total is requested")
     page: int
     limit: int
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page; null on the last page")
 
 class DailyStats(BaseModel):
     """Daily statistics model"""
@@ -60,6 +116,45 @@ class UniqueCallersStats(BaseModel):
     unique_callers: int = Field(..., description="Count of distinct caller numbers")
     total_calls: int = Field(..., description="Total number of calls for comparison")
 
+class UniqueCallersRange(BaseModel):
+    """Distinct callers over a whole range of days"""
+    from_date: str = Field(..., description="First day in ISO format (YYYY-MM-DD)")
+    to_date: str = Field(..., description="Last day in ISO format (YYYY-MM-DD)")
+    unique_callers: int = Field(..., description="Distinct caller numbers over the range")
+    exact: bool = Field(..., description="Whether the count is exact or a sketch estimate")
+    standard_error: float = Field(..., description="Relative standard error of the estimate (0 when exact)")
+
+class IntervalStats(BaseModel):
+    """Calls starting in one time-of-day interval, summed over the date range"""
+    start: str = Field(..., description="Interval start time (HH:MM)")
+    answered: int
+    missed: int
+    total: int
+
+class HeatmapCell(BaseModel):
+    """Calls starting in one hour of one weekday, summed over the date range"""
+    weekday: int = Field(..., description="Day of the week, 0 = Monday ... 6 = Sunday")
+    hour: int = Field(..., description="Hour of day (0-23)")
+    answered: int
+    missed: int
+    total: int
+
+class DashboardSummary(BaseModel):
+    """Totals over the dashboard's date range"""
+    total: int
+    answered: int
+    missed: int
+    answer_rate: float = Field(..., description="Answered calls as a percentage of all calls")
+    unique_callers: int = Field(..., description="Distinct callers over the range's days (sketch estimate)")
+    unique_callers_standard_error: float = Field(..., description="Relative standard error of unique_callers")
+
+class DashboardResponse(BaseModel):
+    """Everything one dashboard render needs for a date range"""
+    summary: DashboardSummary
+    daily_stats: List[DailyStats]
+    extension_stats: List[ExtensionStats]
+    unique_callers: List[UniqueCallersStats]
+
 class StatsResponse(BaseModel):
     """Response model for statistics"""
     daily_stats: Optional[List[DailyStats]] = None
@@ -0,0 +1,214 @@
+"""
+Monthly partitions of call records
+Each calendar month of calls is stored in its own table, call_records_YYYYMM,
+with its own indexes. call_records is a UNION ALL view over every partition,
+so ad-hoc reads keep working, while the API routes date-bounded queries to
+the partitions that overlap the range. Retention drops whole partitions.
+"""
+import re
+import sqlite3
+import calendar
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+PARTITION_PREFIX = "call_records_"
+
+# Rows whose timestamp carries no valid date; no date range ever matches them
+UNDATED_PARTITION = "call_records_undated"
+
+PARTITION_PATTERN = re.compile(r"^call_records_(\d{4})(\d{2})$")
+DATE_PREFIX_PATTERN = re.compile(r"^(\d{4})-(\d{2})-(\d{2})")
+TZ_SUFFIX_PATTERN = re.compile(r"(Z|[+-]\d{2}:?\d{2})$", re.IGNORECASE)
+
+# Partition columns, in the order the call_records view exposes them
+COLUMNS = (
+    "unique_id", "timestamp", "caller_number", "extension", "status",
+    "duration", "created_at", "ts_epoch", "call_date", "source",
+)
+
+# SQL deriving the indexed columns from the ISO timestamp text; naive
+# timestamps are taken as UTC so the epoch keeps the PBX wall clock
+TS_EPOCH_SQL = "CAST(strftime('%s', {}) AS INTEGER)"
+CALL_DATE_SQL = "DATE({})"
+
+PARTITION_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        unique_id TEXT PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        caller_number TEXT,
+        extension TEXT,
+        status TEXT CHECK(status IN ('ANSWERED', 'MISSED')) NOT NULL,
+        duration INTEGER DEFAULT 0,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        ts_epoch INTEGER,
+        call_date TEXT,
+        source TEXT
+    )
+"""
+
+def parse_iso_datetime(value: str) -> datetime:
+    """
+    datetime.fromisoformat() that also takes a "Z" suffix and "+HHMM"
+    offsets, which Python 3.10 rejects (JavaScript's toISOString() ends in Z)
+    Raises ValueError for anything else it cannot parse
+    """
+    value = value.strip()
+    if value[-1:] in ("Z", "z"):
+        value = value[:-1] + "+00:00"
+    elif re.search(r"[+-]\d{4}$", value) and "T" in value.upper():
+        value = value[:-2] + ":" + value[-2:]
+    return datetime.fromisoformat(value)
+
+def partition_key(timestamp: Optional[str]) -> Optional[str]:
+    """
+    YYYYMM key of the month an ISO timestamp falls in, None if it has no
+    valid date; like ts_epoch, timestamps with an offset are taken in UTC
+    """
+    match = DATE_PREFIX_PATTERN.match(timestamp or "")
+    if not match:
+        return None
+    if TZ_SUFFIX_PATTERN.search(timestamp):
+        try:
+            parsed = parse_iso_datetime(timestamp)
+        except ValueError:
+            return None
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc)
+        return f"{parsed.year:04d}{parsed.month:02d}"
+    
+    year, month, day = (int(part) for part in match.groups())
+    try:
+        date(year, month, day)
+    except ValueError:
+        return None
+    return f"{year:04d}{month:02d}"
+
+def partition_table(key: Optional[str]) -> str:
+    """Table holding a partition key; None is the undated partition"""
+    return UNDATED_PARTITION if key is None else f"{PARTITION_PREFIX}{key}"
+
+def month_key(value: str) -> str:
+    """
+    YYYYMM key of a 'YYYY-MM' or 'YYYYMM' month
+    Raises ValueError for anything else
+    """
+    match = re.match(r"^(\d{4})-?(\d{2})$", value or "")
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise ValueError(f"Invalid month: {value}")
+    return match.group(1) + match.group(2)
+
+def month_label(key: str) -> str:
+    """'YYYY-MM' form of a partition key"""
+    return f"{key[:4]}-{key[4:]}"
+
+def month_bounds(key: str) -> tuple:
+    """(first epoch, first epoch of the next month) of a partition key"""
+    year, month = int(key[:4]), int(key[4:])
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return (calendar.timegm((year, month, 1, 0, 0, 0)),
+            calendar.timegm((next_year, next_month, 1, 0, 0, 0)))
+
+def month_days(key: str) -> tuple:
+    """(first day, first day of the next month) of a partition key, as call_date text"""
+    year, month = int(key[:4]), int(key[4:])
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return date(year, month, 1).isoformat(), date(next_year, next_month, 1).isoformat()
+
+def shift_month(key: str, months: int) -> str:
+    """Partition key months after key (before it when negative)"""
+    index = int(key[:4]) * 12 + int(key[4:]) - 1 + months
+    return f"{index // 12:04d}{index % 12 + 1:02d}"
+
+def list_partitions(conn: sqlite3.Connection) -> List[str]:
+    """Keys of the dated partitions, oldest first"""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'call_records_[0-9]*'"
+    ).fetchall()
+    keys = []
+    for (name,) in rows:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            keys.append(match.group(1) + match.group(2))
+    return sorted(keys)
+
+def partition_keys(conn: sqlite3.Connection, from_epoch: Optional[int] = None,
+                   to_epoch: Optional[int] = None) -> List[str]:
+    """
+    Keys of the dated partitions that can hold from_epoch <= ts_epoch <= to_epoch,
+    oldest first; either bound may be None for an open-ended range
+    """
+    keys = []
+    for key in list_partitions(conn):
+        start, end = month_bounds(key)
+        if from_epoch is not None and end <= from_epoch:
+            continue
+        if to_epoch is not None and start > to_epoch:
+            continue
+        keys.append(key)
+    return keys
+
+def partition_tables(conn: sqlite3.Connection, from_epoch: Optional[int] = None,
+                     to_epoch: Optional[int] = None, newest_first: bool = False) -> List[str]:
+    """Tables of the partitions from partition_keys(), optionally newest first"""
+    tables = [partition_table(key) for key in partition_keys(conn, from_epoch, to_epoch)]
+    if newest_first:
+        tables.reverse()
+    return tables
+
+def union_source(tables: List[str], columns: str, where_sql: str, params: list) -> tuple:
+    """
+    Subquery selecting columns WHERE where_sql from each table, joined with
+    UNION ALL; params are repeated for each table
+    Returns (sql, params), or (None, []) when tables is empty
+    """
+    if not tables:
+        return None, []
+    selects = [f"SELECT {columns} FROM {table} WHERE {where_sql}" for table in tables]
+    return "(" + " UNION ALL ".join(selects) + ")", list(params) * len(tables)
+
+def view_statements(tables: List[str]) -> list:
+    """
+    Statements (re)creating the call_records view over tables, with
+    INSTEAD OF triggers so DELETE and UPDATE on the view reach the partitions
+    
+    An UPDATE that moves a call into another month leaves it in its
+    original partition; ts_epoch and call_date still follow the timestamp.
+    """
+    columns = ", ".join(COLUMNS)
+    union = "\nUNION ALL\n".join(f"SELECT {columns} FROM {table}" for table in tables)
+    
+    delete_body = "\n".join(
+        f"DELETE FROM {table} WHERE unique_id = OLD.unique_id;" for table in tables
+    )
+    update_body = "\n".join(f"""
+        UPDATE {table} SET
+            unique_id = NEW.unique_id,
+            timestamp = NEW.timestamp,
+            caller_number = NEW.caller_number,
+            extension = NEW.extension,
+            status = NEW.status,
+            duration = NEW.duration,
+            created_at = NEW.created_at,
+            ts_epoch = {TS_EPOCH_SQL.format('NEW.timestamp')},
+            call_date = {CALL_DATE_SQL.format('NEW.timestamp')},
+            source = NEW.source
+        WHERE unique_id = OLD.unique_id;""" for table in tables)
+    
+    return [
+        "DROP VIEW IF EXISTS call_records",
+        f"CREATE VIEW call_records AS {union}",
+        f"""
+        CREATE TRIGGER trg_call_records_delete
+        INSTEAD OF DELETE ON call_records
+        BEGIN
+            {delete_body}
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_call_records_update
+        INSTEAD OF UPDATE ON call_records
+        BEGIN
+            {update_body}
+        END
+        """,
+    ]
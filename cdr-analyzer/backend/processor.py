@@ -2,36 +2,41 @@
 CDR File Processing Engine
 Handles CSV parsing, grouping, and data extraction
 """
+import bz2
+import csv
+import gzip
+import io
+import os
+import pickle
+import tempfile
 import pandas as pd
+import numpy as np
 import re
 from datetime import datetime
-from typing import List, Dict, Tuple
+from functools import lru_cache
+from typing import List, Dict, Tuple, Optional, Iterator, BinaryIO
 from io import BytesIO
 
-def parse_extension(channel: str) -> str:
-    """
-    Extract extension number from channel string
-    Example: "SIP/209-000012ec" -> "209"
-    """
-    if not channel or pd.isna(channel):
-        return None
-    
+# Compiled patterns shared by the scalar and column-level parsers
+EXTENSION_PATTERN = re.compile(r'(?:SIP|PJSIP)/(\d+)')
+DURATION_MIN_PATTERN = re.compile(r'(\d+)\s*min')
+DURATION_SEC_PATTERN = re.compile(r'(\d+)\s*s')
+
+# Distinct channel / duration strings remembered across files and chunks
+PARSE_CACHE_SIZE = 65536
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _channel_extension(channel: str) -> Optional[str]:
+    """Cached extension lookup for a non-empty channel string"""
     # Match pattern like SIP/209-... or PJSIP/209-...
-    match = re.search(r'(?:SIP|PJSIP)/(\d+)', channel)
+    match = EXTENSION_PATTERN.search(channel)
     if match:
         return match.group(1)
     return None
 
-def parse_duration(duration_str) -> int:
-    """
-    Convert duration string to seconds
-    Examples: "45s" -> 45, "2min 30s" -> 150, "145" -> 145
-    """
-    if pd.isna(duration_str):
-        return 0
-    
-    duration_str = str(duration_str).strip()
-    
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _duration_seconds(duration_str: str) -> int:
+    """Cached seconds lookup for a stripped duration string"""
     # If it's already a number
     if duration_str.isdigit():
         return int(duration_str)
@@ -39,17 +44,79 @@ def parse_duration(duration_str) -> int:
     total_seconds = 0
     
     # Parse minutes
-    min_match = re.search(r'(\d+)\s*min', duration_str)
+    min_match = DURATION_MIN_PATTERN.search(duration_str)
     if min_match:
         total_seconds += int(min_match.group(1)) * 60
     
     # Parse seconds
-    sec_match = re.search(r'(\d+)\s*s', duration_str)
+    sec_match = DURATION_SEC_PATTERN.search(duration_str)
     if sec_match:
         total_seconds += int(sec_match.group(1))
     
     return total_seconds
 
+def parse_extension(channel: str) -> str:
+    """
+    Extract extension number from channel string
+    Example: "SIP/209-000012ec" -> "209"
+    """
+    if not channel or pd.isna(channel):
+        return None
+    
+    return _channel_extension(channel)
+
+def parse_duration(duration_str) -> int:
+    """
+    Convert duration string to seconds
+    Examples: "45s" -> 45, "2min 30s" -> 150, "145" -> 145
+    """
+    if pd.isna(duration_str):
+        return 0
+    
+    return _duration_seconds(str(duration_str).strip())
+
+def parse_extensions(channels: pd.Series) -> pd.Series:
+    """
+    Column-level parse_extension: each distinct channel is parsed once
+    """
+    codes, uniques = pd.factorize(channels)
+    # Nulls get code -1, which picks the trailing None
+    extensions = np.array([parse_extension(channel) for channel in uniques] + [None], dtype=object)
+    return pd.Series(extensions[codes], index=channels.index, dtype=object)
+
+def parse_durations(durations: pd.Series) -> pd.Series:
+    """
+    Column-level parse_duration: each distinct duration is parsed once
+    """
+    codes, uniques = pd.factorize(durations)
+    # Nulls get code -1, which picks the trailing 0
+    seconds = np.array([parse_duration(duration) for duration in uniques] + [0], dtype=np.int64)
+    return pd.Series(seconds[codes], index=durations.index)
+
+# Common formats from CDR systems, tried in this order
+TIMESTAMP_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+]
+
+# Number of non-empty Date values inspected to detect a file's format
+TIMESTAMP_SAMPLE_SIZE = 200
+
+def match_timestamp_format(date_str: str) -> Optional[str]:
+    """
+    Return the first entry of TIMESTAMP_FORMATS that parses date_str, or None
+    """
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            datetime.strptime(date_str, fmt)
+            return fmt
+        except ValueError:
+            continue
+    return None
+
 def normalize_timestamp(date_str) -> str:
     """
     Normalize various date formats to ISO 8601
@@ -59,16 +126,7 @@ def normalize_timestamp(date_str) -> str:
     
     date_str = str(date_str).strip()
     
-    # Common formats from CDR systems
-    formats = [
-        "%Y-%m-%d %H:%M:%S",
-        "%d/%m/%Y %H:%M:%S",
-        "%m/%d/%Y %H:%M:%S",
-        "%Y/%m/%d %H:%M:%S",
-        "%Y-%m-%d %H:%M",
-    ]
-    
-    for fmt in formats:
+    for fmt in TIMESTAMP_FORMATS:
         try:
             dt = datetime.strptime(date_str, fmt)
             return dt.isoformat()
@@ -78,145 +136,731 @@ def normalize_timestamp(date_str) -> str:
     # If all formats fail, return original
     return date_str
 
-def process_cdr_file(file_content: bytes) -> Tuple[List[Dict], int, int]:
+def detect_timestamp_format(dates: pd.Series, sample_size: int = TIMESTAMP_SAMPLE_SIZE) -> Optional[str]:
     """
-    Process CDR CSV file and extract unique calls
+    Detect the dominant date format of a file from a sample of its rows
+    """
+    sample = dates.dropna().head(sample_size)
+    matches = sample.astype(str).str.strip().map(match_timestamp_format).dropna()
+    if matches.empty:
+        return None
+    return matches.value_counts().index[0]
+
+def _canonical_pattern(fmt: str) -> str:
+    """
+    Regex matching the zero-padded rendering of a strptime format
+    """
+    pattern = re.escape(fmt)
+    for directive, digits in (('%Y', 4), ('%m', 2), ('%d', 2), ('%H', 2), ('%M', 2), ('%S', 2)):
+        pattern = pattern.replace(re.escape(directive), rf'\d{{{digits}}}')
+    return pattern
+
+def _parse_with_format(text: pd.Series, fmt: str) -> pd.Series:
+    """
+    Vectorized strptime restricted to zero-padded values, so every accepted
+    row parses exactly as datetime.strptime would; the rest are NaT
+    """
+    canonical = text[text.str.fullmatch(_canonical_pattern(fmt))]
+    parsed = pd.to_datetime(canonical, format=fmt, errors='coerce')
+    return parsed.reindex(text.index)
+
+def normalize_timestamps(dates: pd.Series, as_epoch: bool = False) -> pd.Series:
+    """
+    Column-level normalize_timestamp
+    
+    The format is detected once from a sample and the whole column is parsed
+    in one vectorized pass. Earlier formats in TIMESTAMP_FORMATS still take
+    precedence, so every row gets the same result as normalize_timestamp;
+    only rows no vectorized pass accepts fall back to the scalar function.
     
     Returns:
-        (processed_records, total_records_in_file, unique_calls)
+        ISO 8601 strings (None for nulls, original string when unparseable),
+        or integer epoch seconds (None when unparseable) if as_epoch is set
     """
-    try:
-        # Read CSV with pandas
-        df = pd.read_csv(BytesIO(file_content))
-        
-        total_records = len(df)
+    present = dates.notna()
+    text = dates[present].astype(str).str.strip()
+    parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+    
+    detected = detect_timestamp_format(text)
+    if detected is not None:
+        parsed = _parse_with_format(text, detected)
+        # Rows matching an earlier format must keep that interpretation;
+        # apply them last-to-first so the earliest format wins
+        hit = parsed.notna()
+        for fmt in reversed(TIMESTAMP_FORMATS[:TIMESTAMP_FORMATS.index(detected)]):
+            if not hit.any():
+                break
+            parsed.update(_parse_with_format(text[hit], fmt).dropna())
+    
+    for fmt in TIMESTAMP_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        if fmt == detected:
+            continue
+        parsed.update(_parse_with_format(text[missing], fmt).dropna())
+    
+    result = pd.Series([None] * len(dates), index=dates.index, dtype=object)
+    parsed_ok = parsed.notna()
+    
+    if as_epoch:
+        epoch = (parsed[parsed_ok] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        result[epoch.index] = epoch.astype(object)
+        return result
+    
+    result[parsed_ok[parsed_ok].index] = np.datetime_as_string(parsed[parsed_ok].to_numpy(), unit='s')
+    # Per-row fallback only for rows the vectorized passes rejected
+    fallback = parsed_ok[~parsed_ok].index
+    result[fallback] = text[fallback].map(normalize_timestamp)
+    return result
+
+# Extraction engines for process_cdr_file:
+# - "columnar": whole-frame operations (default)
+# - "legacy": original per-UniqueID Python loop, kept for comparison
+ENGINES = ("columnar", "legacy")
+DEFAULT_ENGINE = "columnar"
+
+# CSV readers:
+# - "inferred": all columns, pandas type inference (default)
+# - "pruned": only the columns the processor uses, all read as strings so
+#   caller numbers keep their leading zeros
+# - "arrow": pruned string columns parsed by the multithreaded pyarrow CSV reader
+READERS = ("inferred", "pruned", "arrow")
+DEFAULT_READER = os.environ.get("CDR_CSV_READER", "inferred")
+
+# Approximate bytes per export row, to size arrow blocks from a row count
+ARROW_BYTES_PER_ROW = 256
+
+# Accepted upload suffixes; compressed ones are inflated on the fly
+CSV_SUFFIX = '.csv'
+COMPRESSED_CSV_SUFFIXES = ('.csv.gz', '.csv.bz2', '.csv.zst')
+
+# CSV content up to this size is parsed in memory; larger files are
+# streamed. Compressed files are measured as they are inflated.
+MAX_IN_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Rows per chunk in streaming mode (see iter_cdr_file)
+STREAM_CHUNK_ROWS = 50_000
+
+# Temporary bucket files streamed rows are spread over by UniqueID; a
+# bucket above STREAM_BUCKET_MAX_CHUNKS chunks of rows is split again, at
+# most STREAM_MAX_LEVEL times (one huge group cannot be split)
+STREAM_BUCKETS = 64
+STREAM_BUCKET_MAX_CHUNKS = 4
+STREAM_MAX_LEVEL = 3
+
+REQUIRED_COLUMNS = ['UniqueID', 'Source', 'Date', 'Status', 'Duration']
+
+def prepare_cdr_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Validate required columns (case-insensitive fallback) and locate the
+    optional destination channel column
+    
+    Returns:
+        (dataframe, dst_channel_column_or_None)
+    """
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    
+    if missing_columns:
+        # Try case-insensitive match
+        df.columns = df.columns.str.strip()
+        column_map = {}
+        for req_col in REQUIRED_COLUMNS:
+            for df_col in df.columns:
+                if df_col.lower() == req_col.lower():
+                    column_map[df_col] = req_col
+                    break
         
-        # Validate required columns
-        required_columns = ['UniqueID', 'Source', 'Date', 'Status', 'Duration']
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        if column_map:
+            df.rename(columns=column_map, inplace=True)
         
+        # Check again
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
         if missing_columns:
-            # Try case-insensitive match
-            df.columns = df.columns.str.strip()
-            column_map = {}
-            for req_col in required_columns:
-                for df_col in df.columns:
-                    if df_col.lower() == req_col.lower():
-                        column_map[df_col] = req_col
-                        break
+            raise ValueError(f"CSV file missing required columns: {', '.join(missing_columns)}")
+    
+    # Optional column for destination channel
+    dst_channel_col = None
+    for col in df.columns:
+        if 'dst' in col.lower() and 'channel' in col.lower():
+            dst_channel_col = col
+            break
+    
+    return df, dst_channel_col
+
+def extract_calls_legacy(df: pd.DataFrame, dst_channel_col: Optional[str]) -> List[Dict]:
+    """
+    Reference engine: loop over every UniqueID group in Python
+    """
+    # Group by UniqueID
+    grouped = df.groupby('UniqueID')
+    
+    processed_records = []
+    
+    for unique_id, group in grouped:
+        # Skip if unique_id is null
+        if pd.isna(unique_id):
+            continue
+        
+        # Get first record for caller info
+        first_record = group.iloc[0]
+        # Convert caller number and remove .0 suffix if it's a float
+        if not pd.isna(first_record['Source']):
+            caller_number = str(first_record['Source']).strip()
+            # Remove .0 suffix from float representation
+            if caller_number.endswith('.0'):
+                caller_number = caller_number[:-2]
             
-            if column_map:
-                df.rename(columns=column_map, inplace=True)
+            # Remove + prefix if present (international format)
+            if caller_number.startswith('+'):
+                caller_number = caller_number[1:]
             
-            # Check again
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                raise ValueError(f"CSV file missing required columns: {', '.join(missing_columns)}")
-        
-        # Optional column for destination channel
-        dst_channel_col = None
-        for col in df.columns:
-            if 'dst' in col.lower() and 'channel' in col.lower():
-                dst_channel_col = col
-                break
-        
-        # Group by UniqueID
-        grouped = df.groupby('UniqueID')
-        
-        processed_records = []
-        
-        for unique_id, group in grouped:
-            # Skip if unique_id is null
-            if pd.isna(unique_id):
+            # FILTER OUT OUTGOING CALLS:
+            # Skip calls where Source is an extension number (3 digits like 101, 102, 103)
+            # Only count INCOMING calls where Source is a real phone number
+            if caller_number and len(caller_number) <= 3 and caller_number.isdigit():
+                # This is an outgoing call (Source is extension), skip it
                 continue
             
-            # Get first record for caller info
-            first_record = group.iloc[0]
-            # Convert caller number and remove .0 suffix if it's a float
-            if not pd.isna(first_record['Source']):
-                caller_number = str(first_record['Source']).strip()
-                # Remove .0 suffix from float representation
-                if caller_number.endswith('.0'):
-                    caller_number = caller_number[:-2]
+            # Validate phone number format for INCOMING calls:
+            # Accept multiple formats:
+            # 1. Mobile national: 9XXXXXXXXX (10-11 digits starting with 9)
+            # 2. Mobile international: 98XXXXXXXXXX (12 digits starting with 98)
+            # 3. Landline with 0: 0XXXXXXXXX (8-11 digits starting with 0, like 011..., 044...)
+            # 4. Landline without 0: XXXXXXXX (7-10 digits, pandas strips leading 0 from floats)
+            if caller_number and caller_number.isdigit():
+                is_valid_mobile_national = caller_number.startswith('9') and 10 <= len(caller_number) <= 11
+                is_valid_mobile_international = caller_number.startswith('98') and len(caller_number) == 12
+                is_valid_landline_with_zero = caller_number.startswith('0') and 8 <= len(caller_number) <= 11
+                is_valid_landline_no_zero = 7 <= len(caller_number) <= 10 and not caller_number.startswith('9')
                 
-                # Remove + prefix if present (international format)
-                if caller_number.startswith('+'):
-                    caller_number = caller_number[1:]
-                
-                # FILTER OUT OUTGOING CALLS:
-                # Skip calls where Source is an extension number (3 digits like 101, 102, 103)
-                # Only count INCOMING calls where Source is a real phone number
-                if caller_number and len(caller_number) <= 3 and caller_number.isdigit():
-                    # This is an outgoing call (Source is extension), skip it
+                if not (is_valid_mobile_national or is_valid_mobile_international or is_valid_landline_with_zero or is_valid_landline_no_zero):
+                    # Invalid phone number format, skip
                     continue
-                
-                # Validate phone number format for INCOMING calls:
-                # Accept multiple formats:
-                # 1. Mobile national: 9XXXXXXXXX (10-11 digits starting with 9)
-                # 2. Mobile international: 98XXXXXXXXXX (12 digits starting with 98)
-                # 3. Landline with 0: 0XXXXXXXXX (8-11 digits starting with 0, like 011..., 044...)
-                # 4. Landline without 0: XXXXXXXX (7-10 digits, pandas strips leading 0 from floats)
-                if caller_number and caller_number.isdigit():
-                    is_valid_mobile_national = caller_number.startswith('9') and 10 <= len(caller_number) <= 11
-                    is_valid_mobile_international = caller_number.startswith('98') and len(caller_number) == 12
-                    is_valid_landline_with_zero = caller_number.startswith('0') and 8 <= len(caller_number) <= 11
-                    is_valid_landline_no_zero = 7 <= len(caller_number) <= 10 and not caller_number.startswith('9')
-                    
-                    if not (is_valid_mobile_national or is_valid_mobile_international or is_valid_landline_with_zero or is_valid_landline_no_zero):
-                        # Invalid phone number format, skip
-                        continue
-            else:
-                # No Source field means no caller number - skip this record
-                # (these are likely internal calls or system records)
-                continue
-            timestamp = normalize_timestamp(first_record['Date'])
-            
-            if not timestamp:
-                continue  # Skip records with invalid dates
-            
-            # Determine call status
-            # A call is ANSWERED if any record has status=ANSWERED and duration > 0
-            answered_records = group[
-                (group['Status'].str.upper() == 'ANSWERED') & 
-                (group['Duration'].notna())
-            ]
+        else:
+            # No Source field means no caller number - skip this record
+            # (these are likely internal calls or system records)
+            continue
+        timestamp = normalize_timestamp(first_record['Date'])
+        
+        if not timestamp:
+            continue  # Skip records with invalid dates
+        
+        # Determine call status
+        # A call is ANSWERED if any record has status=ANSWERED and duration > 0
+        answered_records = group[
+            (group['Status'].str.upper() == 'ANSWERED') & 
+            (group['Duration'].notna())
+        ]
+        
+        status = 'MISSED'
+        extension = None
+        duration = 0
+        
+        if not answered_records.empty:
+            # Parse durations and find record with max duration
+            answered_records = answered_records.copy()
+            answered_records['duration_sec'] = answered_records['Duration'].apply(parse_duration)
             
-            status = 'MISSED'
-            extension = None
-            duration = 0
+            # Filter out zero duration
+            answered_records = answered_records[answered_records['duration_sec'] > 0]
             
             if not answered_records.empty:
-                # Parse durations and find record with max duration
-                answered_records = answered_records.copy()
-                answered_records['duration_sec'] = answered_records['Duration'].apply(parse_duration)
+                status = 'ANSWERED'
                 
-                # Filter out zero duration
-                answered_records = answered_records[answered_records['duration_sec'] > 0]
+                # Get record with longest duration
+                max_duration_record = answered_records.loc[answered_records['duration_sec'].idxmax()]
+                duration = int(max_duration_record['duration_sec'])
                 
-                if not answered_records.empty:
-                    status = 'ANSWERED'
-                    
-                    # Get record with longest duration
-                    max_duration_record = answered_records.loc[answered_records['duration_sec'].idxmax()]
-                    duration = int(max_duration_record['duration_sec'])
-                    
-                    # Extract extension from destination channel
-                    if dst_channel_col and dst_channel_col in max_duration_record.index:
-                        extension = parse_extension(max_duration_record[dst_channel_col])
+                # Extract extension from destination channel
+                if dst_channel_col and dst_channel_col in max_duration_record.index:
+                    extension = parse_extension(max_duration_record[dst_channel_col])
+        
+        # Create call record
+        call_record = {
+            'unique_id': str(unique_id),
+            'timestamp': timestamp,
+            'caller_number': caller_number,
+            'extension': extension,
+            'status': status,
+            'duration': duration
+        }
+        
+        processed_records.append(call_record)
+    
+    return processed_records
+
+def clean_caller_numbers(source: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Column-level version of the caller cleanup and validation rules
+    used by the legacy engine (see extract_calls_legacy)
+    
+    Returns:
+        (cleaned caller numbers, mask of incoming calls to keep)
+    """
+    present = source.notna()
+    callers = source.astype(str).str.strip()
+    # Remove .0 suffix from float representation, then + prefix
+    callers = callers.str.replace(r'\.0$', '', regex=True)
+    callers = callers.str.replace(r'^\+', '', regex=True)
+    
+    length = callers.str.len()
+    is_digits = callers.str.isdigit()
+    
+    # Extensions (up to 3 digits) are outgoing calls
+    is_outgoing = is_digits & (length <= 3)
+    
+    is_valid_mobile_national = callers.str.startswith('9') & length.between(10, 11)
+    is_valid_mobile_international = callers.str.startswith('98') & (length == 12)
+    is_valid_landline_with_zero = callers.str.startswith('0') & length.between(8, 11)
+    is_valid_landline_no_zero = length.between(7, 10) & ~callers.str.startswith('9')
+    is_valid = (is_valid_mobile_national | is_valid_mobile_international |
+                is_valid_landline_with_zero | is_valid_landline_no_zero)
+    
+    keep = present & ~is_outgoing & (~is_digits | is_valid)
+    return callers, keep
+
+def extract_calls_columnar(df: pd.DataFrame, dst_channel_col: Optional[str]) -> List[Dict]:
+    """
+    Columnar engine: same records as extract_calls_legacy, computed with
+    whole-frame operations instead of a Python loop per UniqueID group
+    """
+    # Sorted group codes reproduce groupby('UniqueID') ordering; nulls get -1
+    codes, _ = pd.factorize(df['UniqueID'], sort=True)
+    df = df.reset_index(drop=True)
+    df['_group'] = codes
+    df = df[df['_group'] >= 0]
+    
+    # First row per group (in file order) carries caller info and date
+    first = df.drop_duplicates('_group', keep='first').sort_values('_group', kind='stable')
+    
+    callers, keep = clean_caller_numbers(first['Source'])
+    first = first.assign(caller_number=callers)[keep]
+    
+    timestamps = normalize_timestamps(first['Date'])
+    first = first.assign(timestamp=timestamps)
+    first = first[first['timestamp'].notna() & (first['timestamp'] != '')]
+    
+    # A call is ANSWERED if any leg has status=ANSWERED and duration > 0;
+    # the leg with the longest duration (first one on ties) wins
+    is_answered_leg = df['Status'].astype(str).str.upper() == 'ANSWERED'
+    answered = df[is_answered_leg & df['Duration'].notna()]
+    answered = answered.assign(duration_sec=parse_durations(answered['Duration']))
+    answered = answered[answered['duration_sec'] > 0]
+    best = (answered
+            .sort_values(['_group', 'duration_sec'], ascending=[True, False], kind='stable')
+            .drop_duplicates('_group', keep='first')
+            .set_index('_group'))
+    
+    if dst_channel_col:
+        best_extension = parse_extensions(best[dst_channel_col])
+    else:
+        best_extension = pd.Series(None, index=best.index, dtype=object)
+    
+    group_ids = first['_group']
+    is_answered = group_ids.isin(best.index)
+    duration = group_ids.map(best['duration_sec']).fillna(0).astype(int)
+    extension = group_ids.map(best_extension).astype(object)
+    extension = extension.where(extension.notna(), None)
+    
+    calls = pd.DataFrame({
+        'unique_id': first['UniqueID'].astype(str),
+        'timestamp': first['timestamp'],
+        'caller_number': first['caller_number'],
+        'extension': extension,
+        'status': is_answered.map({True: 'ANSWERED', False: 'MISSED'}),
+        'duration': duration,
+    })
+    
+    return calls.to_dict('records')
+
+def extract_calls(df: pd.DataFrame, dst_channel_col: Optional[str], engine: str = DEFAULT_ENGINE) -> List[Dict]:
+    """
+    Extract unique call records from a prepared CDR frame with the given engine
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown processing engine: {engine}")
+    
+    if engine == "legacy":
+        return extract_calls_legacy(df, dst_channel_col)
+    return extract_calls_columnar(df, dst_channel_col)
+
+def cdr_file_suffix(filename: str) -> Optional[str]:
+    """
+    Return the accepted CSV suffix of filename (".csv", ".csv.gz", ...) or None
+    """
+    name = filename.lower()
+    for suffix in COMPRESSED_CSV_SUFFIXES + (CSV_SUFFIX,):
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+def is_compressed_cdr_file(filename: str) -> bool:
+    """True for .csv.gz, .csv.bz2 and .csv.zst files"""
+    return cdr_file_suffix(filename) in COMPRESSED_CSV_SUFFIXES
+
+def open_cdr_file(path: str) -> BinaryIO:
+    """
+    Open a CDR file for reading, decompressing .gz, .bz2 and .zst on the fly
+    The inflated content is never held in memory as a whole
+    """
+    suffix = cdr_file_suffix(path)
+    
+    if suffix == '.csv.gz':
+        return gzip.open(path, 'rb')
+    
+    if suffix == '.csv.bz2':
+        return bz2.open(path, 'rb')
+    
+    if suffix == '.csv.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("Zstandard support requires the 'zstandard' package")
+        source = open(path, 'rb')
+        return zstandard.ZstdDecompressor().stream_reader(source, closefd=True)
+    
+    return open(path, 'rb')
+
+class _ReplayStream(io.RawIOBase):
+    """Bytes already read from a stream, followed by the rest of it"""
+    
+    def __init__(self, prefix: bytes, source: BinaryIO):
+        super().__init__()
+        self._prefix = memoryview(prefix)
+        self._source = source
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        data = self._source.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def read_if_small(source: BinaryIO, limit: int = MAX_IN_MEMORY_SIZE) -> Tuple[Optional[bytes], BinaryIO]:
+    """
+    Read source whole if it holds at most limit bytes
+    Returns (content, source), or (None, stream) for a larger source, where
+    stream replays what was read before the rest, for reading in chunks
+    """
+    parts = []
+    size = 0
+    while size <= limit:
+        # Decompressing readers may return less than asked before the end
+        data = source.read(limit + 1 - size)
+        if not data:
+            return b"".join(parts), source
+        parts.append(data)
+        size += len(data)
+    return None, io.BufferedReader(_ReplayStream(b"".join(parts), source))
+
+def is_used_column(name) -> bool:
+    """
+    True for the columns the processor reads: the required ones (any case)
+    and destination channel columns
+    """
+    name = str(name).strip().lower()
+    if name in (col.lower() for col in REQUIRED_COLUMNS):
+        return True
+    return 'dst' in name and 'channel' in name
+
+class _PrefixedReader(io.RawIOBase):
+    """Replays already-read bytes before the rest of a stream"""
+    
+    def __init__(self, prefix: bytes, rest: BinaryIO):
+        self._prefix = prefix
+        self._rest = rest
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        data = self._rest.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def _peek_header(source: BinaryIO) -> Tuple[List[str], BinaryIO]:
+    """
+    Read the header row of a (possibly non-seekable) CSV stream
+    Returns (column_names, stream positioned at the start again)
+    """
+    head = b''
+    while b'\n' not in head:
+        block = source.read(64 * 1024)
+        if not block:
+            break
+        head += block
+    
+    header_line = head.split(b'\n', 1)[0].decode('utf-8-sig').rstrip('\r')
+    names = next(csv.reader([header_line]), [])
+    return names, io.BufferedReader(_PrefixedReader(head, source))
+
+def _arrow_options(source: BinaryIO, block_size: Optional[int] = None) -> tuple:
+    """
+    pyarrow read/convert options that load only used columns, as strings
+    Returns (stream, read_options, convert_options)
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        raise ValueError("The arrow CSV reader requires the 'pyarrow' package")
+    
+    names, stream = _peek_header(source)
+    columns = [name for name in names if is_used_column(name)]
+    
+    read_options = pacsv.ReadOptions(block_size=block_size) if block_size else pacsv.ReadOptions()
+    convert_options = pacsv.ConvertOptions(
+        include_columns=columns,
+        column_types={name: pa.string() for name in columns},
+        # Empty fields become nulls, as with pandas
+        strings_can_be_null=True
+    )
+    return stream, read_options, convert_options
+
+def read_cdr_csv(source: BinaryIO, reader: str = DEFAULT_READER) -> pd.DataFrame:
+    """
+    Read a whole CDR CSV file with the given reader (see READERS)
+    """
+    if reader not in READERS:
+        raise ValueError(f"Unknown CSV reader: {reader}")
+    
+    if reader == "arrow":
+        import pyarrow.csv as pacsv
+        stream, read_options, convert_options = _arrow_options(source)
+        table = pacsv.read_csv(stream, read_options=read_options, convert_options=convert_options)
+        return table.to_pandas()
+    
+    if reader == "pruned":
+        return pd.read_csv(source, usecols=is_used_column, dtype=str)
+    
+    return pd.read_csv(source)
+
+def read_cdr_chunks(source: BinaryIO, reader: str = DEFAULT_READER,
+                    chunksize: int = STREAM_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Read a CDR CSV file in chunks with the given reader (see READERS)
+    Arrow chunks are sized in bytes, approximately chunksize rows each
+    """
+    if reader not in READERS:
+        raise ValueError(f"Unknown CSV reader: {reader}")
+    
+    if reader == "arrow":
+        import pyarrow.csv as pacsv
+        stream, read_options, convert_options = _arrow_options(source, chunksize * ARROW_BYTES_PER_ROW)
+        batches = pacsv.open_csv(stream, read_options=read_options, convert_options=convert_options)
+        seen = False
+        for batch in batches:
+            seen = True
+            yield batch.to_pandas()
+        if not seen:
+            # Header-only file: still yield the (empty) columns for validation
+            yield batches.schema.empty_table().to_pandas()
+        return
+    
+    if reader == "pruned":
+        yield from pd.read_csv(source, usecols=is_used_column, dtype=str, chunksize=chunksize)
+        return
+    
+    yield from pd.read_csv(source, chunksize=chunksize)
+
+def process_cdr_file(file_content: bytes, engine: str = DEFAULT_ENGINE,
+                     reader: str = DEFAULT_READER) -> Tuple[List[Dict], int, int]:
+    """
+    Process CDR CSV file and extract unique calls
+    
+    Args:
+        file_content: raw CSV bytes
+        engine: "columnar" (default) or "legacy"
+        reader: "inferred" (default), "pruned" or "arrow"
+    
+    Returns:
+        (processed_records, total_records_in_file, unique_calls)
+    """
+    try:
+        df = read_cdr_csv(BytesIO(file_content), reader)
+        
+        total_records = len(df)
+        
+        df, dst_channel_col = prepare_cdr_frame(df)
+        
+        processed_records = extract_calls(df, dst_channel_col, engine)
+        
+        return processed_records, total_records, len(processed_records)
+    
+    except Exception as e:
+        raise ValueError(f"Error processing CSV file: {str(e)}")
+
+def merge_call_records(record_lists: List[List[Dict]]) -> Tuple[List[Dict], int]:
+    """
+    Merge calls that share a UniqueID across several files
+    
+    The earliest record supplies timestamp and caller; the call is ANSWERED
+    if any file saw it answered, taking the longest answered leg (first one
+    on ties) for extension and duration, as within a single file.
+    
+    Returns:
+        (merged_records, number_of_records_merged_away)
+    """
+    merged = {}
+    merged_away = 0
+    
+    for records in record_lists:
+        for record in records:
+            existing = merged.get(record['unique_id'])
+            if existing is None:
+                merged[record['unique_id']] = record
+                continue
+            
+            merged_away += 1
+            base = existing if existing['timestamp'] <= record['timestamp'] else record
+            combined = dict(base)
             
-            # Create call record
-            call_record = {
-                'unique_id': str(unique_id),
-                'timestamp': timestamp,
-                'caller_number': caller_number,
-                'extension': extension,
-                'status': status,
-                'duration': duration
-            }
+            answered = [r for r in (existing, record) if r['status'] == 'ANSWERED']
+            if answered:
+                best = max(answered, key=lambda r: r['duration'])
+                combined.update(
+                    status='ANSWERED',
+                    extension=best['extension'],
+                    duration=best['duration']
+                )
+            merged[record['unique_id']] = combined
+    
+    return list(merged.values()), merged_away
+
+class _RowBuckets:
+    """
+    Temporary files that CDR rows are spread over by a hash of their
+    UniqueID, so every group of legs ends up whole in a single bucket
+    """
+    
+    def __init__(self, count: int, level: int = 0):
+        self.level = level
+        # A different hash key per level splits an oversized bucket further
+        self._hash_key = f"cdr-bucket-{level:05d}"
+        self._files = [tempfile.TemporaryFile(prefix="cdr-bucket-") for _ in range(count)]
+        self._rows = [0] * count
+    
+    def add(self, frame: pd.DataFrame):
+        """Append the rows of frame to their buckets, keeping file order"""
+        codes = self._hash(frame['UniqueID']) % len(self._files)
+        for code, part in frame.groupby(codes, sort=False):
+            pickle.dump(part, self._files[code], protocol=pickle.HIGHEST_PROTOCOL)
+            self._rows[code] += len(part)
+    
+    def _hash(self, unique_ids: pd.Series) -> np.ndarray:
+        """
+        Hashes that agree for every pair of UniqueIDs extract_calls could
+        group together, whichever dtype each chunk was read as: numbers hash
+        by value, strings by their text
+        """
+        if unique_ids.dtype != object:
+            values = unique_ids.astype('float64')
+        elif pd.api.types.infer_dtype(unique_ids, skipna=True) == 'string':
+            values = unique_ids
+        else:
+            # Numbers mixed with strings; numeric text joining them is harmless
+            values = pd.to_numeric(unique_ids, errors='coerce')
+            text = values.isna().to_numpy()
+            hashes = pd.util.hash_pandas_object(values, index=False, hash_key=self._hash_key).to_numpy()
+            hashes[text] = pd.util.hash_pandas_object(unique_ids[text].astype(str), index=False,
+                                                      hash_key=self._hash_key).to_numpy()
+            return hashes
+        return pd.util.hash_pandas_object(values, index=False, hash_key=self._hash_key).to_numpy()
+    
+    def _frames(self, index: int) -> Iterator[pd.DataFrame]:
+        file = self._files[index]
+        file.seek(0)
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+    
+    def _split(self, index: int, chunksize: int) -> "_RowBuckets":
+        """Spread an oversized bucket over enough buckets of the next level"""
+        split = _RowBuckets(2 * -(-self._rows[index] // (STREAM_BUCKET_MAX_CHUNKS * chunksize)), self.level + 1)
+        batch = []
+        for frame in self._frames(index):
+            batch.append(frame)
+            if sum(map(len, batch)) >= chunksize:
+                split.add(pd.concat(batch))
+                batch = []
+        if batch:
+            split.add(pd.concat(batch))
+        return split
+    
+    def extract(self, dst_channel_col: Optional[str], engine: str, chunksize: int) -> Iterator[List[Dict]]:
+        """
+        Calls of every bucket; small buckets are extracted together about a
+        chunk at a time, and buckets above STREAM_BUCKET_MAX_CHUNKS chunks are
+        split again first
+        """
+        batch = []
+        for index, rows in enumerate(self._rows):
+            if rows > STREAM_BUCKET_MAX_CHUNKS * chunksize and self.level < STREAM_MAX_LEVEL:
+                with self._split(index, chunksize) as split:
+                    yield from split.extract(dst_channel_col, engine, chunksize)
+            elif rows:
+                batch.extend(self._frames(index))
+            self._files[index].close()
             
-            processed_records.append(call_record)
+            if batch and (sum(map(len, batch)) >= chunksize or index == len(self._rows) - 1):
+                yield extract_calls(pd.concat(batch, ignore_index=True), dst_channel_col, engine)
+                batch = []
+    
+    def close(self):
+        for file in self._files:
+            file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def iter_cdr_file(source: BinaryIO,
+                  chunksize: int = STREAM_CHUNK_ROWS,
+                  engine: str = DEFAULT_ENGINE,
+                  reader: str = DEFAULT_READER) -> Iterator[Tuple[List[Dict], int]]:
+    """
+    Stream a CDR CSV file in chunks and yield its calls in bounded memory
+    
+    Legs of one call can be any distance apart in an export, so no call is
+    complete before the whole file has been read. Each chunk's rows are
+    appended to temporary bucket files by a hash of their UniqueID (one
+    ([], rows_read) per chunk); then each bucket, which holds whole groups,
+    is extracted on its own (one (calls, 0) per bucket). The calls are the
+    same as process_cdr_file's in another order, and memory stays around a
+    few chunks regardless of file size.
+    
+    Yields:
+        (processed_records, rows_read_from_file)
+    """
+    try:
+        dst_channel_col = None
         
-        return processed_records, total_records, len(processed_records)
+        with _RowBuckets(STREAM_BUCKETS) as buckets:
+            for chunk in read_cdr_chunks(source, reader, chunksize):
+                rows_read = len(chunk)
+                chunk, dst_channel_col = prepare_cdr_frame(chunk)
+                columns = REQUIRED_COLUMNS + ([dst_channel_col] if dst_channel_col else [])
+                buckets.add(chunk.loc[chunk['UniqueID'].notna(), columns])
+                yield [], rows_read
+            
+            for calls in buckets.extract(dst_channel_col, engine, chunksize):
+                yield calls, 0
     
     except Exception as e:
         raise ValueError(f"Error processing CSV file: {str(e)}")
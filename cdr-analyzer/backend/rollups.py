@@ -0,0 +1,629 @@
+"""
+Rollup tables for the statistics endpoints
+Kept up to date by triggers on each call_records partition, so ingest
+maintains them incrementally; rebuild_rollups() regenerates them from raw data
+
+Usage (from the backend directory):
+    python -m rollups check
+    python -m rollups rebuild
+"""
+import sqlite3
+import sys
+from datetime import date, timedelta
+from typing import Optional
+
+from partitions import partition_tables, union_source
+from sketches import count_unique_callers, rebuild_sketches
+
+ROLLUP_TABLES = ("daily_stats", "daily_extension_stats", "daily_callers", "interval_stats")
+
+SECONDS_PER_DAY = 86400
+
+# interval_stats slot length; coarser intervals combine whole slots
+SLOT_SECONDS = 900
+SLOTS_PER_DAY = SECONDS_PER_DAY // SLOT_SECONDS
+INTERVAL_MINUTES = (15, 30, 60)
+
+# Slot of the day a call starts in; ts_epoch keeps the PBX wall clock
+SLOT_SQL = f"{{}} % {SECONDS_PER_DAY} / {SLOT_SECONDS}"
+
+ROLLUP_SCHEMA = [
+    # Calls per day by status
+    """
+    CREATE TABLE IF NOT EXISTS daily_stats (
+        call_date TEXT PRIMARY KEY,
+        answered INTEGER NOT NULL DEFAULT 0,
+        missed INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """,
+    # Answered calls per day and extension
+    """
+    CREATE TABLE IF NOT EXISTS daily_extension_stats (
+        call_date TEXT NOT NULL,
+        extension TEXT NOT NULL,
+        call_count INTEGER NOT NULL DEFAULT 0,
+        total_duration INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (call_date, extension)
+    ) WITHOUT ROWID
+    """,
+    # Calls per day and caller number, for distinct caller counts
+    """
+    CREATE TABLE IF NOT EXISTS daily_callers (
+        call_date TEXT NOT NULL,
+        caller_number TEXT NOT NULL,
+        calls INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (call_date, caller_number)
+    ) WITHOUT ROWID
+    """,
+    # Calls per day and 15-minute slot of the day by status
+    """
+    CREATE TABLE IF NOT EXISTS interval_stats (
+        call_date TEXT NOT NULL,
+        slot INTEGER NOT NULL,
+        answered INTEGER NOT NULL DEFAULT 0,
+        missed INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (call_date, slot)
+    ) WITHOUT ROWID
+    """,
+]
+
+# SELECTs producing each rollup from call_records; used by rebuild and check
+ROLLUP_QUERIES = {
+    "daily_stats": """
+        SELECT
+            call_date,
+            SUM(CASE WHEN status = 'ANSWERED' THEN 1 ELSE 0 END) as answered,
+            SUM(CASE WHEN status = 'MISSED' THEN 1 ELSE 0 END) as missed,
+            COUNT(*) as total
+        FROM call_records
+        WHERE call_date IS NOT NULL
+        GROUP BY call_date
+    """,
+    "daily_extension_stats": """
+        SELECT
+            call_date,
+            extension,
+            COUNT(*) as call_count,
+            COALESCE(SUM(duration), 0) as total_duration
+        FROM call_records
+        WHERE call_date IS NOT NULL
+            AND extension IS NOT NULL
+            AND status = 'ANSWERED'
+        GROUP BY call_date, extension
+    """,
+    "daily_callers": """
+        SELECT
+            call_date,
+            caller_number,
+            COUNT(*) as calls
+        FROM call_records
+        WHERE call_date IS NOT NULL
+            AND caller_number IS NOT NULL
+            AND caller_number != ''
+        GROUP BY call_date, caller_number
+    """,
+    "interval_stats": f"""
+        SELECT
+            call_date,
+            {SLOT_SQL.format("ts_epoch")} as slot,
+            SUM(CASE WHEN status = 'ANSWERED' THEN 1 ELSE 0 END) as answered,
+            SUM(CASE WHEN status = 'MISSED' THEN 1 ELSE 0 END) as missed,
+            COUNT(*) as total
+        FROM call_records
+        WHERE call_date IS NOT NULL
+            AND ts_epoch IS NOT NULL
+        GROUP BY call_date, slot
+    """,
+}
+
+def _apply_row_sql(row: str, sign: int) -> str:
+    """
+    Trigger statements adding (sign=1) or removing (sign=-1) one call_records
+    row, referenced as NEW or OLD, from every rollup
+    """
+    day = f"{row}.call_date"
+    slot = SLOT_SQL.format(f"{row}.ts_epoch")
+    statements = [
+        f"""
+        INSERT INTO daily_stats (call_date, answered, missed, total)
+        VALUES ({day}, {sign} * ({row}.status = 'ANSWERED'), {sign} * ({row}.status = 'MISSED'), {sign})
+        ON CONFLICT(call_date) DO UPDATE SET
+            answered = answered + excluded.answered,
+            missed = missed + excluded.missed,
+            total = total + excluded.total;
+        """,
+        f"""
+        INSERT INTO daily_extension_stats (call_date, extension, call_count, total_duration)
+        SELECT {day}, {row}.extension, {sign}, {sign} * COALESCE({row}.duration, 0)
+        WHERE {row}.extension IS NOT NULL AND {row}.status = 'ANSWERED'
+        ON CONFLICT(call_date, extension) DO UPDATE SET
+            call_count = call_count + excluded.call_count,
+            total_duration = total_duration + excluded.total_duration;
+        """,
+        f"""
+        INSERT INTO daily_callers (call_date, caller_number, calls)
+        SELECT {day}, {row}.caller_number, {sign}
+        WHERE {row}.caller_number IS NOT NULL AND {row}.caller_number != ''
+        ON CONFLICT(call_date, caller_number) DO UPDATE SET
+            calls = calls + excluded.calls;
+        """,
+        f"""
+        INSERT INTO interval_stats (call_date, slot, answered, missed, total)
+        SELECT {day}, {slot}, {sign} * ({row}.status = 'ANSWERED'), {sign} * ({row}.status = 'MISSED'), {sign}
+        WHERE {row}.ts_epoch IS NOT NULL
+        ON CONFLICT(call_date, slot) DO UPDATE SET
+            answered = answered + excluded.answered,
+            missed = missed + excluded.missed,
+            total = total + excluded.total;
+        """,
+    ]
+    
+    if sign < 0:
+        # Drop emptied rows so rollups match a fresh rebuild
+        statements += [
+            f"DELETE FROM daily_stats WHERE call_date = {day} AND total <= 0;",
+            f"DELETE FROM daily_extension_stats WHERE call_date = {day} AND extension = {row}.extension AND call_count <= 0;",
+            f"DELETE FROM daily_callers WHERE call_date = {day} AND caller_number = {row}.caller_number AND calls <= 0;",
+            f"DELETE FROM interval_stats WHERE call_date = {day} AND slot = {slot} AND total <= 0;",
+        ]
+    
+    return "\n".join(statements)
+
+ROLLUP_TRIGGERS = [
+    f"""
+    CREATE TRIGGER trg_{{table}}_rollups_insert
+    AFTER INSERT ON {{table}}
+    WHEN NEW.call_date IS NOT NULL
+    BEGIN
+        {_apply_row_sql("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER trg_{{table}}_rollups_delete
+    AFTER DELETE ON {{table}}
+    WHEN OLD.call_date IS NOT NULL
+    BEGIN
+        {_apply_row_sql("OLD", -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER trg_{{table}}_rollups_update_old
+    AFTER UPDATE OF call_date, ts_epoch, caller_number, extension, status, duration ON {{table}}
+    WHEN OLD.call_date IS NOT NULL
+    BEGIN
+        {_apply_row_sql("OLD", -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER trg_{{table}}_rollups_update_new
+    AFTER UPDATE OF call_date, ts_epoch, caller_number, extension, status, duration ON {{table}}
+    WHEN NEW.call_date IS NOT NULL
+    BEGIN
+        {_apply_row_sql("NEW", 1)}
+    END
+    """,
+]
+
+TRIGGER_NAMES = ("trg_{table}_rollups_insert", "trg_{table}_rollups_delete",
+                 "trg_{table}_rollups_update_old", "trg_{table}_rollups_update_new")
+
+# Triggers of the single call_records table used before partitioning
+LEGACY_TRIGGER_NAMES = ("trg_rollups_insert", "trg_rollups_delete", "trg_rollups_update_old", "trg_rollups_update_new")
+
+def init_rollups(cursor: sqlite3.Cursor) -> bool:
+    """
+    Create rollup tables
+    Returns True if any of them was new, meaning they need a rebuild
+    """
+    placeholders = ", ".join("?" * len(ROLLUP_TABLES))
+    cursor.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+                   ROLLUP_TABLES)
+    created = cursor.fetchone()[0] < len(ROLLUP_TABLES)
+    
+    for statement in ROLLUP_SCHEMA:
+        cursor.execute(statement)
+    
+    return created
+
+def init_rollup_triggers(cursor: sqlite3.Cursor, table: str):
+    """(Re)create the rollup triggers of a partition, so trigger changes reach existing databases"""
+    for name in TRIGGER_NAMES:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name.format(table=table)}")
+    for statement in ROLLUP_TRIGGERS:
+        cursor.execute(statement.format(table=table))
+
+def forget_rollup_days(conn: sqlite3.Connection, first_day: str, end_day: str):
+    """Remove rollup rows for first_day <= call_date < end_day (a dropped partition)"""
+    for table in ROLLUP_TABLES:
+        conn.execute(f"DELETE FROM {table} WHERE call_date >= ? AND call_date < ?", (first_day, end_day))
+
+def rebuild_rollups(conn: sqlite3.Connection) -> dict:
+    """
+    Regenerate every rollup table from call_records
+    Returns the row count of each rollup table
+    """
+    cursor = conn.cursor()
+    counts = {}
+    
+    for table in ROLLUP_TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"INSERT INTO {table} {ROLLUP_QUERIES[table]}")
+        counts[table] = cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    
+    conn.commit()
+    return counts
+
+def check_rollups(conn: sqlite3.Connection) -> dict:
+    """
+    Compare each rollup table with the same aggregate computed from raw data
+    Returns {table: number of rows that differ}; all zeros when consistent
+    """
+    cursor = conn.cursor()
+    mismatches = {}
+    
+    for table in ROLLUP_TABLES:
+        query = ROLLUP_QUERIES[table]
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM (
+                SELECT * FROM (SELECT * FROM {table} EXCEPT {query})
+                UNION ALL
+                SELECT * FROM ({query} EXCEPT SELECT * FROM {table})
+            )
+        """)
+        mismatches[table] = cursor.fetchone()[0]
+    
+    return mismatches
+
+def epoch_day(epoch: int) -> str:
+    """YYYY-MM-DD of an epoch, matching call_date"""
+    return (date(1970, 1, 1) + timedelta(days=epoch // SECONDS_PER_DAY)).isoformat()
+
+def _raw_ranges(from_epoch: Optional[int], to_epoch: Optional[int]) -> tuple:
+    """
+    Raw-data pieces of an epoch range plus the whole days between them
+    
+    Returns (ranges, after_day, before_day): ranges is a list of inclusive
+    (from_epoch, to_epoch) pieces covering the partial first and last days;
+    whole days with after_day < call_date < before_day come from rollups,
+    either bound None meaning open-ended.
+    """
+    if from_epoch is not None and to_epoch is not None and \
+            from_epoch // SECONDS_PER_DAY >= to_epoch // SECONDS_PER_DAY:
+        # Within a single day (or empty)
+        return [(from_epoch, to_epoch)], None, None
+    
+    ranges = []
+    after_day = before_day = None
+    
+    if from_epoch is not None:
+        next_day = (from_epoch // SECONDS_PER_DAY + 1) * SECONDS_PER_DAY
+        ranges.append((from_epoch, next_day - 1))
+        after_day = epoch_day(from_epoch)
+    
+    if to_epoch is not None:
+        day_start = to_epoch // SECONDS_PER_DAY * SECONDS_PER_DAY
+        ranges.append((day_start, to_epoch))
+        before_day = epoch_day(to_epoch)
+    
+    return ranges, after_day, before_day
+
+def _raw_sources(conn: sqlite3.Connection, ranges: list, columns: str, where_sql: str = "1=1"):
+    """
+    Yield (source_sql, params) per raw range: a subquery of columns from the
+    partitions overlapping the range, filtered by where_sql; ranges without
+    a partition are skipped
+    """
+    for from_epoch, to_epoch in ranges:
+        tables = partition_tables(conn, from_epoch, to_epoch)
+        source, params = union_source(tables, columns, f"{where_sql} AND ts_epoch >= ? AND ts_epoch <= ?",
+                                      [from_epoch, to_epoch])
+        if source is not None:
+            yield source, params
+
+def _rollup_days_sql(after_day: Optional[str], before_day: Optional[str]) -> tuple:
+    """WHERE clause on call_date for the whole days of a range"""
+    clauses = ["1=1"]
+    params = []
+    if after_day is not None:
+        clauses.append("call_date > ?")
+        params.append(after_day)
+    if before_day is not None:
+        clauses.append("call_date < ?")
+        params.append(before_day)
+    return " AND ".join(clauses), params
+
+def _is_split(ranges: list, after_day, before_day) -> bool:
+    """True unless the range was answered by a single raw piece"""
+    return not (len(ranges) == 1 and after_day is None and before_day is None)
+
+def _add_day(days: dict, call_date: str, answered: int, missed: int, total: int):
+    """Add counts to a day of daily stats"""
+    day = days.setdefault(call_date, {'date': call_date, 'answered': 0, 'missed': 0, 'total': 0})
+    day['answered'] += answered
+    day['missed'] += missed
+    day['total'] += total
+
+def _add_extension(extensions: dict, extension: str, call_count: int, total_duration: Optional[int]):
+    """Add answered calls to an extension's stats"""
+    stats = extensions.setdefault(extension, {'extension': extension, 'call_count': 0, 'total_duration': 0})
+    stats['call_count'] += call_count
+    stats['total_duration'] += total_duration or 0
+
+def _rollup_daily(cursor: sqlite3.Cursor, days: dict, after_day: Optional[str], before_day: Optional[str]):
+    """Add the whole days' daily_stats rows"""
+    days_sql, days_params = _rollup_days_sql(after_day, before_day)
+    cursor.execute(f"""
+        SELECT call_date, answered, missed, total
+        FROM daily_stats
+        WHERE {days_sql}
+    """, days_params)
+    for row in cursor.fetchall():
+        _add_day(days, row['call_date'], row['answered'], row['missed'], row['total'])
+
+def _rollup_extensions(cursor: sqlite3.Cursor, extensions: dict, after_day: Optional[str], before_day: Optional[str]):
+    """Add the whole days' daily_extension_stats rows"""
+    days_sql, days_params = _rollup_days_sql(after_day, before_day)
+    cursor.execute(f"""
+        SELECT 
+            extension,
+            SUM(call_count) as call_count,
+            SUM(total_duration) as total_duration
+        FROM daily_extension_stats
+        WHERE {days_sql}
+        GROUP BY extension
+    """, days_params)
+    for row in cursor.fetchall():
+        _add_extension(extensions, row['extension'], row['call_count'], row['total_duration'])
+
+def _sorted_days(days: dict) -> list:
+    return [days[key] for key in sorted(days)]
+
+def _sorted_extensions(extensions: dict) -> list:
+    """Busiest extension first, with average duration"""
+    results = sorted(extensions.values(), key=lambda s: (-s['call_count'], s['extension']))
+    for stats in results:
+        stats['avg_duration'] = stats['total_duration'] / stats['call_count']
+    return results
+
+def query_daily_stats(conn: sqlite3.Connection, from_epoch: Optional[int], to_epoch: Optional[int]) -> list:
+    """
+    Answered/missed/total per day for from_epoch <= ts_epoch <= to_epoch,
+    ordered by date; either bound may be None
+    """
+    cursor = conn.cursor()
+    ranges, after_day, before_day = _raw_ranges(from_epoch, to_epoch)
+    days = {}
+    
+    for source, params in _raw_sources(conn, ranges, "call_date, status"):
+        cursor.execute(f"""
+            SELECT 
+                call_date,
+                SUM(CASE WHEN status = 'ANSWERED' THEN 1 ELSE 0 END) as answered,
+                SUM(CASE WHEN status = 'MISSED' THEN 1 ELSE 0 END) as missed,
+                COUNT(*) as total
+            FROM {source}
+            GROUP BY call_date
+        """, params)
+        for row in cursor.fetchall():
+            _add_day(days, row['call_date'], row['answered'], row['missed'], row['total'])
+    
+    if _is_split(ranges, after_day, before_day):
+        _rollup_daily(cursor, days, after_day, before_day)
+    
+    return _sorted_days(days)
+
+def count_calls(conn: sqlite3.Connection, from_epoch: Optional[int] = None,
+                to_epoch: Optional[int] = None) -> int:
+    """
+    Number of calls with from_epoch <= ts_epoch <= to_epoch, either bound
+    optional, summed from daily_stats and the partial edge days
+    """
+    days = query_daily_stats(conn, from_epoch, to_epoch)
+    return sum(day['total'] for day in days)
+
+def query_extension_stats(conn: sqlite3.Connection, from_epoch: Optional[int], to_epoch: Optional[int]) -> list:
+    """
+    Answered call count and duration per extension for
+    from_epoch <= ts_epoch <= to_epoch, busiest extension first
+    """
+    cursor = conn.cursor()
+    ranges, after_day, before_day = _raw_ranges(from_epoch, to_epoch)
+    extensions = {}
+    
+    answered_sql = "extension IS NOT NULL AND status = 'ANSWERED'"
+    for source, params in _raw_sources(conn, ranges, "extension, duration", answered_sql):
+        cursor.execute(f"""
+            SELECT 
+                extension,
+                COUNT(*) as call_count,
+                SUM(duration) as total_duration
+            FROM {source}
+            GROUP BY extension
+        """, params)
+        for row in cursor.fetchall():
+            _add_extension(extensions, row['extension'], row['call_count'], row['total_duration'])
+    
+    if _is_split(ranges, after_day, before_day):
+        _rollup_extensions(cursor, extensions, after_day, before_day)
+    
+    return _sorted_extensions(extensions)
+
+def query_unique_callers(conn: sqlite3.Connection, from_epoch: int, to_epoch: int) -> list:
+    """
+    Distinct callers and calls with a caller number per day, for the days
+    from from_epoch's date through to_epoch's date
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT 
+            call_date,
+            COUNT(*) as unique_callers,
+            SUM(calls) as total_calls
+        FROM daily_callers
+        WHERE call_date >= ?
+            AND call_date <= ?
+        GROUP BY call_date
+        ORDER BY call_date ASC
+    """, (epoch_day(from_epoch), epoch_day(to_epoch)))
+    
+    return [
+        {'date': row['call_date'], 'unique_callers': row['unique_callers'], 'total_calls': row['total_calls']}
+        for row in cursor.fetchall()
+    ]
+
+def _slot_buckets(conn: sqlite3.Connection, from_epoch: Optional[int], to_epoch: Optional[int],
+                  bucket_sql: str, buckets: int) -> list:
+    """
+    [answered, missed, total] per bucket for from_epoch <= ts_epoch <= to_epoch
+    bucket_sql maps call_date and slot (15-minute slot of the day) to an
+    integer in range(buckets); whole days are grouped inside interval_stats,
+    the partial edge days in one pass over their rows
+    """
+    cursor = conn.cursor()
+    ranges, after_day, before_day = _raw_ranges(from_epoch, to_epoch)
+    counts = [[0, 0, 0] for _ in range(buckets)]
+    
+    def add(rows):
+        for row in rows:
+            bucket = counts[row['bucket']]
+            bucket[0] += row['answered']
+            bucket[1] += row['missed']
+            bucket[2] += row['total']
+    
+    columns = f"call_date, {SLOT_SQL.format('ts_epoch')} as slot, status"
+    for source, params in _raw_sources(conn, ranges, columns):
+        cursor.execute(f"""
+            SELECT 
+                {bucket_sql} as bucket,
+                SUM(CASE WHEN status = 'ANSWERED' THEN 1 ELSE 0 END) as answered,
+                SUM(CASE WHEN status = 'MISSED' THEN 1 ELSE 0 END) as missed,
+                COUNT(*) as total
+            FROM {source}
+            GROUP BY bucket
+        """, params)
+        add(cursor.fetchall())
+    
+    if _is_split(ranges, after_day, before_day):
+        days_sql, days_params = _rollup_days_sql(after_day, before_day)
+        cursor.execute(f"""
+            SELECT 
+                {bucket_sql} as bucket,
+                SUM(answered) as answered,
+                SUM(missed) as missed,
+                SUM(total) as total
+            FROM interval_stats
+            WHERE {days_sql}
+            GROUP BY bucket
+        """, days_params)
+        add(cursor.fetchall())
+    
+    return counts
+
+def query_interval_stats(conn: sqlite3.Connection, from_epoch: Optional[int], to_epoch: Optional[int],
+                         minutes: int = 15) -> list:
+    """
+    Answered/missed/total per time-of-day interval of the given length,
+    summed over from_epoch <= ts_epoch <= to_epoch; every interval of the
+    day is listed, from 00:00
+    Raises ValueError unless minutes is one of INTERVAL_MINUTES
+    """
+    if minutes not in INTERVAL_MINUTES:
+        raise ValueError(f"Interval must be one of {', '.join(map(str, INTERVAL_MINUTES))} minutes")
+    slots = minutes * 60 // SLOT_SECONDS
+    counts = _slot_buckets(conn, from_epoch, to_epoch, f"slot / {slots}", SLOTS_PER_DAY // slots)
+    
+    return [
+        {'start': f"{index * minutes // 60:02d}:{index * minutes % 60:02d}",
+         'answered': answered, 'missed': missed, 'total': total}
+        for index, (answered, missed, total) in enumerate(counts)
+    ]
+
+def query_heatmap(conn: sqlite3.Connection, from_epoch: Optional[int], to_epoch: Optional[int]) -> list:
+    """
+    Answered/missed/total per weekday (0 = Monday) and hour of day for
+    from_epoch <= ts_epoch <= to_epoch; all 168 cells, Monday 00:00 first
+    """
+    slots = 3600 // SLOT_SECONDS
+    # Julian day numbers mod 7 count weekdays from Monday; cheaper than strftime('%w')
+    weekday_sql = "CAST(julianday(call_date) + 0.5 AS INTEGER) % 7"
+    counts = _slot_buckets(conn, from_epoch, to_epoch, f"{weekday_sql} * 24 + slot / {slots}", 7 * 24)
+    
+    return [
+        {'weekday': index // 24, 'hour': index % 24, 'answered': answered, 'missed': missed, 'total': total}
+        for index, (answered, missed, total) in enumerate(counts)
+    ]
+
+def query_dashboard(conn: sqlite3.Connection, from_epoch: int, to_epoch: int) -> dict:
+    """
+    Daily stats, extension stats and unique callers for one range in one
+    session; the partial edge days are scanned once for both stats
+    Returns a dict with daily_stats, extension_stats, unique_callers (per
+    day) and unique_callers_total (sketch estimate over the full requested
+    range; day sketches count the partial edge days whole)
+    """
+    cursor = conn.cursor()
+    ranges, after_day, before_day = _raw_ranges(from_epoch, to_epoch)
+    days = {}
+    extensions = {}
+    
+    for source, params in _raw_sources(conn, ranges, "call_date, status, extension, duration"):
+        cursor.execute(f"""
+            SELECT 
+                call_date,
+                status,
+                extension,
+                COUNT(*) as calls,
+                SUM(duration) as total_duration
+            FROM {source}
+            GROUP BY call_date, status, extension
+        """, params)
+        for row in cursor.fetchall():
+            answered = row['status'] == 'ANSWERED'
+            _add_day(days, row['call_date'], row['calls'] if answered else 0,
+                     row['calls'] if row['status'] == 'MISSED' else 0, row['calls'])
+            if answered and row['extension'] is not None:
+                _add_extension(extensions, row['extension'], row['calls'], row['total_duration'])
+    
+    if _is_split(ranges, after_day, before_day):
+        _rollup_daily(cursor, days, after_day, before_day)
+        _rollup_extensions(cursor, extensions, after_day, before_day)
+    
+    return {
+        'daily_stats': _sorted_days(days),
+        'extension_stats': _sorted_extensions(extensions),
+        'unique_callers': query_unique_callers(conn, from_epoch, to_epoch),
+        'unique_callers_total': count_unique_callers(conn, epoch_day(from_epoch), epoch_day(to_epoch)),
+    }
+
+def main(argv=None) -> int:
+    """Command line entry point; check returns 1 when rollups are out of sync"""
+    import argparse
+    from database import get_db, DATABASE_PATH
+    
+    parser = argparse.ArgumentParser(description="Rebuild or check statistics rollup tables")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args(argv)
+    
+    with get_db() as conn:
+        if args.command == "rebuild":
+            counts = rebuild_rollups(conn)
+            counts['daily_caller_sketches'] = rebuild_sketches(conn)
+            for table, count in counts.items():
+                print(f"{table:<24} {count:>10,} rows")
+            print(f"✅ Rollups rebuilt for {DATABASE_PATH}")
+            return 0
+        
+        mismatches = check_rollups(conn)
+    
+    for table, count in mismatches.items():
+        print(f"{table:<24} {count:>10,} mismatched rows")
+    if any(mismatches.values()):
+        print("❌ Rollups are out of sync; run: python -m rollups rebuild")
+        return 1
+    print("✅ Rollups match raw data")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
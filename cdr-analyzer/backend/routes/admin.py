@@ -1,9 +1,15 @@
 """
 Admin endpoints for database management
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from database import get_db, clear_all_data
+from typing import List, Optional
+from database import run_db, get_pool, clear_all_data, partition_stats, drop_partition, apply_retention
+from database import check_date_bounds
+from partitions import month_key, month_label
+from models import PurgeRequest, PurgeStatus
+from jobs import submit_purge, get_purge_job, run_write
+from cache import response_cache
 
 router = APIRouter()
 
@@ -13,6 +19,49 @@ class ClearResponse(BaseModel):
     message: str
     records_deleted: int
 
+class DatabasePoolStats(BaseModel):
+    """Connection pool usage and checkout latency"""
+    database_path: str
+    size: int
+    open: int
+    idle: int
+    in_use: int
+    checkouts: int
+    waits: int
+    timeouts: int
+    avg_wait_ms: float
+    max_wait_ms: float
+    avg_checkout_ms: float
+    max_checkout_ms: float
+
+class CacheStats(BaseModel):
+    """Response cache size and hit rate"""
+    size: int
+    max_entries: int
+    generation: int
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    stale: int
+
+class PartitionInfo(BaseModel):
+    """A monthly call_records partition; month is None for undated calls"""
+    month: Optional[str]
+    table: str
+    calls: int
+
+class PartitionDropResponse(BaseModel):
+    """Response model for dropping a partition"""
+    success: bool
+    month: str
+    records_deleted: int
+
+class RetentionResponse(BaseModel):
+    """Response model for applying the retention policy"""
+    keep_months: int
+    dropped: List[str]
+
 @router.delete("/clear-database")
 async def clear_database():
     """
@@ -20,8 +69,7 @@ async def clear_database():
     ⚠️ WARNING: This will delete all call records permanently!
     """
     try:
-        with get_db() as conn:
-            count = clear_all_data(conn)
+        count = await run_write(clear_all_data)
         
         return ClearResponse(
             success=True,
@@ -31,3 +79,78 @@ async def clear_database():
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear database: {str(e)}")
+
+@router.get("/admin/db-pool", response_model=DatabasePoolStats)
+async def get_database_pool_stats():
+    """
+    Get database connection pool metrics
+    Wait times count only checkouts that had to wait for a free connection
+    """
+    return DatabasePoolStats(**get_pool().stats())
+
+@router.get("/admin/cache", response_model=CacheStats)
+async def get_cache_stats():
+    """
+    Get response cache metrics
+    Misses include lookups that found an entry made stale by a write
+    """
+    return CacheStats(**response_cache.stats())
+
+@router.get("/admin/partitions", response_model=List[PartitionInfo])
+async def list_partitions():
+    """
+    List the monthly call_records partitions, oldest first
+    """
+    return [PartitionInfo(**partition) for partition in await run_db(partition_stats)]
+
+@router.delete("/admin/partitions/{month}", response_model=PartitionDropResponse)
+async def delete_partition(month: str):
+    """
+    Drop one month of calls (YYYY-MM) in a single step
+    ⚠️ WARNING: This deletes the month's call records permanently!
+    """
+    try:
+        key = month_key(month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    count = await run_write(drop_partition, key)
+    return PartitionDropResponse(success=True, month=month_label(key), records_deleted=count)
+
+@router.post("/admin/retention", response_model=RetentionResponse)
+async def run_retention(keep_months: int = Query(..., ge=1, description="Months to keep, counting the current one")):
+    """
+    Drop every partition older than the last keep_months months
+    ⚠️ WARNING: This deletes older call records permanently!
+    """
+    dropped = await run_write(apply_retention, keep_months)
+    return RetentionResponse(keep_months=keep_months, dropped=dropped)
+
+@router.post("/admin/purge", response_model=PurgeStatus, status_code=202)
+async def purge(filters: PurgeRequest):
+    """
+    Delete calls by date range, extension and/or upload source in the background
+    Deletes run in small batches so the service stays responsive, followed
+    by an incremental vacuum; poll GET /admin/purge/{job_id} for progress
+    ⚠️ WARNING: This deletes the matching call records permanently!
+    """
+    if not any(filters.model_dump().values()):
+        raise HTTPException(status_code=400, detail="At least one purge filter is required")
+    try:
+        check_date_bounds(filters.from_date, filters.to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return submit_purge(filters).to_status()
+
+@router.get("/admin/purge/{job_id}", response_model=PurgeStatus)
+async def get_purge_status(job_id: str):
+    """
+    Get progress of a purge job
+    Reports stage, partitions done, calls deleted and pages freed
+    """
+    job = get_purge_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Purge job {job_id} not found")
+    
+    return job.to_status()
@@ -2,92 +2,143 @@
 Calls endpoints for retrieving and searching call records
 """
 from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from typing import Optional
-from datetime import datetime, timedelta
-from models import CallRecord, CallListResponse
-from database import get_db, get_calls
+from models import CallListResponse
+from database import run_db, get_calls, decode_cursor, check_date_bounds, date_bound_epoch
+from cache import cached, cache_key
+from export import EXPORT_FORMATS, parquet_supported, stream_export
+from fastjson import dumps
 
 router = APIRouter()
 
+def call_list_response(calls: list, total: Optional[int], page: int, limit: int,
+                       next_cursor: Optional[str]) -> Response:
+    """
+    CallListResponse JSON encoded straight from get_calls rows
+    The rows already hold the CallRecord fields in order, with timestamps
+    stored as isoformat() text, so no models are built per row; the routes
+    keep response_model for the OpenAPI schema.
+    """
+    return Response(dumps({
+        'calls': calls,
+        'total': total,
+        'page': page,
+        'limit': limit,
+        'next_cursor': next_cursor
+    }), media_type="application/json")
+
 @router.get("/calls", response_model=CallListResponse)
 async def list_calls(
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(50, ge=1, le=100, description="Records per page"),
     from_date: Optional[str] = Query(None, description="Start date (ISO format)"),
     to_date: Optional[str] = Query(None, description="End date (ISO format)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = Query(False, description="Also count all matching calls"),
 ):
     """
     Get paginated list of calls with optional date filtering
+    Follow next_cursor for constant-cost paging; page alone uses OFFSET
     """
     try:
-        with get_db() as conn:
-            calls, total = get_calls(
-                conn,
-                page=page,
-                limit=limit,
-                from_date=from_date,
-                to_date=to_date
-            )
-        
-        # Convert to Pydantic models
-        call_records = [
-            CallRecord(
-                unique_id=call['unique_id'],
-                timestamp=datetime.fromisoformat(call['timestamp']),
-                caller_number=call['caller_number'],
-                extension=call['extension'],
-                status=call['status'],
-                duration=call['duration']
-            )
-            for call in calls
-        ]
-        
-        return CallListResponse(
-            calls=call_records,
-            total=total,
-            page=page,
-            limit=limit
+        check_date_bounds(from_date, to_date)
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        # Equivalent date spellings share an entry; page only matters without a cursor
+        key = cache_key(
+            "calls",
+            page=None if cursor else page,
+            limit=limit,
+            from_epoch=date_bound_epoch(from_date),
+            to_epoch=date_bound_epoch(to_date),
+            cursor=cursor,
+            include_total=include_total
         )
+        calls, total, next_cursor = await cached(key, lambda: run_db(
+            get_calls,
+            page=page,
+            limit=limit,
+            from_date=from_date,
+            to_date=to_date,
+            cursor=cursor,
+            include_total=include_total
+        ))
+        
+        return call_list_response(calls, total, page, limit, next_cursor)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/calls/export")
+async def export_calls(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$",
+                               description="csv, ndjson or parquet"),
+    from_date: Optional[str] = Query(None, description="Start date (ISO format)"),
+    to_date: Optional[str] = Query(None, description="End date (ISO format)"),
+    phone: Optional[str] = Query(None, min_length=3, description="Partial phone number match"),
+):
+    """
+    Stream every matching call, newest first, as a file download
+    Same filters as /calls and /calls/search without paging; rows are read
+    in batches through a database cursor, so memory stays flat however
+    many calls match. Parquet is written one row group per batch.
+    """
+    try:
+        check_date_bounds(from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if export_format == "parquet" and not parquet_supported():
+        raise HTTPException(status_code=501, detail="Parquet export requires the 'pyarrow' package")
+    
+    media_type, extension = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        stream_export(export_format, from_date, to_date, phone),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="calls.{extension}"'}
+    )
+
 @router.get("/calls/search", response_model=CallListResponse)
 async def search_calls(
     phone: str = Query(..., min_length=3, description="Phone number to search"),
     page: int = Query(1, ge=1),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = Query(False, description="Also count all matching calls"),
 ):
     """
     Search calls by partial phone number match
     """
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        with get_db() as conn:
-            calls, total = get_calls(
-                conn,
-                page=page,
-                limit=limit,
-                search=phone
-            )
-        
-        call_records = [
-            CallRecord(
-                unique_id=call['unique_id'],
-                timestamp=datetime.fromisoformat(call['timestamp']),
-                caller_number=call['caller_number'],
-                extension=call['extension'],
-                status=call['status'],
-                duration=call['duration']
-            )
-            for call in calls
-        ]
-        
-        return CallListResponse(
-            calls=call_records,
-            total=total,
-            page=page,
-            limit=limit
+        key = cache_key(
+            "calls/search",
+            phone=phone,
+            page=None if cursor else page,
+            limit=limit,
+            cursor=cursor,
+            include_total=include_total
         )
+        calls, total, next_cursor = await cached(key, lambda: run_db(
+            get_calls,
+            page=page,
+            limit=limit,
+            search=phone,
+            cursor=cursor,
+            include_total=include_total
+        ))
+        
+        return call_list_response(calls, total, page, limit, next_cursor)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,70 @@
+"""
+Dashboard endpoint returning every figure of one render in a single request
+"""
+from fastapi import APIRouter, Query, HTTPException
+from typing import Optional
+from datetime import datetime, timedelta
+from models import DashboardResponse, DashboardSummary, DailyStats, ExtensionStats, UniqueCallersStats
+from database import run_db, date_bound_epoch
+from rollups import query_dashboard
+from sketches import STANDARD_ERROR
+from cache import cached, cache_key
+
+router = APIRouter()
+
+@router.get("/dashboard", response_model=DashboardResponse)
+async def get_dashboard(
+    from_date: Optional[str] = Query(None, description="Start date (ISO format)"),
+    to_date: Optional[str] = Query(None, description="End date (ISO format)")
+):
+    """
+    Get the dashboard summary, daily and extension stats and unique callers
+    Computed in one database session; the same figures as /stats/daily,
+    /stats/extensions and /stats/unique-callers for the range
+    """
+    try:
+        # Default to last 7 days if no dates provided
+        if not from_date:
+            from_date = (datetime.now() - timedelta(days=7)).isoformat()
+        if not to_date:
+            to_date = datetime.now().isoformat()
+        
+        from_epoch = date_bound_epoch(from_date)
+        to_epoch = date_bound_epoch(to_date)
+        
+        results = await cached(
+            cache_key("dashboard", from_epoch=from_epoch, to_epoch=to_epoch),
+            lambda: run_db(query_dashboard, from_epoch, to_epoch)
+        )
+        
+        daily_stats = [DailyStats(**day) for day in results['daily_stats']]
+        total = sum(day.total for day in daily_stats)
+        answered = sum(day.answered for day in daily_stats)
+        
+        return DashboardResponse(
+            summary=DashboardSummary(
+                total=total,
+                answered=answered,
+                missed=sum(day.missed for day in daily_stats),
+                answer_rate=round(answered / total * 100, 2) if total else 0.0,
+                unique_callers=results['unique_callers_total'],
+                unique_callers_standard_error=round(STANDARD_ERROR, 4)
+            ),
+            daily_stats=daily_stats,
+            extension_stats=[
+                ExtensionStats(
+                    extension=row['extension'],
+                    call_count=row['call_count'],
+                    total_duration=row['total_duration'],
+                    avg_duration=round(row['avg_duration'], 2)
+                )
+                for row in results['extension_stats']
+            ],
+            unique_callers=[UniqueCallersStats(**row) for row in results['unique_callers']]
+        )
+    
+    except ValueError as e:
+        # Unparseable date filter
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,20 @@
+"""
+Job endpoints for tracking background ingest
+"""
+from fastapi import APIRouter, HTTPException
+from models import JobStatus
+from jobs import get_job
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str):
+    """
+    Get progress of a background ingest job
+    Reports stage, rows parsed, calls inserted and elapsed time
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    return job.to_status()
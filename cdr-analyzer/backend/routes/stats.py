@@ -4,8 +4,13 @@ Statistics endpoints for dashboard visualization
 from fastapi import APIRouter, Query, HTTPException
 from typing import Optional
 from datetime import datetime, timedelta
-from models import StatsResponse, DailyStats, ExtensionStats, UniqueCallersStats
-from database import get_db
+from models import StatsResponse, DailyStats, ExtensionStats, UniqueCallersStats, UniqueCallersRange
+from models import IntervalStats, HeatmapCell
+from database import run_db, date_bound_epoch
+from rollups import query_daily_stats, query_extension_stats, query_unique_callers, epoch_day
+from rollups import query_interval_stats, query_heatmap
+from sketches import count_unique_callers, STANDARD_ERROR
+from cache import cached, cache_key
 
 router = APIRouter()
 
@@ -17,6 +22,7 @@ async def get_daily_stats(
     """
     Get daily call statistics for the specified date range
     Returns count of answered and missed calls per day
+    Whole days are read from the daily_stats rollup
     """
     try:
         # Default to last 7 days if no dates provided
@@ -25,35 +31,29 @@ async def get_daily_stats(
         if not to_date:
             to_date = datetime.now().isoformat()
         
-        with get_db() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT 
-                    DATE(timestamp) as call_date,
-                    SUM(CASE WHEN status = 'ANSWERED' THEN 1 ELSE 0 END) as answered,
-                    SUM(CASE WHEN status = 'MISSED' THEN 1 ELSE 0 END) as missed,
-                    COUNT(*) as total
-                FROM call_records
-                WHERE timestamp >= ? AND timestamp <= ?
-                GROUP BY DATE(timestamp)
-                ORDER BY call_date ASC
-            """, (from_date, to_date))
-            
-            results = cursor.fetchall()
-            
-            daily_stats = [
-                DailyStats(
-                    date=row['call_date'],
-                    answered=row['answered'],
-                    missed=row['missed'],
-                    total=row['total']
-                )
-                for row in results
-            ]
-            
-            return daily_stats
+        from_epoch = date_bound_epoch(from_date)
+        to_epoch = date_bound_epoch(to_date)
+        
+        results = await cached(
+            cache_key("stats/daily", from_epoch=from_epoch, to_epoch=to_epoch),
+            lambda: run_db(query_daily_stats, from_epoch, to_epoch)
+        )
+        
+        daily_stats = [
+            DailyStats(
+                date=row['date'],
+                answered=row['answered'],
+                missed=row['missed'],
+                total=row['total']
+            )
+            for row in results
+        ]
+        
+        return daily_stats
     
+    except ValueError as e:
+        # Unparseable date filter
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -65,6 +65,7 @@ async def get_extension_stats(
     """
     Get extension performance statistics
     Returns call count and duration per extension
+    Whole days are read from the daily_extension_stats rollup
     """
     try:
         # Default to last 7 days if no dates provided
@@ -73,38 +74,29 @@ async def get_extension_stats(
         if not to_date:
             to_date = datetime.now().isoformat()
         
-        with get_db() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT 
-                    extension,
-                    COUNT(*) as call_count,
-                    SUM(duration) as total_duration,
-                    AVG(duration) as avg_duration
-                FROM call_records
-                WHERE extension IS NOT NULL 
-                    AND status = 'ANSWERED'
-                    AND timestamp >= ? 
-                    AND timestamp <= ?
-                GROUP BY extension
-                ORDER BY call_count DESC
-            """, (from_date, to_date))
-            
-            results = cursor.fetchall()
-            
-            extension_stats = [
-                ExtensionStats(
-                    extension=row['extension'],
-                    call_count=row['call_count'],
-                    total_duration=row['total_duration'],
-                    avg_duration=round(row['avg_duration'], 2)
-                )
-                for row in results
-            ]
-            
-            return extension_stats
+        from_epoch = date_bound_epoch(from_date)
+        to_epoch = date_bound_epoch(to_date)
+        
+        results = await cached(
+            cache_key("stats/extensions", from_epoch=from_epoch, to_epoch=to_epoch),
+            lambda: run_db(query_extension_stats, from_epoch, to_epoch)
+        )
+        
+        extension_stats = [
+            ExtensionStats(
+                extension=row['extension'],
+                call_count=row['call_count'],
+                total_duration=row['total_duration'],
+                avg_duration=round(row['avg_duration'], 2)
+            )
+            for row in results
+        ]
+        
+        return extension_stats
     
+    except ValueError as e:
+        # Unparseable date filter
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -117,6 +109,94 @@ async def get_unique_callers_stats(
     Get unique callers statistics per day
     Counts distinct caller numbers - each phone number is counted once per day
     regardless of how many times they called
+    Read from the daily_callers rollup
+    """
+    try:
+        # Default to last 7 days if no dates provided
+        if not from_date:
+            from_date = (datetime.now() - timedelta(days=7)).isoformat()
+        if not to_date:
+            to_date = datetime.now().isoformat()
+        
+        from_epoch = date_bound_epoch(from_date)
+        to_epoch = date_bound_epoch(to_date)
+        
+        results = await cached(
+            cache_key("stats/unique-callers", from_epoch=from_epoch, to_epoch=to_epoch),
+            lambda: run_db(query_unique_callers, from_epoch, to_epoch)
+        )
+        
+        unique_callers_stats = [
+            UniqueCallersStats(
+                date=row['date'],
+                unique_callers=row['unique_callers'],
+                total_calls=row['total_calls']
+            )
+            for row in results
+        ]
+        
+        return unique_callers_stats
+    
+    except ValueError as e:
+        # Unparseable date filter
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stats/unique-callers/range", response_model=UniqueCallersRange)
+async def get_unique_callers_range(
+    from_date: Optional[str] = Query(None, description="Start date (ISO format)"),
+    to_date: Optional[str] = Query(None, description="End date (ISO format)"),
+    days: Optional[int] = Query(None, ge=1, le=3660, description="Rolling window of days ending at to_date; overrides from_date"),
+    exact: bool = Query(False, description="Count exactly instead of estimating from sketches")
+):
+    """
+    Get distinct callers over a whole range of days
+    Each phone number is counted once across the range. Estimated by merging
+    the per-day HyperLogLog sketches (about 0.8% standard error), or counted
+    exactly from the daily_callers rollup with exact=true
+    """
+    try:
+        # Default to last 7 days if no dates provided
+        if not to_date:
+            to_date = datetime.now().isoformat()
+        last_day = epoch_day(date_bound_epoch(to_date))
+        if days:
+            first_day = (datetime.fromisoformat(last_day) - timedelta(days=days - 1)).date().isoformat()
+        else:
+            if not from_date:
+                from_date = (datetime.now() - timedelta(days=7)).isoformat()
+            first_day = epoch_day(date_bound_epoch(from_date))
+        
+        unique_callers = await cached(
+            cache_key("stats/unique-callers/range", first_day=first_day, last_day=last_day, exact=exact),
+            lambda: run_db(count_unique_callers, first_day, last_day, exact=exact)
+        )
+        
+        return UniqueCallersRange(
+            from_date=first_day,
+            to_date=last_day,
+            unique_callers=unique_callers,
+            exact=exact,
+            standard_error=0.0 if exact else round(STANDARD_ERROR, 4)
+        )
+    
+    except ValueError as e:
+        # Unparseable date filter
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stats/intervals", response_model=list[IntervalStats])
+async def get_interval_stats(
+    from_date: Optional[str] = Query(None, description="Start date (ISO format)"),
+    to_date: Optional[str] = Query(None, description="End date (ISO format)"),
+    interval: int = Query(15, description="Interval length in minutes: 15, 30 or 60")
+):
+    """
+    Get answered and missed calls per time-of-day interval
+    Every interval of the day is listed, summed over the date range
+    Whole days are read from the interval_stats rollup
     """
     try:
         # Default to last 7 days if no dates provided
@@ -125,35 +205,51 @@ async def get_unique_callers_stats(
         if not to_date:
             to_date = datetime.now().isoformat()
         
-        with get_db() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT 
-                    DATE(timestamp) as call_date,
-                    COUNT(DISTINCT caller_number) as unique_callers,
-                    COUNT(*) as total_calls
-                FROM call_records
-                WHERE DATE(timestamp) >= DATE(?)
-                    AND DATE(timestamp) <= DATE(?)
-                    AND caller_number IS NOT NULL
-                    AND caller_number != ''
-                GROUP BY DATE(timestamp)
-                ORDER BY call_date ASC
-            """, (from_date, to_date))
-            
-            results = cursor.fetchall()
-            
-            unique_callers_stats = [
-                UniqueCallersStats(
-                    date=row['call_date'],
-                    unique_callers=row['unique_callers'],
-                    total_calls=row['total_calls']
-                )
-                for row in results
-            ]
-            
-            return unique_callers_stats
+        from_epoch = date_bound_epoch(from_date)
+        to_epoch = date_bound_epoch(to_date)
+        
+        results = await cached(
+            cache_key("stats/intervals", from_epoch=from_epoch, to_epoch=to_epoch, interval=interval),
+            lambda: run_db(query_interval_stats, from_epoch, to_epoch, interval)
+        )
+        
+        return [IntervalStats(**row) for row in results]
+    
+    except ValueError as e:
+        # Unparseable date filter or unsupported interval
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stats/heatmap", response_model=list[HeatmapCell])
+async def get_heatmap(
+    from_date: Optional[str] = Query(None, description="Start date (ISO format)"),
+    to_date: Optional[str] = Query(None, description="End date (ISO format)")
+):
+    """
+    Get answered and missed calls per weekday and hour of day
+    All 7 x 24 cells are listed, Monday 00:00 first
+    Whole days are read from the interval_stats rollup
+    """
+    try:
+        # Default to last 7 days if no dates provided
+        if not from_date:
+            from_date = (datetime.now() - timedelta(days=7)).isoformat()
+        if not to_date:
+            to_date = datetime.now().isoformat()
+        
+        from_epoch = date_bound_epoch(from_date)
+        to_epoch = date_bound_epoch(to_date)
+        
+        results = await cached(
+            cache_key("stats/heatmap", from_epoch=from_epoch, to_epoch=to_epoch),
+            lambda: run_db(query_heatmap, from_epoch, to_epoch)
+        )
+        
+        return [HeatmapCell(**row) for row in results]
     
+    except ValueError as e:
+        # Unparseable date filter
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,71 +1,176 @@
 """
 Upload endpoint for CDR files
 """
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from models import UploadResponse
-from processor import process_cdr_file
-from database import get_db, insert_call_record
+import os
+import asyncio
+import shutil
+import tempfile
+import zipfile
+from typing import List
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query
+from models import UploadJobResponse, BatchUploadResponse, BatchFileResult
+from jobs import submit_ingest, ingest_batch
+from processor import cdr_file_suffix, is_compressed_cdr_file, MAX_IN_MEMORY_SIZE
 
 router = APIRouter()
 
-@router.post("/upload", response_model=UploadResponse)
-async def upload_cdr_file(file: UploadFile = File(...)):
+UPLOAD_READ_BLOCK = 1 * 1024 * 1024  # 1MB
+
+async def save_upload(file: UploadFile, suffix: str = ".csv") -> tuple:
+    """
+    Copy the upload to a temp file on disk block by block
+    The suffix (".csv", ".csv.gz", ...) tells the parser how to decompress it
+    Returns (path, size_in_bytes)
+    """
+    fd, path = tempfile.mkstemp(prefix="cdr-upload-", suffix=suffix)
+    size = 0
+    
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while True:
+                block = await file.read(UPLOAD_READ_BLOCK)
+                if not block:
+                    break
+                target.write(block)
+                size += len(block)
+    except Exception:
+        os.remove(path)
+        raise
+    
+    return path, size
+
+@router.post("/upload", response_model=UploadJobResponse, status_code=202)
+async def upload_cdr_file(
+    file: UploadFile = File(...),
+    stream: bool = Query(False, description="Force chunked streaming ingest")
+):
     """
-    Upload and process CDR CSV file
+    Upload a CDR CSV file for background processing
     
-    - Accepts CSV files up to 10MB
+    - Returns a job id right away; poll /jobs/{job_id} for progress
+    - Accepts plain .csv and compressed .csv.gz, .csv.bz2, .csv.zst
+    - Parses CSV files up to 10MB in memory, compressed ones by inflated size
+    - Streams larger files (or any file with stream=true) in chunks
     - Groups records by UniqueID
     - Extracts unique calls
     - Prevents duplicates
     """
     # Validate file type
-    if not file.filename.endswith('.csv'):
+    suffix = cdr_file_suffix(file.filename)
+    if suffix is None:
         raise HTTPException(
             status_code=400,
-            detail="Invalid file format. Only CSV files are accepted."
+            detail="Invalid file format. Only CSV files (optionally .gz, .bz2 or .zst compressed) are accepted."
         )
     
-    # Read file content
-    content = await file.read()
-    
-    # Validate file size (10MB limit)
-    max_size = 10 * 1024 * 1024  # 10MB
-    if len(content) > max_size:
+    try:
+        path, size = await save_upload(file, suffix)
+        # A compressed file's size says little about its CSV; the parse
+        # worker measures it while inflating instead
+        large = size > MAX_IN_MEMORY_SIZE and not is_compressed_cdr_file(suffix)
+        job = submit_ingest(path, file.filename, stream=stream or large)
+    except Exception as e:
         raise HTTPException(
-            status_code=400,
-            detail="File size exceeds limit of 10MB."
+            status_code=500,
+            detail=f"Error queueing file: {str(e)}"
         )
     
+    return UploadJobResponse(
+        job_id=job.job_id,
+        status_url=f"/api/v1/jobs/{job.job_id}",
+        message=f"File {file.filename} queued for processing"
+    )
+
+def extract_zip_csvs(zip_path: str) -> list:
+    """
+    Extract every .csv member of a ZIP archive to its own temp file
+    Returns list of (member_name, csv_path)
+    """
+    extracted = []
+    
     try:
-        # Process the CSV file
-        records, total_records, unique_calls = process_cdr_file(content)
-        
-        # Insert records into database
-        inserted = 0
-        skipped = 0
-        
-        with get_db() as conn:
-            for record in records:
-                if insert_call_record(conn, record):
-                    inserted += 1
-                else:
-                    skipped += 1
+        with zipfile.ZipFile(zip_path) as archive:
+            for member in archive.infolist():
+                name = member.filename
+                if member.is_dir() or not name.lower().endswith('.csv') or name.startswith('__MACOSX/'):
+                    continue
+                fd, path = tempfile.mkstemp(prefix="cdr-upload-", suffix=".csv")
+                extracted.append((name, path))
+                with os.fdopen(fd, "wb") as target, archive.open(member) as source:
+                    shutil.copyfileobj(source, target, UPLOAD_READ_BLOCK)
+    except Exception:
+        for _, path in extracted:
+            os.remove(path)
+        raise
+    
+    return extracted
+
+@router.post("/upload/batch", response_model=BatchUploadResponse)
+async def upload_cdr_batch(files: List[UploadFile] = File(...)):
+    """
+    Upload several CDR CSV files (optionally compressed) and/or ZIP archives of CSV files
+    
+    - Parses files in parallel across CPU cores
+    - Merges calls sharing a UniqueID across files
+    - Writes all calls in a single bulk insert
+    - Reports per-file and aggregate counts
+    """
+    for file in files:
+        if cdr_file_suffix(file.filename) is None and not file.filename.lower().endswith('.zip'):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file format: {file.filename}. Only CSV and ZIP files are accepted."
+            )
+    
+    saved = []
+    try:
+        for file in files:
+            suffix = cdr_file_suffix(file.filename)
+            if suffix is not None:
+                path, _ = await save_upload(file, suffix)
+                saved.append((file.filename, path))
+                continue
+            path, _ = await save_upload(file, ".zip")
+            try:
+                # Inflating a large archive takes a while; keep it off the event loop
+                members = await asyncio.get_running_loop().run_in_executor(None, extract_zip_csvs, path)
+                saved.extend((f"{file.filename}/{name}", csv_path) for name, csv_path in members)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"Invalid ZIP archive: {file.filename}")
+            finally:
+                os.remove(path)
         
-        message = f"Processed {total_records} records, {inserted} unique calls added"
-        if skipped > 0:
-            message += f", {skipped} duplicates skipped"
+        if not saved:
+            raise HTTPException(status_code=400, detail="No CSV files found in upload.")
         
-        return UploadResponse(
-            processed=total_records,
-            unique_calls=inserted,
-            skipped=skipped,
-            message=message
-        )
+        file_results, merged, inserted, skipped = await ingest_batch(saved)
     
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error processing file: {str(e)}"
+            detail=f"Error processing files: {str(e)}"
         )
+    finally:
+        for _, path in saved:
+            if os.path.exists(path):
+                os.remove(path)
+    
+    processed = sum(result['processed'] for result in file_results)
+    failed = sum(1 for result in file_results if result['error'])
+    
+    message = f"Processed {processed} records from {len(file_results) - failed} files, {inserted} unique calls added"
+    if skipped > 0:
+        message += f", {skipped} duplicates skipped"
+    if failed > 0:
+        message += f", {failed} files failed"
+    
+    return BatchUploadResponse(
+        files=[BatchFileResult(**result) for result in file_results],
+        processed=processed,
+        unique_calls=inserted,
+        skipped=skipped,
+        merged=merged,
+        message=message
+    )
@@ -0,0 +1,146 @@
+"""
+Indexed substring search on caller numbers
+Each call_records partition has an FTS5 trigram index answering
+caller_number LIKE '%x%' without a scan; ingest indexes new rows in bulk
+and triggers follow deletes and updates
+
+Usage (from the backend directory):
+    python -m search rebuild
+"""
+import sqlite3
+import sys
+
+from partitions import UNDATED_PARTITION, list_partitions, partition_table
+
+def search_table(table: str) -> str:
+    """Trigram index table of a call_records partition"""
+    return f"{table}_fts"
+
+# External-content FTS5 table over a partition's caller_number, keyed by rowid
+SEARCH_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+        caller_number,
+        content = '{table}',
+        content_rowid = 'rowid',
+        tokenize = 'trigram'
+    )
+"""
+
+# No insert trigger: a per-row FTS5 insert is several times slower than
+# indexing a whole load at once, see index_new_rows()
+SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_search_delete
+    AFTER DELETE ON {table}
+    WHEN OLD.caller_number IS NOT NULL
+    BEGIN
+        INSERT INTO {fts} ({fts}, rowid, caller_number)
+        VALUES ('delete', OLD.rowid, OLD.caller_number);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_search_update
+    AFTER UPDATE OF caller_number ON {table}
+    BEGIN
+        INSERT INTO {fts} ({fts}, rowid, caller_number)
+        SELECT 'delete', OLD.rowid, OLD.caller_number
+        WHERE OLD.caller_number IS NOT NULL;
+        INSERT INTO {fts} (rowid, caller_number)
+        SELECT NEW.rowid, NEW.caller_number
+        WHERE NEW.caller_number IS NOT NULL;
+    END
+    """,
+]
+
+# Search index availability per database path; FTS5 may be compiled out
+_available = {}
+
+def init_search_index(cursor: sqlite3.Cursor, table: str) -> bool:
+    """
+    Create the trigram index of a partition and its triggers
+    Returns True if the index was new, meaning it needs a rebuild; False if
+    it already existed or this SQLite build has no FTS5 trigram tokenizer
+    """
+    fts = search_table(table)
+    cursor.execute("SELECT name FROM sqlite_master WHERE name = ?", (fts,))
+    if cursor.fetchone() is not None:
+        return False
+    
+    try:
+        cursor.execute(SEARCH_SCHEMA.format(fts=fts, table=table))
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ Phone search index unavailable, using LIKE scans: {e}")
+        return False
+    
+    for statement in SEARCH_TRIGGERS:
+        cursor.execute(statement.format(fts=fts, table=table))
+    return True
+
+def rebuild_search_index(conn: sqlite3.Connection, table: str):
+    """Regenerate the trigram index of a partition from its rows"""
+    fts = search_table(table)
+    conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    conn.commit()
+
+def index_new_rows(conn: sqlite3.Connection, path: str, table: str, after_rowid: int):
+    """
+    Add rows of a partition with rowid > after_rowid to its trigram index
+    Called by inserts after their rows are written, in the same transaction
+    """
+    if not has_search_index(conn, path):
+        return
+    conn.execute(f"""
+        INSERT INTO {search_table(table)} (rowid, caller_number)
+        SELECT rowid, caller_number FROM {table}
+        WHERE rowid > ? AND caller_number IS NOT NULL
+    """, (after_rowid,))
+
+def has_search_index(conn: sqlite3.Connection, path: str) -> bool:
+    """True if the database at path has trigram indexes (the undated partition always exists)"""
+    if path not in _available:
+        row = conn.execute(
+            "SELECT name FROM sqlite_master WHERE name = ?", (search_table(UNDATED_PARTITION),)
+        ).fetchone()
+        _available[path] = row is not None
+    return _available[path]
+
+def forget_search_index(path: str):
+    """Drop the cached availability for path (after schema changes)"""
+    _available.pop(path, None)
+
+def caller_search_clause(conn: sqlite3.Connection, path: str, search: str, table: str) -> tuple:
+    """
+    WHERE clause on a partition matching caller_number LIKE '%search%'
+    Wildcards in search keep their LIKE meaning, as before the index existed
+    Returns (where_sql, params)
+    """
+    pattern = f"%{search}%"
+    if not has_search_index(conn, path):
+        return "caller_number LIKE ?", [pattern]
+    
+    # The trigram index evaluates LIKE itself, so results are identical
+    return f"rowid IN (SELECT rowid FROM {search_table(table)} WHERE caller_number LIKE ?)", [pattern]
+
+def main(argv=None) -> int:
+    """Command line entry point"""
+    import argparse
+    import database
+    from database import get_db
+    
+    parser = argparse.ArgumentParser(description="Rebuild the phone search index")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+    
+    with get_db() as conn:
+        if not has_search_index(conn, database.DATABASE_PATH):
+            print("❌ No phone search index; this SQLite build lacks FTS5 trigram support")
+            return 1
+        tables = [partition_table(key) for key in list_partitions(conn)] + [UNDATED_PARTITION]
+        for table in tables:
+            rebuild_search_index(conn, table)
+    
+    print(f"✅ Phone search index rebuilt for {database.DATABASE_PATH}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
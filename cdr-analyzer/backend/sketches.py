@@ -0,0 +1,196 @@
+"""
+HyperLogLog sketches of distinct caller numbers per day
+Ingest adds each load's callers to the sketch of their day; sketches of
+any day range merge (register-wise max) into one distinct-caller estimate,
+so long ranges don't need COUNT(DISTINCT) over every caller row.
+
+With PRECISION = 14 a sketch has 16384 one-byte registers (16 KB a day)
+and estimates carry a relative standard error of 1.04 / sqrt(16384),
+about 0.8%: roughly 68% of estimates fall within 0.8% of the exact count
+and 95% within 1.6%.
+"""
+import math
+import sqlite3
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+PRECISION = 14
+REGISTERS = 1 << PRECISION
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+# Hash bits left after the register index; their leading zeros give the rank
+_RANK_BITS = 64 - PRECISION
+
+SKETCH_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS daily_caller_sketches (
+        call_date TEXT PRIMARY KEY,
+        registers BLOB NOT NULL
+    ) WITHOUT ROWID
+"""
+
+def init_sketches(cursor: sqlite3.Cursor) -> bool:
+    """
+    Create the sketch table
+    Returns True if it was new, meaning it needs a rebuild
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'daily_caller_sketches'")
+    created = cursor.fetchone() is None
+    cursor.execute(SKETCH_SCHEMA)
+    return created
+
+def sketch(callers: Iterable[str]) -> np.ndarray:
+    """HyperLogLog registers (uint8 array) for a collection of caller numbers"""
+    registers = np.zeros(REGISTERS, dtype=np.uint8)
+    values = np.asarray(list(callers), dtype=object)
+    if len(values) == 0:
+        return registers
+    
+    # Stable 64-bit hashes computed in C; categorize only pays off for
+    # heavily repeated values and gives the same hashes
+    hashes = pd.util.hash_array(values, categorize=False)
+    index = (hashes >> np.uint64(_RANK_BITS)).astype(np.intp)
+    rest = hashes & np.uint64((1 << _RANK_BITS) - 1)
+    # Rank = position of the first set bit in the remaining bits; rest fits
+    # in a float64 mantissa, so log2 is exact enough for its bit length
+    bit_length = np.zeros(len(rest), dtype=np.int64)
+    nonzero = rest > 0
+    bit_length[nonzero] = np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.int64) + 1
+    ranks = (_RANK_BITS - bit_length + 1).astype(np.uint8)
+    
+    np.maximum.at(registers, index, ranks)
+    return registers
+
+def _sigma(x: float) -> float:
+    """Ertl's sigma series, correcting for empty registers"""
+    if x == 1.0:
+        return math.inf
+    y = 1.0
+    z = x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+def _tau(x: float) -> float:
+    """Ertl's tau series, correcting for saturated registers"""
+    if x == 0.0 or x == 1.0:
+        return 0.0
+    y = 1.0
+    z = 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+def estimate(registers: np.ndarray) -> int:
+    """
+    Distinct count estimate from HyperLogLog registers
+    Uses Ertl's improved estimator (2017), which stays unbiased from a
+    handful of callers to billions without empirical correction tables
+    """
+    counts = np.bincount(registers, minlength=_RANK_BITS + 2)
+    m = float(REGISTERS)
+    z = m * _tau(1 - counts[_RANK_BITS + 1] / m)
+    for k in range(_RANK_BITS, 0, -1):
+        z = 0.5 * (z + counts[k])
+    z += m * _sigma(counts[0] / m)
+    if math.isinf(z):
+        return 0
+    return round(m * m / (2 * math.log(2)) / z)
+
+def _merge_days(conn: sqlite3.Connection, day_callers: dict):
+    """Merge {call_date: [caller numbers]} into the stored day sketches"""
+    for call_date, callers in day_callers.items():
+        registers = sketch(callers)
+        row = conn.execute(
+            "SELECT registers FROM daily_caller_sketches WHERE call_date = ?", (call_date,)
+        ).fetchone()
+        if row is not None:
+            registers = np.maximum(registers, np.frombuffer(row[0], dtype=np.uint8))
+        conn.execute(
+            "INSERT OR REPLACE INTO daily_caller_sketches (call_date, registers) VALUES (?, ?)",
+            (call_date, registers.tobytes())
+        )
+
+def _group_by_day(rows) -> dict:
+    """{call_date: [caller numbers]} from (call_date, caller_number) rows"""
+    day_callers = {}
+    for call_date, caller in rows:
+        day_callers.setdefault(call_date, []).append(caller)
+    return day_callers
+
+def sketch_new_rows(conn: sqlite3.Connection, table: str, after_rowid: int):
+    """
+    Add the callers of a partition's rows with rowid > after_rowid to their
+    day sketches; re-adding a caller never changes a sketch, so duplicates
+    are harmless
+    """
+    rows = conn.execute(f"""
+        SELECT call_date, caller_number FROM {table}
+        WHERE rowid > ? AND call_date IS NOT NULL
+            AND caller_number IS NOT NULL AND caller_number != ''
+    """, (after_rowid,))
+    _merge_days(conn, _group_by_day(rows))
+
+def rebuild_sketches(conn: sqlite3.Connection, first_day: Optional[str] = None,
+                     last_day: Optional[str] = None) -> int:
+    """
+    Regenerate the sketches of first_day..last_day (either bound optional)
+    from the exact daily_callers rollup; sketches can't remove a caller, so
+    deletes are followed by a rebuild of the affected days
+    Returns the number of day sketches written
+    """
+    clauses = ["1=1"]
+    params = []
+    if first_day is not None:
+        clauses.append("call_date >= ?")
+        params.append(first_day)
+    if last_day is not None:
+        clauses.append("call_date <= ?")
+        params.append(last_day)
+    where_sql = " AND ".join(clauses)
+    
+    conn.execute(f"DELETE FROM daily_caller_sketches WHERE {where_sql}", params)
+    day_callers = _group_by_day(conn.execute(
+        f"SELECT call_date, caller_number FROM daily_callers WHERE {where_sql}", params
+    ))
+    _merge_days(conn, day_callers)
+    conn.commit()
+    return len(day_callers)
+
+def forget_sketch_days(conn: sqlite3.Connection, first_day: str, end_day: str):
+    """Remove the sketches for first_day <= call_date < end_day (a dropped partition)"""
+    conn.execute("DELETE FROM daily_caller_sketches WHERE call_date >= ? AND call_date < ?", (first_day, end_day))
+
+def merged_sketch(conn: sqlite3.Connection, first_day: str, last_day: str) -> np.ndarray:
+    """Union of the day sketches from first_day through last_day"""
+    registers = np.zeros(REGISTERS, dtype=np.uint8)
+    rows = conn.execute(
+        "SELECT registers FROM daily_caller_sketches WHERE call_date >= ? AND call_date <= ?",
+        (first_day, last_day)
+    )
+    for (blob,) in rows:
+        np.maximum(registers, np.frombuffer(blob, dtype=np.uint8), out=registers)
+    return registers
+
+def count_unique_callers(conn: sqlite3.Connection, first_day: str, last_day: str,
+                         exact: bool = False) -> int:
+    """
+    Distinct caller numbers over the days first_day through last_day
+    Estimated from the day sketches, or counted exactly from daily_callers
+    """
+    if exact:
+        row = conn.execute("""
+            SELECT COUNT(DISTINCT caller_number) FROM daily_callers
+            WHERE call_date >= ? AND call_date <= ?
+        """, (first_day, last_day)).fetchone()
+        return row[0]
+    return estimate(merged_sketch(conn, first_day, last_day))
@@ -9,6 +9,9 @@ const API_BASE_URL = (() => {
 // State
 let currentPage = 1;
 let pageSize = 50;
+// Cursor for each page (index = page number), filled as pages are visited
+let pageCursors = [null, null];
+let currentTotal = 0;
 let currentFilters = {
     fromDate: null,
     toDate: null,
@@ -96,10 +99,10 @@ function formatPersianDateTime(isoDate) {
 
 // Load complete dashboard
 async function loadDashboard() {
+    // Data or filters changed: totals and cursors must be fetched again
+    resetPagination();
     await Promise.all([
-        loadStatistics(),
-        loadDailyChart(),
-        loadExtensionChart(),
+        loadSummary(),
         loadCalls()
     ]);
 }
@@ -114,8 +117,9 @@ async function uploadFile() {
         return;
     }
     
-    if (!file.name.endsWith('.csv')) {
-        showUploadStatus('فقط فایل‌های CSV پذیرفته می‌شوند', 'error');
+    const acceptedSuffixes = ['.csv', '.csv.gz', '.csv.bz2', '.csv.zst'];
+    if (!acceptedSuffixes.some(suffix => file.name.toLowerCase().endsWith(suffix))) {
+        showUploadStatus('فقط فایل‌های CSV (یا فشرده gz، bz2، zst) پذیرفته می‌شوند', 'error');
         return;
     }
     
@@ -135,19 +139,46 @@ async function uploadFile() {
             throw new Error(error.detail || 'خطا در آپلود فایل');
         }
         
-        const result = await response.json();
+        const queued = await response.json();
+        const result = await waitForJob(queued.job_id);
         showUploadStatus(result.message, 'success');
         
         // Reload dashboard
-        setTimeout(() => {
-            loadDashboard();
-        }, 1000);
+        loadDashboard();
         
     } catch (error) {
         showUploadStatus(error.message, 'error');
     }
 }
 
+// Poll a background ingest job until it finishes
+async function waitForJob(jobId) {
+    while (true) {
+        const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+        
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.detail || 'خطا در پردازش فایل');
+        }
+        
+        const job = await response.json();
+        
+        if (job.stage === 'done') {
+            return job;
+        }
+        if (job.stage === 'failed') {
+            throw new Error(job.error || 'خطا در پردازش فایل');
+        }
+        
+        const progress = job.stage === 'writing'
+            ? `${toPersianNumber(job.calls_inserted)} از ${toPersianNumber(job.calls_found)} تماس ذخیره شد`
+            : 'در حال پردازش فایل...';
+        showUploadStatus(progress, 'loading');
+        
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 // Clear database
 async function clearDatabase() {
     // Show confirmation dialog
@@ -214,55 +245,46 @@ function applyDateFilter() {
         currentFilters.fromDate = jalaliToGregorian(fromDateJalali);
         currentFilters.toDate = jalaliToGregorian(toDateJalali);
         
-        currentPage = 1;
         loadDashboard();
     }
 }
 
-// Load statistics
-async function loadStatistics() {
+// Load statistics cards and charts with a single request
+async function loadSummary() {
     try {
         const params = new URLSearchParams({
             from_date: currentFilters.fromDate,
             to_date: currentFilters.toDate
         });
         
-        const response = await fetch(`${API_BASE_URL}/stats/daily?${params}`);
-        const stats = await response.json();
-        
-        let totalCalls = 0;
-        let answeredCalls = 0;
-        let missedCalls = 0;
+        const response = await fetch(`${API_BASE_URL}/dashboard?${params}`);
         
-        stats.forEach(day => {
-            totalCalls += day.total;
-            answeredCalls += day.answered;
-            missedCalls += day.missed;
-        });
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
         
-        const answerRate = totalCalls > 0 ? Math.round((answeredCalls / totalCalls) * 100) : 0;
+        const dashboard = await response.json();
         
-        document.getElementById('totalCalls').textContent = toPersianNumber(totalCalls);
-        document.getElementById('answeredCalls').textContent = toPersianNumber(answeredCalls);
-        document.getElementById('missedCalls').textContent = toPersianNumber(missedCalls);
-        document.getElementById('answerRate').textContent = toPersianNumber(answerRate) + '%';
+        renderStatistics(dashboard.summary);
+        renderDailyChart(dashboard.daily_stats);
+        renderExtensionChart(dashboard.extension_stats);
         
     } catch (error) {
-        console.error('Error loading statistics:', error);
+        console.error('Error loading dashboard:', error);
     }
 }
 
-// Load daily chart
-async function loadDailyChart() {
+// Render statistics cards
+function renderStatistics(summary) {
+    document.getElementById('totalCalls').textContent = toPersianNumber(summary.total);
+    document.getElementById('answeredCalls').textContent = toPersianNumber(summary.answered);
+    document.getElementById('missedCalls').textContent = toPersianNumber(summary.missed);
+    document.getElementById('answerRate').textContent = toPersianNumber(Math.round(summary.answer_rate)) + '%';
+}
+
+// Render daily chart
+function renderDailyChart(stats) {
     try {
-        const params = new URLSearchParams({
-            from_date: currentFilters.fromDate,
-            to_date: currentFilters.toDate
-        });
-        
-        const response = await fetch(`${API_BASE_URL}/stats/daily?${params}`);
-        const stats = await response.json();
-        
         const labels = stats.map(s => toJalali(new Date(s.date)));
         const answeredData = stats.map(s => s.answered);
         const missedData = stats.map(s => s.missed);
@@ -310,21 +332,13 @@ async function loadDailyChart() {
         });
         
     } catch (error) {
-        console.error('Error loading daily chart:', error);
+        console.error('Error rendering daily chart:', error);
     }
 }
 
-// Load extension chart
-async function loadExtensionChart() {
+// Render extension chart
+function renderExtensionChart(stats) {
     try {
-        const params = new URLSearchParams({
-            from_date: currentFilters.fromDate,
-            to_date: currentFilters.toDate
-        });
-        
-        const response = await fetch(`${API_BASE_URL}/stats/extensions?${params}`);
-        const stats = await response.json();
-        
         const labels = stats.map(s => `داخلی ${s.extension}`);
         const data = stats.map(s => s.call_count);
         
@@ -362,7 +376,7 @@ async function loadExtensionChart() {
         });
         
     } catch (error) {
-        console.error('Error loading extension chart:', error);
+        console.error('Error rendering extension chart:', error);
     }
 }
 
@@ -374,6 +388,10 @@ async function loadCalls() {
             limit: pageSize
         });
         
+        // Follow the cursor of the previous page; count matches only on page 1
+        if (pageCursors[currentPage]) params.append('cursor', pageCursors[currentPage]);
+        if (currentPage === 1) params.append('include_total', 'true');
+        
         if (currentFilters.fromDate) params.append('from_date', currentFilters.fromDate);
         if (currentFilters.toDate) params.append('to_date', currentFilters.toDate);
         
@@ -393,6 +411,9 @@ async function loadCalls() {
             throw new Error('Invalid response format');
         }
         
+        if (result.total !== null && result.total !== undefined) currentTotal = result.total;
+        pageCursors[currentPage + 1] = result.next_cursor;
+        
         renderCallsTable(result.calls);
         updatePagination(result);
         
@@ -447,15 +468,20 @@ function renderCallsTable(calls) {
 
 // Update pagination
 function updatePagination(result) {
-    const totalPages = Math.ceil(result.total / pageSize);
     const start = (currentPage - 1) * pageSize + 1;
-    const end = Math.min(currentPage * pageSize, result.total);
+    const end = (currentPage - 1) * pageSize + result.calls.length;
     
     document.getElementById('paginationInfo').textContent = 
-        toPersianNumber(`نمایش ${start} تا ${end} از ${result.total} تماس`);
+        toPersianNumber(`نمایش ${start} تا ${end} از ${currentTotal} تماس`);
     
     document.getElementById('prevBtn').disabled = currentPage === 1;
-    document.getElementById('nextBtn').disabled = currentPage >= totalPages;
+    document.getElementById('nextBtn').disabled = !result.next_cursor;
+}
+
+// Start paging again from the first page (filters or page size changed)
+function resetPagination() {
+    currentPage = 1;
+    pageCursors = [null, null];
 }
 
 // Pagination functions
@@ -473,7 +499,7 @@ function nextPage() {
 
 function changePageSize() {
     pageSize = parseInt(document.getElementById('pageSize').value);
-    currentPage = 1;
+    resetPagination();
     loadCalls();
 }
 
@@ -485,7 +511,7 @@ function searchCalls() {
     searchTimeout = setTimeout(() => {
         const searchValue = document.getElementById('searchPhone').value.trim();
         currentFilters.search = searchValue || null;
-        currentPage = 1;
+        resetPagination();
         loadCalls();
     }, 500); // Debounce 500ms
 }
@@ -0,0 +1,47 @@
+"""
+Fixtures shared by the backend tests
+"""
+import pytest
+
+# Plain asserts in the shared helpers report their values like test asserts
+pytest.register_assert_rewrite("tests.helpers")
+
+from fastapi.testclient import TestClient
+import database
+from database import init_db, get_db, insert_call_records
+from cache import response_cache
+from main import app
+from tests.helpers import random_records
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Point the database module at a fresh temporary SQLite file"""
+    path = str(tmp_path / "cdr.db")
+    monkeypatch.setattr(database, "DATABASE_PATH", path)
+    init_db()
+    return path
+
+@pytest.fixture
+def seed_records():
+    """Calls the client fixture's database starts with; modules override it"""
+    return random_records(400)
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, seed_records):
+    """Test client on a temporary database holding seed_records, with an empty response cache"""
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "cdr.db"))
+    with TestClient(app) as test_client:
+        if seed_records:
+            with get_db() as conn:
+                insert_call_records(conn, seed_records)
+        response_cache.clear()
+        yield test_client
+
+@pytest.fixture(params=[False, True], ids=["no-stats", "analyzed"])
+def conn(db_path, request):
+    """Pooled connection on a populated database, with or without ANALYZE stats"""
+    with get_db() as conn:
+        insert_call_records(conn, random_records(400))
+        if request.param:
+            conn.execute("ANALYZE")
+        yield conn
@@ -0,0 +1,107 @@
+"""
+Record factories and assertions shared by the backend tests
+"""
+import random
+import re
+from datetime import datetime
+from database import get_db, date_bound_epoch
+
+def make_record(unique_id, timestamp="2024-12-09T14:30:00", caller="09121234567",
+                extension="209", status="ANSWERED", duration=45):
+    return {
+        'unique_id': unique_id,
+        'timestamp': timestamp,
+        'caller_number': caller,
+        'extension': extension,
+        'status': status,
+        'duration': duration
+    }
+
+def random_records(count, seed=7):
+    """Calls spread over a few days with mixed status, extension and callers"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        answered = rng.random() < 0.6
+        records.append(make_record(
+            f"5000.{i}",
+            timestamp=f"2024-12-{rng.randint(1, 6):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+            caller=rng.choice(["09121234567", "09131112222", "09141112222", "", None]),
+            extension=rng.choice(["201", "202", "203"]) if answered else None,
+            status="ANSWERED" if answered else "MISSED",
+            duration=rng.randint(1, 600) if answered else 0
+        ))
+    return records
+
+def raw_stats(endpoint, from_date, to_date):
+    """The same aggregates computed directly from call_records"""
+    queries = {
+        "daily": """
+            SELECT DATE(timestamp) as date,
+                SUM(CASE WHEN status = 'ANSWERED' THEN 1 ELSE 0 END) as answered,
+                SUM(CASE WHEN status = 'MISSED' THEN 1 ELSE 0 END) as missed,
+                COUNT(*) as total
+            FROM call_records
+            WHERE ts_epoch >= ? AND ts_epoch <= ?
+            GROUP BY DATE(timestamp) ORDER BY date ASC
+        """,
+        "extensions": """
+            SELECT extension, COUNT(*) as call_count, SUM(duration) as total_duration,
+                ROUND(AVG(duration), 2) as avg_duration
+            FROM call_records
+            WHERE extension IS NOT NULL AND status = 'ANSWERED'
+                AND ts_epoch >= ? AND ts_epoch <= ?
+            GROUP BY extension ORDER BY call_count DESC, extension ASC
+        """,
+        "unique-callers": """
+            SELECT DATE(timestamp) as date, COUNT(DISTINCT caller_number) as unique_callers,
+                COUNT(*) as total_calls
+            FROM call_records
+            WHERE DATE(timestamp) >= DATE(?, 'unixepoch') AND DATE(timestamp) <= DATE(?, 'unixepoch')
+                AND caller_number IS NOT NULL AND caller_number != ''
+            GROUP BY DATE(timestamp) ORDER BY date ASC
+        """,
+    }
+    with get_db() as conn:
+        bounds = (date_bound_epoch(from_date), date_bound_epoch(to_date))
+        return [dict(row) for row in conn.execute(queries[endpoint], bounds)]
+
+# Date bounds for the query plan tests
+FROM_EPOCH = date_bound_epoch("2024-12-02T13:30:00")
+TO_EPOCH = date_bound_epoch("2024-12-05T08:15:00")
+
+def query_plans(conn, fn, *args, **kwargs) -> list:
+    """Run fn and return (sql, plan lines) for every SELECT it executed"""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        fn(conn, *args, **kwargs)
+    finally:
+        conn.set_trace_callback(None)
+    
+    plans = []
+    for sql in statements:
+        if sql.lstrip().upper().startswith("SELECT"):
+            lines = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            plans.append((sql, lines))
+    assert plans, "no SELECT captured"
+    return plans
+
+def assert_no_full_scan(plans):
+    """No plan reads a table without an index (partition lookups read the schema)"""
+    for sql, lines in plans:
+        for line in lines:
+            if line.startswith("SCAN ") and "VIRTUAL TABLE" not in line and line != "SCAN sqlite_master":
+                assert " USING " in line, f"full scan in {sql}: {lines}"
+
+def plan_text(plans) -> str:
+    return "\n".join(line for _, lines in plans for line in lines)
+
+class Py310Datetime(datetime):
+    """datetime whose fromisoformat() rejects what Python 3.10 rejects"""
+    
+    @classmethod
+    def fromisoformat(cls, value):
+        if value[-1:] in ("Z", "z") or re.search(r"[+-]\d{4}$", value):
+            raise ValueError(f"Invalid isoformat string: {value!r}")
+        return super().fromisoformat(value)
@@ -0,0 +1,62 @@
+"""
+Tests for running database work off the event loop
+"""
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from database import run_db, get_db, insert_call_records, get_calls
+from main import app
+import routes.stats
+from tests.helpers import make_record
+
+@pytest.mark.asyncio
+async def test_run_db_uses_query_threads(db_path):
+    """Test that run_db runs on a query thread and commits like get_db()"""
+    def insert(conn, records):
+        assert threading.current_thread().name.startswith("cdr-query")
+        return insert_call_records(conn, records)
+    
+    assert await run_db(insert, [make_record("1.1"), make_record("1.2")]) == (2, 0)
+    calls, _, _ = await run_db(get_calls, limit=10)
+    assert {call['unique_id'] for call in calls} == {"1.1", "1.2"}
+    
+    def fail(conn):
+        conn.execute("DELETE FROM call_records")
+        raise RuntimeError("boom")
+    
+    with pytest.raises(RuntimeError):
+        await run_db(fail)
+    with get_db() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM call_records").fetchone()[0] == 2
+
+@pytest.mark.asyncio
+async def test_slow_queries_do_not_block_event_loop(db_path, monkeypatch):
+    """Test that slow stats queries run in parallel while the loop keeps serving"""
+    def slow_daily_stats(conn, from_epoch, to_epoch):
+        time.sleep(0.5)
+        return []
+    monkeypatch.setattr(routes.stats, "query_daily_stats", slow_daily_stats)
+    
+    ticks = 0
+    async def ticker(done):
+        nonlocal ticks
+        while not done.is_set():
+            ticks += 1
+            await asyncio.sleep(0.01)
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        done = asyncio.Event()
+        ticking = asyncio.create_task(ticker(done))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[client.get("/api/v1/stats/daily") for _ in range(4)])
+        elapsed = time.perf_counter() - start
+        done.set()
+        await ticking
+    
+    assert all(response.status_code == 200 for response in responses)
+    # Four 0.5s queries overlap instead of taking 2s back to back
+    assert elapsed < 1.5
+    assert ticks >= 20
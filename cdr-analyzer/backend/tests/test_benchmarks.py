@@ -0,0 +1,33 @@
+"""
+Tests for the synthetic CDR generator used by the benchmark suite
+"""
+from benchmarks.run import run_suite
+from benchmarks.synthetic import generate_cdr_csv
+from processor import process_cdr_file
+
+def test_generator_is_deterministic(tmp_path):
+    """Test that the same seed produces the same file with exact row count"""
+    first = generate_cdr_csv(str(tmp_path / "a.csv"), 2000, seed=7)
+    second = generate_cdr_csv(str(tmp_path / "b.csv"), 2000, seed=7)
+    
+    content = open(first, "rb").read()
+    assert content == open(second, "rb").read()
+    assert content.count(b"\n") == 2001
+
+def test_generated_file_matches_processor(tmp_path):
+    """Test that generated calls parse identically in both engines"""
+    content = open(generate_cdr_csv(str(tmp_path / "cdr.csv"), 3000), "rb").read()
+    
+    records, total, unique = process_cdr_file(content)
+    assert total == 3000
+    assert 0 < unique < total
+    assert {r['status'] for r in records} == {'ANSWERED', 'MISSED'}
+    assert process_cdr_file(content, engine="legacy") == (records, total, unique)
+
+def test_suite_creates_workdir(tmp_path):
+    """Test that a missing --workdir is created before inputs are generated"""
+    workdir = tmp_path / "bench" / "inputs"
+    results = run_suite([500], ["parse_stream"], "columnar", "inferred", str(workdir), 42)
+    
+    assert (workdir / "cdr-synthetic-500-42.csv").exists()
+    assert results[0]["rows"] == 500
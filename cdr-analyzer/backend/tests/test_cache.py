@@ -0,0 +1,60 @@
+"""
+Tests for the generation-invalidated response cache
+"""
+import pytest
+from database import get_db, insert_call_records, bump_data_generation, data_generation
+from cache import ResponseCache, cache_key
+from tests.helpers import make_record
+
+@pytest.fixture
+def seed_records():
+    return [make_record(f"1.{i}") for i in range(5)]
+
+def test_lru_eviction_and_generations():
+    """Test that the least recently used entry goes first and writes invalidate"""
+    cache = ResponseCache(max_entries=2)
+    generation = data_generation()
+    cache.put(cache_key("a"), generation, 1)
+    cache.put(cache_key("b"), generation, 2)
+    assert cache.get(cache_key("a")) == (True, 1)
+    cache.put(cache_key("c"), generation, 3)
+    assert cache.get(cache_key("b")) == (False, None)
+    assert cache.stats()['evictions'] == 1
+    
+    bump_data_generation()
+    assert cache.get(cache_key("a")) == (False, None)
+    # Computed before the write: never stored
+    cache.put(cache_key("a"), generation, 1)
+    assert cache.get(cache_key("a")) == (False, None)
+    assert cache.stats()['stale'] == 1
+
+def test_cache_key_normalizes_params():
+    assert cache_key("calls", limit=50, page=1) == cache_key("calls", page=1, limit=50, cursor=None)
+
+def test_repeated_requests_hit_cache(client):
+    """Test that repeated and equivalent requests are served from the cache"""
+    params = {"from_date": "2024-12-01", "to_date": "2024-12-31"}
+    first = client.get("/api/v1/stats/daily", params=params).json()
+    assert client.get("/api/v1/stats/daily", params=params).json() == first
+    same_bounds = {"from_date": "2024-12-01T00:00:00", "to_date": "2024-12-31T00:00:00"}
+    assert client.get("/api/v1/stats/daily", params=same_bounds).json() == first
+    client.get("/api/v1/calls", params={"limit": 10, "include_total": True})
+    client.get("/api/v1/calls", params={"limit": 10, "include_total": True})
+    
+    stats = client.get("/api/v1/admin/cache").json()
+    assert (stats['hits'], stats['misses'], stats['size']) == (3, 2, 2)
+
+def test_writes_invalidate_cache(client):
+    """Test that ingest and clearing the database are visible right away"""
+    params = {"from_date": "2024-12-01", "to_date": "2024-12-31"}
+    assert client.get("/api/v1/stats/daily", params=params).json()[0]['total'] == 5
+    assert client.get("/api/v1/calls", params={"include_total": True}).json()['total'] == 5
+    
+    with get_db() as conn:
+        insert_call_records(conn, [make_record("2.1")])
+    assert client.get("/api/v1/stats/daily", params=params).json()[0]['total'] == 6
+    assert client.get("/api/v1/calls", params={"include_total": True}).json()['total'] == 6
+    
+    client.delete("/api/v1/clear-database")
+    assert client.get("/api/v1/stats/daily", params=params).json() == []
+    assert client.get("/api/v1/admin/cache").json()['stale'] == 3
@@ -0,0 +1,155 @@
+"""
+Tests for the calls listing and search endpoints
+"""
+import asyncio
+import pytest
+from urllib.parse import quote
+import fastjson
+from database import get_db, insert_call_records, get_calls
+from benchmarks.serialize import model_response
+from search import main as search_main
+from tests.helpers import make_record
+
+def sample_records():
+    """Calls over three days, several sharing a timestamp"""
+    records = []
+    for i in range(60):
+        day = 1 + i % 3
+        # Every four calls share a timestamp, so paging must break ties
+        minute = i // 4
+        records.append(make_record(
+            f"7000.{i:02d}",
+            timestamp=f"2024-12-0{day}T10:{minute:02d}:00",
+            caller=f"0912{i % 7}00{i:04d}"
+        ))
+    return records
+
+@pytest.fixture
+def seed_records():
+    return sample_records()
+
+def follow_cursor(client, url, params):
+    """Fetch every page by following next_cursor"""
+    pages = []
+    cursor = None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        result = client.get(url, params=query).json()
+        pages.append(result)
+        cursor = result['next_cursor']
+        if not cursor:
+            return pages
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"from_date": "2024-12-01T10:05:00", "to_date": "2024-12-03T10:10:00"},
+    {"to_date": "2024-12-02"},
+])
+def test_cursor_pages_match_offset(client, params):
+    """Test that keyset pages cover the same ordered rows as OFFSET pages"""
+    pages = follow_cursor(client, "/api/v1/calls", dict(params, limit=7))
+    keyset_ids = [call['unique_id'] for page in pages for call in page['calls']]
+    
+    offset_ids = []
+    page = 1
+    while True:
+        result = client.get("/api/v1/calls", params=dict(params, limit=7, page=page)).json()
+        if not result['calls']:
+            break
+        offset_ids += [call['unique_id'] for call in result['calls']]
+        page += 1
+    
+    assert keyset_ids == offset_ids
+    assert len(keyset_ids) == len(set(keyset_ids))
+    assert all(len(p['calls']) == 7 for p in pages[:-1])
+    
+    total = client.get("/api/v1/calls", params=dict(params, include_total=True)).json()['total']
+    assert total == len(keyset_ids)
+
+def test_total_only_when_requested(client):
+    """Test that the total is computed only when include_total is set"""
+    result = client.get("/api/v1/calls", params={"limit": 100}).json()
+    assert result['total'] is None
+    assert result['next_cursor'] is None
+    assert len(result['calls']) == 60
+    
+    assert client.get("/api/v1/calls", params={"include_total": True}).json()['total'] == 60
+
+def test_search_pagination(client):
+    """Test cursor paging and totals for phone search"""
+    pages = follow_cursor(client, "/api/v1/calls/search", {"phone": "09123", "limit": 3})
+    calls = [call for page in pages for call in page['calls']]
+    assert len(calls) == sum(1 for i in range(60) if i % 7 == 3)
+    assert all("09123" in call['caller_number'] for call in calls)
+    
+    result = client.get("/api/v1/calls/search", params={"phone": "09123", "include_total": True}).json()
+    assert result['total'] == len(calls)
+
+def test_invalid_cursor(client):
+    """Test that a malformed cursor is rejected"""
+    response = client.get("/api/v1/calls", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("phone", ["09123", "123", "0912_00", "2%00", "99999", "0912"])
+def test_search_matches_like(client, phone):
+    """Test that indexed search returns exactly what caller_number LIKE did"""
+    with get_db() as conn:
+        expected = [row[0] for row in conn.execute("""
+            SELECT unique_id FROM call_records WHERE caller_number LIKE ?
+            ORDER BY timestamp DESC, unique_id DESC
+        """, (f"%{phone}%",))]
+    
+    # Quote explicitly so '%' reaches the endpoint as a literal character
+    result = client.get(f"/api/v1/calls/search?phone={quote(phone)}&limit=100").json()
+    assert [call['unique_id'] for call in result['calls']] == expected
+
+def test_search_index_follows_deletes(client):
+    """Test that the trigram index is kept in sync and can be rebuilt"""
+    with get_db() as conn:
+        conn.execute("DELETE FROM call_records WHERE unique_id = '7000.03'")
+        conn.execute("UPDATE call_records SET caller_number = '09990000000' WHERE unique_id = '7000.10'")
+    
+    result = client.get("/api/v1/calls/search", params={"phone": "09123", "limit": 100}).json()
+    assert '7000.03' not in [call['unique_id'] for call in result['calls']]
+    result = client.get("/api/v1/calls/search", params={"phone": "0999", "limit": 100}).json()
+    assert [call['unique_id'] for call in result['calls']] == ['7000.10']
+    
+    assert search_main(["rebuild"]) == 0
+    with get_db() as conn:
+        plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM call_records_202412_fts WHERE caller_number LIKE '%0999%'"
+        ))
+        # integrity-check raises if the index disagrees with its partition
+        conn.execute("INSERT INTO call_records_202412_fts (call_records_202412_fts, rank) VALUES ('integrity-check', 1)")
+    assert "VIRTUAL TABLE INDEX" in plan
+
+def test_invalid_date_filter(client):
+    """Test that unparseable date filters are rejected"""
+    assert client.get("/api/v1/calls", params={"from_date": "last week"}).status_code == 400
+    assert client.get("/api/v1/stats/daily", params={"from_date": "x", "to_date": "y"}).status_code == 400
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+@pytest.mark.parametrize("url,params", [
+    ("/api/v1/calls", {"limit": 9, "include_total": True}),
+    ("/api/v1/calls/search", {"phone": "09123", "limit": 4}),
+])
+def test_responses_match_model_serialization(client, monkeypatch, use_orjson, url, params):
+    """Test that rows encoded directly give the bytes the CallRecord models gave"""
+    if not use_orjson:
+        monkeypatch.setattr(fastjson, "orjson", None)
+    with get_db() as conn:
+        insert_call_records(conn, [make_record("7100.1", caller=None, extension=None, status="MISSED", duration=0),
+                                   make_record("7100.2", caller="", timestamp="2024-12-04T09:00:00.250000")])
+        calls, total, next_cursor = get_calls(conn, limit=params['limit'], search=params.get("phone"),
+                                              include_total=params.get("include_total", False))
+    
+    response = client.get(url, params=params)
+    assert response.headers['content-type'] == "application/json"
+    assert response.content == asyncio.run(model_response(calls, total, 1, params['limit'], next_cursor))
+
+def test_openapi_schema_unchanged(client):
+    """Test that both listing routes still document CallListResponse"""
+    paths = client.get("/openapi.json").json()['paths']
+    for path in ("/api/v1/calls", "/api/v1/calls/search"):
+        schema = paths[path]['get']['responses']['200']['content']['application/json']['schema']
+        assert schema == {"$ref": "#/components/schemas/CallListResponse"}
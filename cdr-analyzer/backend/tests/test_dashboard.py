@@ -0,0 +1,43 @@
+"""
+Tests for the single-request dashboard endpoint
+"""
+import pytest
+from database import get_db, date_bound_epoch
+from rollups import query_dashboard
+from tests.helpers import raw_stats, query_plans, assert_no_full_scan
+
+@pytest.mark.parametrize("from_date,to_date", [
+    ("2024-12-01", "2024-12-07"),
+    ("2024-12-02T13:30:00", "2024-12-05T08:15:00"),
+    ("2024-12-03T06:00:00", "2024-12-03T18:00:00"),
+    ("2024-12-05", "2024-12-02"),
+])
+def test_dashboard_matches_stats_endpoints(client, from_date, to_date):
+    """Test that the dashboard returns the figures of the separate endpoints"""
+    params = {"from_date": from_date, "to_date": to_date}
+    dashboard = client.get("/api/v1/dashboard", params=params).json()
+    
+    assert dashboard['daily_stats'] == raw_stats("daily", from_date, to_date)
+    assert dashboard['extension_stats'] == raw_stats("extensions", from_date, to_date)
+    assert dashboard['unique_callers'] == raw_stats("unique-callers", from_date, to_date)
+    
+    summary = dashboard['summary']
+    assert summary['total'] == sum(day['total'] for day in dashboard['daily_stats'])
+    assert summary['answered'] + summary['missed'] == summary['total']
+    if summary['total']:
+        assert summary['answer_rate'] == round(summary['answered'] / summary['total'] * 100, 2)
+    range_callers = client.get("/api/v1/stats/unique-callers/range", params=params).json()
+    assert summary['unique_callers'] == range_callers['unique_callers']
+
+def test_dashboard_rejects_bad_dates(client):
+    assert client.get("/api/v1/dashboard", params={"from_date": "nope"}).status_code == 400
+
+def test_dashboard_scans_edge_days_once(conn):
+    """Test that both stats share one covering-index pass per partial edge day"""
+    plans = query_plans(conn, query_dashboard,
+                        date_bound_epoch("2024-12-02T13:30:00"), date_bound_epoch("2024-12-05T08:15:00"))
+    assert_no_full_scan(plans)
+    raw = [lines for sql, lines in plans if "FROM call_records_202412" in sql]
+    assert len(raw) == 2
+    for lines in raw:
+        assert any("COVERING INDEX idx_call_records_202412_ts_epoch_stats" in line for line in lines), lines
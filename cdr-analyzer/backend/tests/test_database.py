@@ -0,0 +1,155 @@
+"""
+Unit tests for CDR database layer
+"""
+import sqlite3
+import threading
+import time
+import pytest
+import database
+import partitions
+from database import init_db, get_db, get_pool, insert_call_records, ConnectionPool
+from database import get_calls, date_bound_epoch
+from tests.helpers import make_record, Py310Datetime
+
+def test_bulk_insert_counts_duplicates(db_path):
+    """Test inserted/skipped counts for batch and cross-upload duplicates"""
+    records = [make_record(f"1234.{i}") for i in range(25)]
+    
+    with get_db() as conn:
+        inserted, skipped = insert_call_records(conn, records + records[:3], batch_size=10)
+    assert (inserted, skipped) == (25, 3)
+    
+    with get_db() as conn:
+        inserted, skipped = insert_call_records(conn, records[:5] + [make_record("9999.1")])
+        count = conn.execute("SELECT COUNT(*) FROM call_records").fetchone()[0]
+    assert (inserted, skipped) == (1, 5)
+    assert count == 26
+
+def test_bulk_insert_restores_pragmas(db_path):
+    """Test that load-time pragmas are reverted after the insert"""
+    with get_db() as conn:
+        before = conn.execute("PRAGMA synchronous").fetchone()[0]
+        insert_call_records(conn, [make_record("1234.1")])
+        after = conn.execute("PRAGMA synchronous").fetchone()[0]
+    assert before == after
+
+def test_bulk_insert_empty(db_path):
+    """Test that an empty batch is a no-op"""
+    with get_db() as conn:
+        assert insert_call_records(conn, []) == (0, 0)
+
+def test_pool_reuses_connections_in_wal_mode(db_path):
+    """Test that get_db hands back the same long-lived WAL connection"""
+    with get_db() as conn:
+        first = conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with get_db() as conn:
+        assert conn is first
+    
+    stats = get_pool().stats()
+    assert stats['database_path'] == db_path
+    assert stats['open'] == 1
+    assert stats['in_use'] == 0
+    assert stats['checkouts'] >= 2
+
+def test_pool_rolls_back_on_error(db_path):
+    """Test that a failed block leaves no open transaction on the pooled connection"""
+    with pytest.raises(RuntimeError):
+        with get_db() as conn:
+            insert_call_records(conn, [make_record("1234.1")])
+            conn.execute("DELETE FROM call_records")
+            raise RuntimeError("boom")
+    
+    with get_db() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM call_records").fetchone()[0] == 1
+
+def test_pool_timeout(db_path):
+    """Test that checkout waits up to the timeout when the pool is exhausted"""
+    pool = ConnectionPool(db_path, size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    
+    stats = pool.stats()
+    assert stats['timeouts'] == 1
+    assert stats['checkouts'] == 2
+    pool.close()
+
+def test_pool_discard_wakes_waiter(db_path):
+    """Test that discarding a connection lets a waiting checkout open a new one"""
+    pool = ConnectionPool(db_path, size=1, timeout=5)
+    conn = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.1)
+    
+    start = time.perf_counter()
+    pool.release(conn, discard=True)
+    waiter.join(timeout=2)
+    
+    assert not waiter.is_alive()
+    assert time.perf_counter() - start < 1
+    assert acquired and acquired[0] is not conn
+    stats = pool.stats()
+    assert stats['waits'] == 1
+    assert stats['timeouts'] == 0
+    assert stats['open'] == 1
+    pool.release(acquired[0])
+    pool.close()
+
+def test_migrates_timestamp_columns(tmp_path, monkeypatch):
+    """Test that init_db adds and backfills ts_epoch/call_date in place"""
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE call_records (
+            unique_id TEXT PRIMARY KEY, timestamp TEXT NOT NULL, caller_number TEXT,
+            extension TEXT, status TEXT NOT NULL, duration INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO call_records (unique_id, timestamp, caller_number, extension, status, duration) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"1234.{i}", f"2024-12-0{1 + i % 3}T1{i % 10}:30:00", "09121234567", "209", "ANSWERED", 45) for i in range(25)]
+    )
+    conn.commit()
+    conn.close()
+    
+    monkeypatch.setattr(database, "DATABASE_PATH", path)
+    monkeypatch.setattr(database, "MIGRATION_BATCH_SIZE", 10)
+    init_db()
+    init_db()
+    
+    with get_db() as conn:
+        rows = conn.execute("""
+            SELECT COUNT(*) FROM call_records
+            WHERE ts_epoch = CAST(strftime('%s', timestamp) AS INTEGER) AND call_date = DATE(timestamp)
+        """).fetchone()[0]
+        calls, total, _ = get_calls(conn, limit=5, from_date="2024-12-02", include_total=True)
+    
+    assert rows == 25
+    assert total == 16
+    assert calls[0] == make_record("1234.8", timestamp="2024-12-03T18:30:00")
+
+def test_insert_sets_epoch_columns(db_path):
+    """Test that inserts derive ts_epoch and call_date from the timestamp"""
+    with get_db() as conn:
+        insert_call_records(conn, [make_record("1234.1", timestamp="2024-12-09T14:30:00")])
+        row = conn.execute("SELECT ts_epoch, call_date FROM call_records").fetchone()
+    assert tuple(row) == (1733754600, "2024-12-09")
+    assert date_bound_epoch("2024-12-09T18:00:00+03:30") == 1733754600
+    with pytest.raises(ValueError):
+        date_bound_epoch("yesterday")
+
+@pytest.mark.parametrize("strict", [False, True], ids=["runtime", "py310"])
+def test_date_bounds_from_javascript(monkeypatch, strict):
+    """Test that the dashboard's toISOString() bounds parse on every supported Python"""
+    if strict:
+        monkeypatch.setattr(partitions, "datetime", Py310Datetime)
+    assert date_bound_epoch("2024-12-09T20:30:00.000Z") == 1733776200
+    assert date_bound_epoch("2024-12-09T20:30:00z") == 1733776200
+    assert date_bound_epoch("2024-12-10T00:00:00+0330") == 1733776200
@@ -0,0 +1,115 @@
+"""
+Tests for streaming call exports
+"""
+import csv
+import io
+import json
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+import pyarrow.parquet as pq
+import pytest
+from database import get_db, get_calls, insert_call_records, iter_calls
+from export import csv_chunks, export_calls
+from tests.helpers import random_records, make_record
+
+FIELDS = ("unique_id", "timestamp", "caller_number", "extension", "status", "duration")
+
+def expected_calls(**filters):
+    """The matching calls as get_calls pages them, in export form"""
+    with get_db() as conn:
+        calls, _, _ = get_calls(conn, limit=100000, **filters)
+    return [{field: call[field] for field in FIELDS} for call in calls]
+
+def read_export(content, export_format):
+    """Parse an export back into dicts with the get_calls value types"""
+    if export_format == "csv":
+        rows = list(csv.DictReader(io.StringIO(content.decode("utf-8"))))
+        return [{**row, 'duration': int(row['duration'])} for row in rows]
+    if export_format == "ndjson":
+        return [json.loads(line) for line in content.decode("utf-8").splitlines()]
+    rows = pq.read_table(io.BytesIO(content)).to_pylist()
+    return [{**row, 'timestamp': row['timestamp'].isoformat()} for row in rows]
+
+@pytest.mark.parametrize("export_format", ["csv", "ndjson", "parquet"])
+@pytest.mark.parametrize("filters", [
+    {},
+    {"from_date": "2024-12-02", "to_date": "2024-12-04T12:00:00"},
+    {"search": "0913"},
+])
+def test_export_matches_get_calls(db_path, export_format, filters):
+    """Test that every format round-trips the rows get_calls returns, in order"""
+    with get_db() as conn:
+        insert_call_records(conn, random_records(300)
+                            + [make_record("6000.1", timestamp="2025-01-03T10:00:00"),
+                               make_record("6000.2", timestamp="2024-11-20T10:00:00")])
+    
+    with get_db() as conn:
+        content = b"".join(export_calls(conn, export_format, filters.get("from_date"),
+                                        filters.get("to_date"), filters.get("search")))
+    expected = expected_calls(**filters)
+    if export_format == "csv":
+        # CSV has no NULL: missing values are empty fields
+        expected = [{field: "" if value is None else value for field, value in call.items()}
+                    for call in expected]
+    assert expected
+    assert read_export(content, export_format) == expected
+
+def export_peak_memory(batch_size):
+    """(bytes exported, peak traced memory) of a full CSV export"""
+    with get_db() as conn:
+        tracemalloc.start()
+        try:
+            total = sum(len(chunk) for chunk in csv_chunks(iter_calls(conn, batch_size=batch_size)))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return total, peak
+
+def test_export_streams_in_constant_memory(db_path):
+    """Test that peak memory does not grow with the number of exported rows"""
+    with get_db() as conn:
+        insert_call_records(conn, random_records(5000))
+    small_total, small_peak = export_peak_memory(500)
+    with get_db() as conn:
+        insert_call_records(conn, random_records(30000, seed=8))
+    total, peak = export_peak_memory(500)
+    
+    assert total > 3 * small_total
+    assert peak < 1.5 * small_peak
+
+def test_iter_calls_rejects_unknown_columns(db_path):
+    with get_db() as conn:
+        with pytest.raises(ValueError):
+            next(iter_calls(conn, columns=("unique_id", "nope")))
+
+@pytest.mark.parametrize("export_format,media_type", [
+    ("csv", "text/csv"), ("ndjson", "application/x-ndjson"), ("parquet", "application/vnd.apache.parquet"),
+])
+def test_export_endpoint(client, export_format, media_type):
+    """Test the download headers and that the endpoint applies the phone filter"""
+    response = client.get("/api/v1/calls/export", params={"format": export_format, "phone": "0912"})
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith(media_type)
+    assert response.headers['content-disposition'] == f'attachment; filename="calls.{export_format}"'
+    assert len(read_export(response.content, export_format)) == len(expected_calls(search="0912"))
+
+def test_export_endpoint_rejects_bad_params(client):
+    assert client.get("/api/v1/calls/export", params={"format": "xml"}).status_code == 422
+    assert client.get("/api/v1/calls/export", params={"from_date": "nope"}).status_code == 400
+
+def test_export_without_pyarrow(client, monkeypatch):
+    """Test that only Parquet exports need pyarrow"""
+    # A None entry makes the import fail and find_spec report it missing
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    response = client.get("/api/v1/calls/export", params={"format": "parquet"})
+    assert response.status_code == 501
+    assert "pyarrow" in response.json()['detail']
+    assert client.get("/api/v1/calls/export", params={"format": "csv"}).status_code == 200
+    
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys; sys.modules['pyarrow'] = None; import main"],
+        capture_output=True, text=True, cwd=Path(__file__).resolve().parents[1]
+    )
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,86 @@
+"""
+Tests for time-of-day interval stats and the weekday x hour heatmap
+"""
+from datetime import datetime
+import pytest
+from database import init_db, get_db, date_bound_epoch
+from rollups import check_rollups, query_interval_stats, query_heatmap
+from tests.helpers import query_plans, assert_no_full_scan, plan_text, FROM_EPOCH, TO_EPOCH
+
+RANGES = [
+    ("2024-12-01", "2024-12-07"),
+    ("2024-12-02T13:30:00", "2024-12-05T08:15:00"),
+    ("2024-12-03T06:00:00", "2024-12-03T18:00:00"),
+]
+
+def raw_calls(from_date, to_date):
+    """(start datetime, status) of every call in the range"""
+    with get_db() as conn:
+        rows = conn.execute("SELECT timestamp, status FROM call_records WHERE ts_epoch >= ? AND ts_epoch <= ?",
+                            (date_bound_epoch(from_date), date_bound_epoch(to_date))).fetchall()
+    return [(datetime.fromisoformat(row['timestamp']), row['status']) for row in rows]
+
+def count_into(cells, key, status):
+    cell = cells[key]
+    cell['answered'] += status == 'ANSWERED'
+    cell['missed'] += status == 'MISSED'
+    cell['total'] += 1
+
+@pytest.mark.parametrize("interval", [15, 30, 60])
+@pytest.mark.parametrize("from_date,to_date", RANGES)
+def test_intervals_match_raw_calls(client, from_date, to_date, interval):
+    """Test that interval counts equal the calls bucketed in Python"""
+    response = client.get("/api/v1/stats/intervals",
+                          params={"from_date": from_date, "to_date": to_date, "interval": interval})
+    assert response.status_code == 200
+    
+    expected = [{'start': f"{minute // 60:02d}:{minute % 60:02d}", 'answered': 0, 'missed': 0, 'total': 0}
+                for minute in range(0, 24 * 60, interval)]
+    for start, status in raw_calls(from_date, to_date):
+        count_into(expected, (start.hour * 60 + start.minute) // interval, status)
+    assert response.json() == expected
+
+@pytest.mark.parametrize("from_date,to_date", RANGES)
+def test_heatmap_matches_raw_calls(client, from_date, to_date):
+    """Test that heatmap cells equal the calls bucketed by weekday and hour"""
+    response = client.get("/api/v1/stats/heatmap", params={"from_date": from_date, "to_date": to_date})
+    assert response.status_code == 200
+    
+    expected = [{'weekday': weekday, 'hour': hour, 'answered': 0, 'missed': 0, 'total': 0}
+                for weekday in range(7) for hour in range(24)]
+    for start, status in raw_calls(from_date, to_date):
+        count_into(expected, start.weekday() * 24 + start.hour, status)
+    cells = response.json()
+    assert cells == expected
+    assert sum(cell['total'] for cell in cells) > 0
+
+def test_rejects_bad_params(client):
+    assert client.get("/api/v1/stats/intervals", params={"interval": 20}).status_code == 400
+    assert client.get("/api/v1/stats/intervals", params={"from_date": "nope"}).status_code == 400
+    assert client.get("/api/v1/stats/heatmap", params={"to_date": "nope"}).status_code == 400
+
+def test_interval_rollup_follows_updates_and_backfills(client):
+    """Test that moved calls change slot and an existing database gets the rollup"""
+    with get_db() as conn:
+        conn.execute("UPDATE call_records SET timestamp = '2024-12-03T23:59:00' WHERE unique_id = '5000.3'")
+        conn.commit()
+        assert not any(check_rollups(conn).values())
+        conn.execute("DROP TABLE interval_stats")
+        conn.commit()
+    
+    init_db()
+    with get_db() as conn:
+        assert not any(check_rollups(conn).values())
+        assert conn.execute("SELECT SUM(total) FROM interval_stats").fetchone()[0] == 400
+
+@pytest.mark.parametrize("fn", [query_interval_stats, query_heatmap])
+def test_edge_days_and_rollup_plans(conn, fn):
+    """Edge days read only the covering index; whole days read the interval_stats key"""
+    plans = query_plans(conn, fn, FROM_EPOCH, TO_EPOCH)
+    assert_no_full_scan(plans)
+    
+    raw = [lines for sql, lines in plans if "FROM call_records_202412" in sql]
+    assert len(raw) == 2
+    for lines in raw:
+        assert any("USING COVERING INDEX idx_call_records_202412_ts_epoch_stats" in line for line in lines), lines
+    assert "SEARCH interval_stats USING PRIMARY KEY (call_date>? AND call_date<?)" in plan_text(plans)
@@ -0,0 +1,223 @@
+"""
+Tests for background ingest jobs
+"""
+import bz2
+import gzip
+import io
+import queue
+import time
+import zipfile
+import pytest
+import database
+import jobs
+from benchmarks.synthetic import generate_cdr_csv
+from processor import STREAM_CHUNK_ROWS, MAX_IN_MEMORY_SIZE
+
+CSV_CONTENT = b"""UniqueID,Source,Date,Status,Duration,Dst.Channel
+1234.56,09121234567,2024-12-09 14:30:00,NO ANSWER,0,SIP/201-001
+1234.56,09121234567,2024-12-09 14:30:05,ANSWERED,180,SIP/203-003
+1234.57,09131112222,2024-12-09 14:35:00,NO ANSWER,0,SIP/201-001
+"""
+
+@pytest.fixture
+def seed_records():
+    return []
+
+def wait_for_job(client, job_id, timeout=60):
+    """Poll the job endpoint until the job finishes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/api/v1/jobs/{job_id}").json()
+        if status['stage'] in (jobs.STAGE_DONE, jobs.STAGE_FAILED):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish in {timeout}s")
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_upload_runs_as_background_job(client, stream):
+    """Test that upload returns a job id and the job reports progress"""
+    response = client.post(
+        f"/api/v1/upload?stream={str(stream).lower()}",
+        files={"file": ("calls.csv", CSV_CONTENT, "text/csv")}
+    )
+    assert response.status_code == 202
+    job_id = response.json()['job_id']
+    
+    status = wait_for_job(client, job_id)
+    assert status['stage'] == jobs.STAGE_DONE
+    assert status['rows_parsed'] == 3
+    assert status['calls_inserted'] == 2
+    assert status['elapsed_seconds'] >= 0
+    with database.get_db() as conn:
+        sources = {row[0] for row in conn.execute("SELECT source FROM call_records")}
+    assert sources == {"calls.csv"}
+    
+    # Same file again: everything is a duplicate
+    job_id = client.post(
+        "/api/v1/upload",
+        files={"file": ("calls.csv", CSV_CONTENT, "text/csv")}
+    ).json()['job_id']
+    status = wait_for_job(client, job_id)
+    assert status['calls_inserted'] == 0
+    assert status['duplicates_skipped'] == 2
+
+def test_progress_during_parsing(client, tmp_path):
+    """Test that a streamed job reports rows parsed before it finishes"""
+    rows = 3 * STREAM_CHUNK_ROWS
+    with open(generate_cdr_csv(str(tmp_path / "large.csv"), rows), "rb") as f:
+        content = f.read()
+    job_id = client.post(
+        "/api/v1/upload?stream=true",
+        files={"file": ("large.csv", content, "text/csv")}
+    ).json()['job_id']
+    
+    seen = []
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        status = client.get(f"/api/v1/jobs/{job_id}").json()
+        if status['stage'] in (jobs.STAGE_DONE, jobs.STAGE_FAILED):
+            break
+        seen.append(status['rows_parsed'])
+        time.sleep(0.01)
+    
+    assert status['stage'] == jobs.STAGE_DONE
+    assert status['rows_parsed'] == rows
+    assert any(0 < parsed < rows for parsed in seen)
+
+def test_calls_written_while_parsing(client, tmp_path, monkeypatch):
+    """Test that batches of calls reach the database before the parse finishes"""
+    # More messages than the queue holds, so the worker can only finish
+    # once the first batch has been written
+    rows = 6 * STREAM_CHUNK_ROWS
+    with open(generate_cdr_csv(str(tmp_path / "large.csv"), rows), "rb") as f:
+        content = f.read()
+    
+    stages = []
+    write_calls = jobs.write_calls
+    def recording_write(job, records):
+        stages.append(job.stage)
+        write_calls(job, records)
+    monkeypatch.setattr(jobs, "write_calls", recording_write)
+    
+    job_id = client.post(
+        "/api/v1/upload?stream=true",
+        files={"file": ("large.csv", content, "text/csv")}
+    ).json()['job_id']
+    status = wait_for_job(client, job_id, timeout=120)
+    
+    assert status['stage'] == jobs.STAGE_DONE
+    assert status['rows_parsed'] == rows
+    assert status['calls_inserted'] == status['calls_found']
+    assert len(stages) > 1
+    assert stages[0] == jobs.STAGE_PARSING
+
+@pytest.mark.parametrize("suffix", [".csv.gz", ".csv.bz2", ".csv.zst"])
+def test_compressed_upload(client, suffix):
+    """Test that compressed uploads are inflated on the fly"""
+    if suffix == ".csv.gz":
+        payload = gzip.compress(CSV_CONTENT)
+    elif suffix == ".csv.bz2":
+        payload = bz2.compress(CSV_CONTENT)
+    else:
+        zstandard = pytest.importorskip("zstandard")
+        payload = zstandard.ZstdCompressor().compress(CSV_CONTENT)
+    
+    response = client.post(
+        "/api/v1/upload",
+        files={"file": (f"calls{suffix}", payload, "application/octet-stream")}
+    )
+    assert response.status_code == 202
+    
+    status = wait_for_job(client, response.json()['job_id'])
+    assert status['stage'] == jobs.STAGE_DONE
+    assert status['rows_parsed'] == 3
+    assert status['calls_inserted'] == 2
+
+def test_compressed_parse_path_follows_inflated_size(tmp_path):
+    """Test that small compressed files are parsed whole and large ones streamed"""
+    small = tmp_path / "small.csv.gz"
+    small.write_bytes(gzip.compress(CSV_CONTENT))
+    messages = queue.Queue()
+    assert jobs.parse_to_queue(str(small), False, messages) == (3, 2)
+    assert messages.qsize() == 1
+    
+    # Compresses far below MAX_IN_MEMORY_SIZE but inflates beyond it
+    plain = generate_cdr_csv(str(tmp_path / "large.csv"), 2 * STREAM_CHUNK_ROWS)
+    with open(plain, "rb") as f:
+        content = f.read()
+    assert len(content) > MAX_IN_MEMORY_SIZE
+    large = tmp_path / "large.csv.gz"
+    large.write_bytes(gzip.compress(content, compresslevel=1))
+    messages = queue.Queue()
+    total_records, unique_calls = jobs.parse_to_queue(str(large), False, messages)
+    assert total_records == 2 * STREAM_CHUNK_ROWS
+    assert messages.qsize() > 2
+    
+    records, rows = jobs.parse_file(str(large))
+    assert (rows, len(records)) == (total_records, unique_calls)
+
+def test_rejects_unknown_format(client):
+    """Test that non-CSV uploads are rejected"""
+    response = client.post(
+        "/api/v1/upload",
+        files={"file": ("calls.xlsx", b"x", "application/octet-stream")}
+    )
+    assert response.status_code == 400
+
+def test_failed_job_reports_error(client):
+    """Test that a parse error marks the job as failed"""
+    job_id = client.post(
+        "/api/v1/upload",
+        files={"file": ("bad.csv", b"UniqueID,Source\n1,2\n", "text/csv")}
+    ).json()['job_id']
+    status = wait_for_job(client, job_id)
+    assert status['stage'] == jobs.STAGE_FAILED
+    assert "missing required columns" in status['error'].lower()
+
+def test_batch_upload_merges_across_files(client):
+    """Test multi-file and ZIP batch upload with a call split across files"""
+    day_one = b"""UniqueID,Source,Date,Status,Duration,Dst.Channel
+2000.1,09121234567,2024-12-09 23:59:50,NO ANSWER,0,SIP/201-001
+2000.2,09131112222,2024-12-09 10:00:00,ANSWERED,30,SIP/202-001
+"""
+    day_two = b"""UniqueID,Source,Date,Status,Duration,Dst.Channel
+2000.1,09121234567,2024-12-10 00:00:05,ANSWERED,95,SIP/204-001
+2000.3,09141112222,2024-12-10 09:00:00,NO ANSWER,0,SIP/201-001
+"""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("pbx2/day_two.csv", day_two)
+        zf.writestr("readme.txt", "ignored")
+    
+    response = client.post("/api/v1/upload/batch", files=[
+        ("files", ("day_one.csv", day_one, "text/csv")),
+        ("files", ("exports.zip", archive.getvalue(), "application/zip")),
+        ("files", ("broken.csv", b"UniqueID\n1\n", "text/csv")),
+    ])
+    assert response.status_code == 200
+    result = response.json()
+    
+    assert [f['filename'] for f in result['files']] == ["day_one.csv", "exports.zip/pbx2/day_two.csv", "broken.csv"]
+    assert result['files'][2]['error']
+    assert result['processed'] == 4
+    assert result['merged'] == 1
+    assert result['unique_calls'] == 3
+    
+    with database.get_db() as conn:
+        row = conn.execute("SELECT * FROM call_records WHERE unique_id = '2000.1'").fetchone()
+    assert row['status'] == 'ANSWERED'
+    assert row['extension'] == '204'
+    assert row['timestamp'] == '2024-12-09T23:59:50'
+    assert row['source'] == 'day_one.csv'
+
+def test_unknown_job(client):
+    """Test 404 for an unknown job id"""
+    assert client.get("/api/v1/jobs/does-not-exist").status_code == 404
+
+def test_database_pool_stats(client):
+    """Test that pool metrics are exposed"""
+    client.get("/api/v1/jobs/does-not-exist")
+    stats = client.get("/api/v1/admin/db-pool").json()
+    assert stats['size'] >= 1
+    assert stats['checkouts'] >= 1
+    assert stats['in_use'] == 0
@@ -0,0 +1,249 @@
+"""
+Tests for monthly call_records partitions and retention
+"""
+import sqlite3
+import threading
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+import database
+import partitions
+from database import init_db, get_db, insert_call_records, get_calls, clear_all_data
+from database import drop_partition, apply_retention
+from partitions import list_partitions, partition_key, shift_month
+from rollups import check_rollups
+from main import app
+import routes.admin
+from tests.helpers import make_record, Py310Datetime
+
+def monthly_records():
+    """Ten calls a month from October 2024 through January 2025"""
+    records = []
+    for month in ("2024-10", "2024-11", "2024-12", "2025-01"):
+        for i in range(10):
+            records.append(make_record(
+                f"{month}.{i}",
+                timestamp=f"{month}-{1 + i * 3:02d}T09:{i:02d}:00",
+                status="ANSWERED" if i % 2 else "MISSED"
+            ))
+    return records
+
+@pytest.mark.parametrize("timestamp,key", [
+    ("2024-12-09T14:30:00", "202412"),
+    ("2024-12-31 23:59", "202412"),
+    ("2024-12-31T23:30:00-02:00", "202501"),
+    ("2024-02-30T10:00:00", None),
+    ("", None),
+])
+def test_partition_key(timestamp, key):
+    """Test that records map to the month their ts_epoch falls in"""
+    assert partition_key(timestamp) == key
+
+@pytest.mark.parametrize("strict", [False, True], ids=["runtime", "py310"])
+def test_partition_key_utc_suffixes(db_path, monkeypatch, strict):
+    """Test that Z and +HHMM timestamps reach their month's partition on every supported Python"""
+    if strict:
+        monkeypatch.setattr(partitions, "datetime", Py310Datetime)
+    assert partition_key("2024-12-31T23:30:00.000Z") == "202412"
+    assert partition_key("2024-12-31T23:30:00-0200") == "202501"
+    
+    with get_db() as conn:
+        insert_call_records(conn, [make_record("9000.1", timestamp="2024-11-30T22:00:00Z")])
+        assert conn.execute("SELECT COUNT(*) FROM call_records_202411").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM call_records_undated").fetchone()[0] == 0
+
+def test_shift_month():
+    assert shift_month("202501", -1) == "202412"
+    assert shift_month("202411", 14) == "202601"
+
+def test_inserts_route_to_monthly_partitions(db_path):
+    """Test that each month gets its own table and the view spans them all"""
+    with get_db() as conn:
+        assert insert_call_records(conn, monthly_records()) == (40, 0)
+        assert list_partitions(conn) == ["202410", "202411", "202412", "202501"]
+        assert conn.execute("SELECT COUNT(*) FROM call_records_202411").fetchone()[0] == 10
+        assert conn.execute("SELECT COUNT(*) FROM call_records").fetchone()[0] == 40
+        
+        # Re-sent calls land in the same partition and are skipped
+        assert insert_call_records(conn, monthly_records()[5:15]) == (0, 10)
+        assert not any(check_rollups(conn).values())
+
+def test_duplicates_across_month_boundary(db_path):
+    """Test that a call re-sent with another UTC offset is skipped in the neighbouring month"""
+    utc = make_record("9100.1", timestamp="2024-11-30T22:00:00")
+    local = make_record("9100.1", timestamp="2024-12-01T01:30:00")
+    with get_db() as conn:
+        assert insert_call_records(conn, [utc]) == (1, 0)
+        assert insert_call_records(conn, [local]) == (0, 1)
+        assert insert_call_records(conn, [make_record("9100.2", timestamp="2024-12-31T23:00:00"),
+                                          make_record("9100.2", timestamp="2025-01-01T02:30:00")]) == (1, 1)
+        assert conn.execute("SELECT COUNT(*) FROM call_records_202412").fetchone()[0] == 1
+        rows = conn.execute("SELECT timestamp FROM call_records WHERE unique_id = '9100.1'").fetchall()
+        assert [row['timestamp'] for row in rows] == ["2024-11-30T22:00:00"]
+
+def test_pages_span_partitions(db_path):
+    """Test that keyset and OFFSET pages read across month boundaries in order"""
+    with get_db() as conn:
+        insert_call_records(conn, monthly_records())
+        expected = [row[0] for row in conn.execute(
+            "SELECT unique_id FROM call_records ORDER BY ts_epoch DESC, unique_id DESC"
+        )]
+        
+        keyset_ids = []
+        cursor = None
+        while True:
+            calls, _, cursor = get_calls(conn, limit=7, cursor=cursor)
+            keyset_ids += [call['unique_id'] for call in calls]
+            if not cursor:
+                break
+        assert keyset_ids == expected
+        
+        for page in (1, 2, 4, 6):
+            calls, _, _ = get_calls(conn, page=page, limit=7)
+            assert [call['unique_id'] for call in calls] == expected[(page - 1) * 7:page * 7]
+        
+        calls, total, _ = get_calls(conn, limit=100, include_total=True,
+                                    from_date="2024-11-20", to_date="2024-12-10")
+        assert [call['unique_id'] for call in calls] == [
+            "2024-12.2", "2024-12.1", "2024-12.0", "2024-11.9", "2024-11.8", "2024-11.7"
+        ]
+        assert total == 6
+
+def test_drop_partition_and_retention(db_path):
+    """Test that dropping partitions removes their calls and rollup days"""
+    with get_db() as conn:
+        insert_call_records(conn, monthly_records())
+        
+        assert drop_partition(conn, "202411") == 10
+        assert drop_partition(conn, "202411") == 0
+        assert list_partitions(conn) == ["202410", "202412", "202501"]
+        assert conn.execute("SELECT COUNT(*) FROM call_records").fetchone()[0] == 30
+        assert not any(check_rollups(conn).values())
+        
+        assert apply_retention(conn, 2, today=date(2025, 1, 15)) == ["2024-10"]
+        assert list_partitions(conn) == ["202412", "202501"]
+        assert not any(check_rollups(conn).values())
+        
+        # The view and its triggers follow the remaining partitions
+        conn.execute("DELETE FROM call_records WHERE unique_id = '2025-01.0'")
+        assert conn.execute("SELECT COUNT(*) FROM call_records").fetchone()[0] == 19
+
+def test_failed_drop_changes_nothing(db_path, monkeypatch):
+    """Test that a drop failing part-way leaves the partition, rollups and view intact"""
+    def fail(*args):
+        raise sqlite3.OperationalError("disk I/O error")
+    
+    with get_db() as conn:
+        insert_call_records(conn, monthly_records())
+        daily_total = "SELECT SUM(total) FROM daily_stats"
+        
+        monkeypatch.setattr(database, "forget_sketch_days", fail)
+        with pytest.raises(sqlite3.OperationalError):
+            drop_partition(conn, "202411")
+        monkeypatch.setattr(database, "refresh_view", fail)
+        with pytest.raises(sqlite3.OperationalError):
+            clear_all_data(conn)
+        
+        assert not conn.in_transaction
+        assert list_partitions(conn) == ["202410", "202411", "202412", "202501"]
+        assert conn.execute("SELECT COUNT(*) FROM call_records").fetchone()[0] == 40
+        assert conn.execute(daily_total).fetchone()[0] == 40
+        assert not any(check_rollups(conn).values())
+    
+    # Nothing was committed for other connections to see either
+    other = sqlite3.connect(db_path)
+    try:
+        assert other.execute("SELECT COUNT(*) FROM call_records_202411").fetchone()[0] == 10
+    finally:
+        other.close()
+
+def test_clear_all_data_drops_partitions(db_path):
+    """Test that clearing drops every partition and empties the rollups"""
+    with get_db() as conn:
+        insert_call_records(conn, monthly_records())
+        assert clear_all_data(conn) == 40
+        assert list_partitions(conn) == []
+        assert conn.execute("SELECT COUNT(*) FROM call_records").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM daily_stats").fetchone()[0] == 0
+        
+        # Ingest recreates partitions after a clear
+        assert insert_call_records(conn, monthly_records()[:3]) == (3, 0)
+        assert list_partitions(conn) == ["202410"]
+
+def test_legacy_table_is_partitioned(tmp_path, monkeypatch):
+    """Test that a single-table database is moved into monthly partitions"""
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE call_records (
+            unique_id TEXT PRIMARY KEY, timestamp TEXT NOT NULL, caller_number TEXT,
+            extension TEXT, status TEXT NOT NULL, duration INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO call_records (unique_id, timestamp, caller_number, extension, status, duration) VALUES (?, ?, ?, ?, ?, ?)",
+        [(r['unique_id'], r['timestamp'], r['caller_number'], r['extension'], r['status'], r['duration'])
+         for r in monthly_records()]
+    )
+    conn.commit()
+    conn.close()
+    
+    monkeypatch.setattr(database, "DATABASE_PATH", path)
+    init_db()
+    init_db()
+    
+    with get_db() as conn:
+        row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'call_records'").fetchone()
+        assert row['type'] == 'view'
+        assert list_partitions(conn) == ["202410", "202411", "202412", "202501"]
+        assert conn.execute("SELECT COUNT(*) FROM call_records").fetchone()[0] == 40
+        assert not any(check_rollups(conn).values())
+        calls, _, _ = get_calls(conn, limit=100, search="0912123")
+        assert len(calls) == 40
+
+def test_admin_partition_endpoints(tmp_path, monkeypatch):
+    """Test listing, dropping and retention through the admin API"""
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "cdr.db"))
+    with TestClient(app) as client:
+        with get_db() as conn:
+            insert_call_records(conn, monthly_records())
+        
+        partitions = client.get("/api/v1/admin/partitions").json()
+        assert [(p['month'], p['calls']) for p in partitions] == [
+            ("2024-10", 10), ("2024-11", 10), ("2024-12", 10), ("2025-01", 10), (None, 0)
+        ]
+        
+        response = client.delete("/api/v1/admin/partitions/2024-10")
+        assert response.json() == {"success": True, "month": "2024-10", "records_deleted": 10}
+        assert client.delete("/api/v1/admin/partitions/2024-13").status_code == 400
+        
+        # A window longer than the data keeps everything
+        response = client.post("/api/v1/admin/retention", params={"keep_months": 1200})
+        assert response.json() == {"keep_months": 1200, "dropped": []}
+        assert client.post("/api/v1/admin/retention", params={"keep_months": 0}).status_code == 422
+
+def test_admin_drops_run_on_writer(tmp_path, monkeypatch):
+    """Test that admin drops and clears queue on the ingest writer thread"""
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "cdr.db"))
+    threads = []
+    
+    def on_thread(fn):
+        def wrapper(conn, *args):
+            threads.append(threading.current_thread().name)
+            return fn(conn, *args)
+        return wrapper
+    
+    for name in ("drop_partition", "apply_retention", "clear_all_data"):
+        monkeypatch.setattr(routes.admin, name, on_thread(getattr(routes.admin, name)))
+    
+    with TestClient(app) as client:
+        with get_db() as conn:
+            insert_call_records(conn, monthly_records())
+        
+        assert client.delete("/api/v1/admin/partitions/2024-10").json()["records_deleted"] == 10
+        assert client.post("/api/v1/admin/retention", params={"keep_months": 1200}).json()["dropped"] == []
+        assert client.delete("/api/v1/clear-database").json()["records_deleted"] == 30
+    
+    assert len(threads) == 3
+    assert all(name.startswith("cdr-writer") for name in threads)
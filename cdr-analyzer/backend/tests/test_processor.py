@@ -2,9 +2,18 @@
 Unit tests for CDR processor
 """
 import pytest
-from processor import parse_extension, parse_duration, process_cdr_file
+from pathlib import Path
+from processor import parse_extension, parse_duration, process_cdr_file, iter_cdr_file
+from processor import parse_extensions, parse_durations, merge_call_records
+from processor import normalize_timestamp, normalize_timestamps
+from processor import read_cdr_csv, read_if_small
+import processor
+import gzip
+import pandas as pd
 from io import BytesIO
 
+EXAMPLE_REPORT = Path(__file__).resolve().parents[3] / "Example-reports" / "CDRReport1.csv"
+
 def test_parse_extension():
     """Test extension extraction from channel strings"""
     assert parse_extension("SIP/209-000012ec") == "209"
@@ -21,6 +30,16 @@ def test_parse_duration():
     assert parse_duration("1min") == 60
     assert parse_duration(None) == 0
 
+def test_column_parsers_match_scalar():
+    """Test column-level duration and extension parsing"""
+    durations = pd.Series(["45s", "2min 30s", "145", "45s", None, "233s (3m 53s)", 30], dtype=object)
+    assert parse_durations(durations).tolist() == [parse_duration(d) for d in durations]
+    
+    channels = pd.Series(["SIP/209-000012ec", None, "PJSIP/210-00001234", "", "SIP/209-000012ec", "Local/x"], dtype=object)
+    assert parse_extensions(channels).tolist() == [parse_extension(c) for c in channels]
+    
+    assert parse_durations(pd.Series([], dtype=object)).tolist() == []
+
 def test_process_empty_csv():
     """Test processing empty CSV"""
     csv_content = b"UniqueID,Source,Date,Status,Duration\n"
@@ -127,5 +146,205 @@ def test_phone_number_float_cleanup():
     # Phone number without .0 should remain unchanged
     assert records[1]['caller_number'] == '9129876543'
 
+@pytest.mark.skipif(not EXAMPLE_REPORT.exists(), reason="Example report not available")
+def test_engine_parity_example_report():
+    """Test that columnar and legacy engines produce identical records"""
+    content = EXAMPLE_REPORT.read_bytes()
+    legacy = process_cdr_file(content, engine="legacy")
+    columnar = process_cdr_file(content, engine="columnar")
+    assert columnar == legacy
+    assert columnar[2] > 0
+
+def test_engine_parity_edge_cases():
+    """Test engine parity on outgoing, invalid and tied-duration calls"""
+    csv_content = b"""UniqueID,Source,Date,Status,Duration,Dst.Channel
+2.1,101,2024-12-09 14:30:00,ANSWERED,45s,SIP/209-001
+1.5,+989121234567,2024-12-09 14:31:00,NO ANSWER,0s,SIP/201-001
+1.5,+989121234567,2024-12-09 14:31:00,ANSWERED,30s,SIP/202-002
+1.5,+989121234567,2024-12-09 14:31:00,ANSWERED,30s,SIP/203-003
+3.7,12345,2024-12-09 14:32:00,ANSWERED,10,SIP/204-004
+,09121234567,2024-12-09 14:33:00,ANSWERED,10,SIP/205-005
+4.2,044367838,09/12/2024 14:34:00,answered,1min 5s,PJSIP/206-006
+"""
+    legacy = process_cdr_file(csv_content, engine="legacy")
+    columnar = process_cdr_file(csv_content, engine="columnar")
+    assert columnar == legacy
+    assert [r['unique_id'] for r in columnar[0]] == ['1.5', '4.2']
+    assert columnar[0][0]['extension'] == '202'
+    assert columnar[0][1]['duration'] == 65
+
+def test_unknown_engine():
+    """Test that an unknown engine name is rejected"""
+    with pytest.raises(ValueError):
+        process_cdr_file(b"UniqueID,Source,Date,Status,Duration\n", engine="fast")
+
+@pytest.mark.skipif(not EXAMPLE_REPORT.exists(), reason="Example report not available")
+@pytest.mark.parametrize("chunksize", [25, 100, 10_000])
+def test_streaming_matches_whole_file(chunksize):
+    """Test that chunked streaming gives the same calls as whole-file processing"""
+    content = EXAMPLE_REPORT.read_bytes()
+    expected, total, _ = process_cdr_file(content)
+    
+    streamed = []
+    rows = 0
+    for records, rows_read in iter_cdr_file(BytesIO(content), chunksize=chunksize):
+        streamed.extend(records)
+        rows += rows_read
+    
+    assert rows == total
+    assert sorted(streamed, key=lambda r: r['unique_id']) == sorted(expected, key=lambda r: r['unique_id'])
+
+@pytest.mark.parametrize("reader", ["inferred", "pruned"])
+@pytest.mark.parametrize("chunksize", [7, 50, 10_000])
+def test_streaming_joins_distant_legs(reader, chunksize):
+    """Test that legs far more than a chunk apart still make one call"""
+    lines = ["UniqueID,Source,Date,Status,Duration,Dst.Channel"]
+    # The unanswered first legs open the file, the answered ones close it
+    for i in range(20):
+        lines.append(f"9{i:03d}.5,0912123{i:04d},2024-12-09 10:{i:02d}:00,NO ANSWER,0,SIP/201-{i}")
+    for i in range(400):
+        lines.append(f"8{i:03d}.5,0913123{i:04d},2024-12-09 11:{i % 60:02d}:00,ANSWERED,{i + 1},SIP/202-{i}")
+    for i in range(20):
+        lines.append(f"9{i:03d}.5,0912123{i:04d},2024-12-09 10:{i:02d}:05,ANSWERED,{i + 30},SIP/205-{i}")
+    content = ("\n".join(lines) + "\n").encode()
+    expected, total, unique = process_cdr_file(content, reader=reader)
+    
+    streamed = []
+    rows = 0
+    for records, rows_read in iter_cdr_file(BytesIO(content), chunksize=chunksize, reader=reader):
+        streamed.extend(records)
+        rows += rows_read
+    
+    assert (rows, len(streamed)) == (total, unique) == (440, 420)
+    assert sorted(streamed, key=lambda r: r['unique_id']) == sorted(expected, key=lambda r: r['unique_id'])
+    late = next(r for r in streamed if r['unique_id'] == "9003.5")
+    assert (late['status'], late['extension'], late['duration']) == ('ANSWERED', '205', 33)
+    assert late['timestamp'] == "2024-12-09T10:03:00"
+
+def test_streaming_splits_large_buckets(monkeypatch):
+    """Test that an oversized bucket is split further and joins the same legs"""
+    monkeypatch.setattr(processor, "STREAM_BUCKETS", 1)
+    lines = ["UniqueID,Source,Date,Status,Duration,Dst.Channel"]
+    for i in range(200):
+        lines.append(f"{i}.5,0912{i:07d},2024-12-09 10:{i % 60:02d}:00,NO ANSWER,0,SIP/201-{i}")
+    for i in range(200):
+        lines.append(f"{i}.5,0912{i:07d},2024-12-09 10:{i % 60:02d}:05,ANSWERED,{i + 1},SIP/205-{i}")
+    content = ("\n".join(lines) + "\n").encode()
+    expected, _, _ = process_cdr_file(content)
+    
+    streamed = []
+    for records, _ in iter_cdr_file(BytesIO(content), chunksize=10):
+        streamed.extend(records)
+    assert len(streamed) == 200
+    assert sorted(streamed, key=lambda r: r['unique_id']) == sorted(expected, key=lambda r: r['unique_id'])
+    assert {r['status'] for r in streamed} == {'ANSWERED'}
+
+def test_bucket_hash_ignores_chunk_dtype():
+    """Test that a UniqueID hashes alike however its chunk was typed"""
+    with processor._RowBuckets(64) as buckets:
+        floats = buckets._hash(pd.Series([1733.5, 1734.0]))
+        ints = buckets._hash(pd.Series([1734]))
+        mixed = buckets._hash(pd.Series([1733.5, "abc"], dtype=object))
+        strings = buckets._hash(pd.Series(["abc", "1733.5"], dtype=object))
+    assert floats[0] == mixed[0]
+    assert floats[1] == ints[0]
+    assert mixed[1] == strings[0]
+
+def test_read_if_small():
+    """Test that small streams are read whole and larger ones replay what was read"""
+    content = b"".join(f"{i}.5,line {i}\n".encode() for i in range(1000))
+    
+    small, _ = read_if_small(gzip.GzipFile(fileobj=BytesIO(gzip.compress(content))), limit=len(content))
+    assert small == content
+    
+    large, stream = read_if_small(gzip.GzipFile(fileobj=BytesIO(gzip.compress(content))), limit=100)
+    assert large is None
+    assert stream.read(7) == content[:7]
+    assert stream.read() == content[7:]
+
+def test_streaming_missing_columns():
+    """Test that streaming mode validates required columns"""
+    csv_content = b"""UniqueID,Source,Date
+1234.56,09121234567,2024-12-09 14:30:00
+"""
+    with pytest.raises(ValueError) as exc_info:
+        list(iter_cdr_file(BytesIO(csv_content)))
+    assert "missing required columns" in str(exc_info.value).lower()
+
+def test_pruned_reader_keeps_strings():
+    """Test that the pruned reader drops unused columns and keeps leading zeros"""
+    csv_content = b"""UniqueID,Source,Date,Status,Duration,Dst. Channel,Recording
+1234.50,09121234567,2024-12-09 14:30:00,ANSWERED,45,SIP/209-001,rec.wav
+"""
+    df = read_cdr_csv(BytesIO(csv_content), reader="pruned")
+    assert list(df.columns) == ['UniqueID', 'Source', 'Date', 'Status', 'Duration', 'Dst. Channel']
+    
+    records, _, _ = process_cdr_file(csv_content, reader="pruned")
+    assert records[0]['caller_number'] == '09121234567'
+    assert records[0]['unique_id'] == '1234.50'
+    assert records[0]['extension'] == '209'
+
+@pytest.mark.skipif(not EXAMPLE_REPORT.exists(), reason="Example report not available")
+def test_arrow_reader_matches_pruned():
+    """Test that the arrow reader produces the same calls as the pruned reader"""
+    pytest.importorskip("pyarrow")
+    content = EXAMPLE_REPORT.read_bytes()
+    pruned = process_cdr_file(content, reader="pruned")
+    assert process_cdr_file(content, reader="arrow") == pruned
+    
+    streamed = []
+    for records, _ in iter_cdr_file(BytesIO(content), chunksize=100, reader="arrow"):
+        streamed.extend(records)
+    assert sorted(streamed, key=lambda r: r['unique_id']) == sorted(pruned[0], key=lambda r: r['unique_id'])
+
+@pytest.mark.parametrize("reader", ["pruned", "arrow"])
+def test_reader_edge_cases(reader):
+    """Test empty files and missing columns with the string readers"""
+    if reader == "arrow":
+        pytest.importorskip("pyarrow")
+    assert process_cdr_file(b"UniqueID,Source,Date,Status,Duration\n", reader=reader) == ([], 0, 0)
+    
+    with pytest.raises(ValueError) as exc_info:
+        process_cdr_file(b"UniqueID,Source\n1,2\n", reader=reader)
+    assert "missing required columns" in str(exc_info.value).lower()
+
+def test_normalize_timestamps_matches_scalar():
+    """Test vectorized timestamp parsing against the per-row function"""
+    dates = pd.Series([
+        "12/25/2024 10:00:00",   # only valid as %m/%d/%Y
+        "01/02/2024 10:00:00",   # ambiguous: %d/%m/%Y wins
+        "12/31/2024 23:59:59",
+        " 2024-12-09 14:30:00 ",
+        "2024/12/09 14:30:00",
+        "2024-12-09 14:30",
+        "2024-1-5 3:04:05",      # not zero-padded
+        "not a date",
+        None,
+    ], dtype=object)
+    expected = [normalize_timestamp(value) for value in dates]
+    assert normalize_timestamps(dates).tolist() == expected
+    assert expected[1] == "2024-02-01T10:00:00"
+    assert expected[7] == "not a date"
+
+def test_normalize_timestamps_epoch():
+    """Test epoch output of vectorized timestamp parsing"""
+    dates = pd.Series(["2024-12-09 14:30:00", "bad", None], dtype=object)
+    assert normalize_timestamps(dates, as_epoch=True).tolist() == [1733754600, None, None]
+
+def test_merge_call_records():
+    """Test merging calls that share a UniqueID across files"""
+    missed = {'unique_id': '1.1', 'timestamp': '2024-12-09T10:00:00', 'caller_number': '09121234567',
+              'extension': None, 'status': 'MISSED', 'duration': 0}
+    answered = dict(missed, timestamp='2024-12-09T10:00:30', status='ANSWERED', extension='209', duration=60)
+    other = dict(missed, unique_id='2.2')
+    
+    records, merged = merge_call_records([[answered, other], [missed]])
+    assert merged == 1
+    assert len(records) == 2
+    assert records[0]['timestamp'] == '2024-12-09T10:00:00'
+    assert records[0]['status'] == 'ANSWERED'
+    assert records[0]['extension'] == '209'
+    assert records[0]['duration'] == 60
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
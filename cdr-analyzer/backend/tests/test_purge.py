@@ -0,0 +1,129 @@
+"""
+Tests for batched purges and incremental vacuum
+"""
+import sqlite3
+import time
+import pytest
+from fastapi.testclient import TestClient
+import database
+import jobs
+from database import get_db, insert_call_records, get_calls, purge_calls, incremental_vacuum
+from partitions import list_partitions
+from rollups import check_rollups
+from main import app
+from tests.helpers import make_record
+
+def mixed_records():
+    """November and December calls from two uploads and two extensions"""
+    records = []
+    for i in range(200):
+        month = "2024-11" if i < 100 else "2024-12"
+        records.append(dict(
+            make_record(
+                f"8000.{i}",
+                timestamp=f"{month}-{1 + i % 28:02d}T{i % 24:02d}:00:00",
+                caller=f"0912{i:07d}",
+                extension="201" if i % 2 else "202"
+            ),
+            source="bad-export.csv" if i % 5 == 0 else "good.csv"
+        ))
+    return records
+
+def remaining_ids(conn) -> set:
+    return {row[0] for row in conn.execute("SELECT unique_id FROM call_records")}
+
+@pytest.mark.parametrize("filters,removed", [
+    ({"from_date": "2024-12-10", "to_date": "2024-12-20T23:59:59"},
+     lambda r: "2024-12-10" <= r['timestamp'][:10] <= "2024-12-20"),
+    ({"extension": "201"}, lambda r: r['extension'] == "201"),
+    ({"source": "bad-export.csv"}, lambda r: r['source'] == "bad-export.csv"),
+    ({"from_date": "2024-12-01", "source": "bad-export.csv"},
+     lambda r: r['timestamp'] >= "2024-12" and r['source'] == "bad-export.csv"),
+])
+def test_purge_filters(db_path, filters, removed):
+    """Test that only calls matching every filter are deleted, in batches"""
+    records = mixed_records()
+    batches = []
+    with get_db() as conn:
+        insert_call_records(conn, records)
+        deleted = purge_calls(conn, batch_size=16, progress=lambda *args: batches.append(args), **filters)
+        
+        expected = {r['unique_id'] for r in records if not removed(r)}
+        assert remaining_ids(conn) == expected
+        assert deleted == len(records) - len(expected)
+        assert not conn.in_transaction
+        assert not any(check_rollups(conn).values())
+        
+        # Search indexes followed the deletes
+        calls, _, _ = get_calls(conn, limit=1000, search="0912")
+        assert {call['unique_id'] for call in calls} == expected
+    
+    assert len(batches) > 2
+    assert batches[-1][0] == batches[-1][1]
+    assert batches[-1][2] == deleted
+
+def test_purge_whole_month_drops_partition(db_path):
+    """Test that a range covering a whole month drops its partition"""
+    with get_db() as conn:
+        insert_call_records(conn, mixed_records())
+        assert purge_calls(conn, from_date="2024-10-15", to_date="2024-11-30T23:59:59") == 100
+        assert list_partitions(conn) == ["202412"]
+        assert not any(check_rollups(conn).values())
+
+def test_purge_requires_a_filter(db_path):
+    with get_db() as conn:
+        with pytest.raises(ValueError):
+            purge_calls(conn)
+        with pytest.raises(ValueError):
+            purge_calls(conn, from_date="yesterday")
+
+def test_incremental_vacuum_frees_pages(db_path):
+    """Test that pages freed by a purge are returned to the filesystem"""
+    with get_db() as conn:
+        insert_call_records(conn, mixed_records())
+        purge_calls(conn, extension="201")
+        purge_calls(conn, extension="202")
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        assert free_pages > 0
+        
+        steps = []
+        assert incremental_vacuum(conn, step_pages=2, progress=steps.append) == free_pages
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert len(steps) > 1
+
+def test_incremental_vacuum_off_for_old_databases(tmp_path):
+    """Test that databases without incremental auto_vacuum are reported, not vacuumed"""
+    conn = sqlite3.connect(str(tmp_path / "old.db"))
+    conn.execute("CREATE TABLE t (x)")
+    assert incremental_vacuum(conn) is None
+    conn.close()
+
+def wait_for_purge(client, job_id, timeout=60):
+    """Poll the purge endpoint until the job finishes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/api/v1/admin/purge/{job_id}").json()
+        if status['stage'] in (jobs.STAGE_DONE, jobs.STAGE_FAILED):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Purge {job_id} did not finish in {timeout}s")
+
+def test_purge_endpoint(tmp_path, monkeypatch):
+    """Test the purge job API end to end"""
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "cdr.db"))
+    with TestClient(app) as client:
+        with get_db() as conn:
+            insert_call_records(conn, mixed_records())
+        
+        response = client.post("/api/v1/admin/purge", json={"source": "bad-export.csv"})
+        assert response.status_code == 202
+        status = wait_for_purge(client, response.json()['job_id'])
+        assert status['stage'] == jobs.STAGE_DONE
+        assert status['rows_deleted'] == 40
+        assert status['partitions_done'] == status['partitions_total'] == 3
+        assert status['filters']['source'] == "bad-export.csv"
+        assert "Purged 40 calls" in status['message']
+        
+        assert client.post("/api/v1/admin/purge", json={}).status_code == 400
+        assert client.post("/api/v1/admin/purge", json={"to_date": "soon"}).status_code == 400
+        assert client.get("/api/v1/admin/purge/unknown").status_code == 404
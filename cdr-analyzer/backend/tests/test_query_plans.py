@@ -0,0 +1,92 @@
+"""
+EXPLAIN QUERY PLAN regression tests
+Each query the API runs is captured as executed and its plan checked for
+the intended index, so a schema or query change can't silently bring
+back a full table scan
+"""
+import pytest
+from database import get_calls, insert_call_records, encode_cursor
+from rollups import query_daily_stats, query_extension_stats, query_unique_callers
+from tests.helpers import make_record, query_plans, assert_no_full_scan, plan_text, FROM_EPOCH, TO_EPOCH
+
+def test_calls_page_by_date(conn):
+    """Date-filtered pages seek the partition's ts_epoch_unique_id index in order, no sort"""
+    plans = query_plans(conn, get_calls, limit=20,
+                        from_date="2024-12-02T13:30:00", to_date="2024-12-05T08:15:00")
+    assert_no_full_scan(plans)
+    text = plan_text(plans)
+    assert "idx_call_records_202412_ts_epoch_unique_id (ts_epoch>? AND ts_epoch<?)" in text
+    assert "TEMP B-TREE" not in text
+
+def test_calls_page_by_cursor(conn):
+    """Cursor pages seek past the cursor with the row-value comparison"""
+    plans = query_plans(conn, get_calls, limit=20, cursor=encode_cursor(TO_EPOCH, "5000.1"))
+    text = plan_text(plans)
+    assert "idx_call_records_202412_ts_epoch_unique_id ((ts_epoch,unique_id)<(?,?))" in text
+    assert "TEMP B-TREE" not in text
+
+def test_calls_first_page_unfiltered(conn):
+    """The newest page walks the index backwards instead of sorting the table"""
+    plans = query_plans(conn, get_calls, limit=20)
+    text = plan_text(plans)
+    assert "SCAN call_records_202412 USING INDEX idx_call_records_202412_ts_epoch_unique_id" in text
+    assert "TEMP B-TREE" not in text
+
+def test_calls_total_from_rollups(conn):
+    """Date-only totals read daily_stats and the covering stats index"""
+    plans = query_plans(conn, get_calls, limit=20, include_total=True,
+                        from_date="2024-12-02T13:30:00", to_date="2024-12-05T08:15:00")
+    assert_no_full_scan(plans)
+    text = plan_text(plans)
+    assert "SEARCH daily_stats USING PRIMARY KEY" in text
+    assert "COVERING INDEX idx_call_records_202412_ts_epoch_stats" in text
+
+def test_calls_search(conn):
+    """Phone search goes through the trigram index and rowid lookups"""
+    plans = query_plans(conn, get_calls, limit=20, search="0912", include_total=True)
+    assert_no_full_scan(plans)
+    text = plan_text(plans)
+    assert "SCAN call_records_202412_fts VIRTUAL TABLE INDEX" in text
+    assert "SEARCH call_records_202412 USING INTEGER PRIMARY KEY (rowid=?)" in text
+
+@pytest.mark.parametrize("fn,rollup", [
+    (query_daily_stats, "daily_stats"),
+    (query_extension_stats, "daily_extension_stats"),
+])
+def test_stats_edge_days_and_rollups(conn, fn, rollup):
+    """Edge days read only the covering index; whole days read the rollup key"""
+    plans = query_plans(conn, fn, FROM_EPOCH, TO_EPOCH)
+    assert_no_full_scan(plans)
+    
+    raw = [lines for sql, lines in plans if "FROM call_records_202412" in sql]
+    assert len(raw) == 2
+    for lines in raw:
+        assert any("SEARCH call_records_202412 USING COVERING INDEX idx_call_records_202412_ts_epoch_stats" in line
+                   for line in lines), lines
+    assert f"SEARCH {rollup} USING PRIMARY KEY (call_date>? AND call_date<?)" in plan_text(plans)
+
+def test_unique_callers(conn):
+    """Unique callers is a key range on daily_callers"""
+    plans = query_plans(conn, query_unique_callers, FROM_EPOCH, TO_EPOCH)
+    assert_no_full_scan(plans)
+    assert "SEARCH daily_callers USING PRIMARY KEY (call_date>? AND call_date<?)" in plan_text(plans)
+
+def test_only_overlapping_partitions(conn):
+    """Date-bounded queries never read partitions outside the range"""
+    insert_call_records(conn, [
+        make_record("6000.1", timestamp="2024-11-20T10:00:00"),
+        make_record("6000.2", timestamp="2025-01-03T10:00:00"),
+        make_record("6000.3", timestamp="2025-01-04T10:00:00"),
+    ])
+    plans = query_plans(conn, get_calls, limit=1000, include_total=True,
+                        from_date="2024-12-02T13:30:00", to_date="2024-12-05T08:15:00")
+    plans += query_plans(conn, query_daily_stats, FROM_EPOCH, TO_EPOCH)
+    text = plan_text(plans)
+    assert "call_records_202412" in text
+    assert "call_records_202411" not in text
+    assert "call_records_202501" not in text
+    
+    # Unbounded pages stop at the first partition that fills them
+    text = plan_text(query_plans(conn, get_calls, limit=1))
+    assert "call_records_202501" in text
+    assert "call_records_202412" not in text
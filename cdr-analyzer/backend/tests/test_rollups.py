@@ -0,0 +1,81 @@
+"""
+Tests for the statistics rollup tables
+"""
+import sqlite3
+import pytest
+import database
+from database import init_db, get_db, insert_call_records
+from rollups import rebuild_rollups, check_rollups, main
+from tests.helpers import random_records, raw_stats
+
+@pytest.mark.parametrize("from_date,to_date", [
+    ("2024-12-01", "2024-12-07"),
+    ("2024-12-02T13:30:00", "2024-12-05T08:15:00"),
+    ("2024-12-01T20:30:00.000Z", "2024-12-04T20:30:00.000Z"),
+    ("2024-12-03T06:00:00", "2024-12-03T18:00:00"),
+    ("2024-12-03", "2024-12-04"),
+    ("2024-12-02T00:00:00+03:30", "2024-12-05T23:59:59+03:30"),
+    ("2024-12-05", "2024-12-02"),
+])
+@pytest.mark.parametrize("endpoint", ["daily", "extensions", "unique-callers"])
+def test_stats_match_raw_queries(client, endpoint, from_date, to_date):
+    """Test that rollup-backed stats equal the raw aggregate queries"""
+    response = client.get(f"/api/v1/stats/{endpoint}", params={"from_date": from_date, "to_date": to_date})
+    assert response.status_code == 200
+    assert response.json() == raw_stats(endpoint, from_date, to_date)
+
+def test_rollups_follow_inserts_and_deletes(client):
+    """Test that triggers keep rollups consistent through ingest and deletes"""
+    with get_db() as conn:
+        assert not any(check_rollups(conn).values())
+        
+        # Duplicates are ignored and must not be counted twice
+        insert_call_records(conn, random_records(50))
+        conn.execute("DELETE FROM call_records WHERE unique_id LIKE '5000.1%'")
+        conn.execute("UPDATE call_records SET status = 'MISSED', extension = NULL WHERE unique_id = '5000.2'")
+        conn.commit()
+        assert not any(check_rollups(conn).values())
+        
+        conn.execute("DELETE FROM call_records")
+        conn.commit()
+        for table in ("daily_stats", "daily_extension_stats", "daily_callers", "interval_stats"):
+            assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+
+def test_rebuild_and_check(tmp_path, monkeypatch, capsys):
+    """Test that check finds drift, rebuild fixes it, and old databases are backfilled"""
+    path = str(tmp_path / "old.db")
+    
+    # A database created before rollups existed
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE call_records (
+            unique_id TEXT PRIMARY KEY, timestamp TEXT NOT NULL, caller_number TEXT,
+            extension TEXT, status TEXT NOT NULL, duration INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO call_records (unique_id, timestamp, caller_number, extension, status, duration) VALUES (?, ?, ?, ?, ?, ?)",
+        [(r['unique_id'], r['timestamp'], r['caller_number'], r['extension'], r['status'], r['duration'])
+         for r in random_records(100)]
+    )
+    conn.commit()
+    conn.close()
+    
+    monkeypatch.setattr(database, "DATABASE_PATH", path)
+    init_db()
+    
+    with get_db() as conn:
+        assert not any(check_rollups(conn).values())
+        conn.execute("UPDATE daily_stats SET total = total + 1 WHERE call_date = '2024-12-02'")
+        conn.execute("DELETE FROM daily_callers WHERE call_date = '2024-12-03'")
+    
+    assert main(["check"]) == 1
+    assert "out of sync" in capsys.readouterr().out
+    
+    assert main(["rebuild"]) == 0
+    assert main(["check"]) == 0
+    
+    with get_db() as conn:
+        counts = rebuild_rollups(conn)
+    assert counts['daily_stats'] == 6
@@ -0,0 +1,101 @@
+"""
+Tests for the per-day HyperLogLog caller sketches
+"""
+import pytest
+from fastapi.testclient import TestClient
+import database
+from database import get_db, insert_call_records, drop_partition, purge_calls
+from sketches import sketch, estimate, count_unique_callers, rebuild_sketches, STANDARD_ERROR
+from main import app
+from tests.helpers import make_record
+
+def caller_records(days=30, per_day=400, seed=0):
+    """Calls over consecutive December/January days from overlapping caller pools"""
+    records = []
+    for day in range(days):
+        call_date = f"2024-12-{day + 1:02d}" if day < 31 else f"2025-01-{day - 30:02d}"
+        for i in range(per_day):
+            # Half the callers are new each day, half repeat across days
+            caller = f"0912{(seed + day * per_day // 2 + i):07d}"
+            records.append(make_record(
+                f"{day}.{i}", timestamp=f"{call_date}T{i % 24:02d}:{i % 60:02d}:00", caller=caller
+            ))
+    return records
+
+def exact_count(conn, first_day, last_day):
+    return count_unique_callers(conn, first_day, last_day, exact=True)
+
+@pytest.mark.parametrize("count", [0, 1, 100, 5000, 200000])
+def test_estimate_accuracy(count):
+    """Test that estimates stay within a few standard errors of the true count"""
+    callers = [f"0912{i:07d}" for i in range(count)]
+    assert abs(estimate(sketch(callers)) - count) <= max(1, 4 * STANDARD_ERROR * count)
+
+def test_sketches_built_at_ingest(db_path):
+    """Test that ingest fills the day sketches and duplicates change nothing"""
+    records = caller_records()
+    with get_db() as conn:
+        insert_call_records(conn, records)
+        registers = conn.execute("SELECT COUNT(*) FROM daily_caller_sketches").fetchone()[0]
+        assert registers == 30
+        
+        exact = exact_count(conn, "2024-12-01", "2024-12-30")
+        approx = count_unique_callers(conn, "2024-12-01", "2024-12-30")
+        assert exact == 29 * 200 + 400
+        assert abs(approx - exact) <= 4 * STANDARD_ERROR * exact
+        
+        # Re-sent calls and repeat callers don't move the estimate
+        insert_call_records(conn, records[:1000])
+        assert count_unique_callers(conn, "2024-12-01", "2024-12-30") == approx
+
+def test_merge_matches_single_sketch(db_path):
+    """Test that merged day sketches equal one sketch of the whole range"""
+    records = caller_records(days=10)
+    with get_db() as conn:
+        insert_call_records(conn, records)
+        merged = count_unique_callers(conn, "2024-12-03", "2024-12-07")
+    
+    callers = {r['caller_number'] for r in records if "2024-12-03" <= r['timestamp'][:10] <= "2024-12-07"}
+    assert merged == estimate(sketch(callers))
+
+def test_sketches_follow_drops_and_purges(db_path):
+    """Test that dropped and purged days leave the sketches consistent with rollups"""
+    with get_db() as conn:
+        insert_call_records(conn, caller_records(days=40))
+        
+        # Callers seen only on the purged days (0912...1000-1599) drop out
+        purge_calls(conn, from_date="2024-12-05", to_date="2024-12-08T23:59:59")
+        exact = exact_count(conn, "2024-12-01", "2025-01-09")
+        fresh = count_unique_callers(conn, "2024-12-01", "2025-01-09")
+        assert exact == 39 * 200 + 400 - 600
+        assert abs(fresh - exact) <= 4 * STANDARD_ERROR * exact
+        rebuild_sketches(conn)
+        assert count_unique_callers(conn, "2024-12-01", "2025-01-09") == fresh
+        
+        drop_partition(conn, "202412")
+        assert count_unique_callers(conn, "2024-12-01", "2024-12-31") == 0
+        rows = conn.execute("SELECT MIN(call_date) FROM daily_caller_sketches").fetchone()
+        assert rows[0] == "2025-01-01"
+
+def test_unique_callers_range_endpoint(tmp_path, monkeypatch):
+    """Test the range endpoint in estimate, exact and rolling-window modes"""
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "cdr.db"))
+    with TestClient(app) as client:
+        with get_db() as conn:
+            insert_call_records(conn, caller_records())
+        
+        params = {"from_date": "2024-12-01", "to_date": "2024-12-30"}
+        exact = client.get("/api/v1/stats/unique-callers/range", params={**params, "exact": True}).json()
+        assert exact == {"from_date": "2024-12-01", "to_date": "2024-12-30",
+                         "unique_callers": 6200, "exact": True, "standard_error": 0.0}
+        
+        approx = client.get("/api/v1/stats/unique-callers/range", params=params).json()
+        assert approx['exact'] is False
+        assert approx['standard_error'] == pytest.approx(STANDARD_ERROR, abs=1e-4)
+        assert abs(approx['unique_callers'] - 6200) <= 4 * STANDARD_ERROR * 6200
+        
+        rolling = client.get("/api/v1/stats/unique-callers/range",
+                             params={"to_date": "2024-12-30", "days": 7, "exact": True}).json()
+        assert (rolling['from_date'], rolling['unique_callers']) == ("2024-12-24", 6 * 200 + 400)
+        
+        assert client.get("/api/v1/stats/unique-callers/range", params={"from_date": "nope"}).status_code == 400